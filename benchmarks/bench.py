@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+
+""" Benchmarks of the public functions of gitcmd over synthetic repositories.
+    
+    Repositories are generated once with 'git fast-import' (see PROFILES) in the work directory,
+    each with a bare 'file://' remote and two clones: 'local', on which the functions are
+    measured, and 'writer', used to push the commits fetched by pull().
+    
+    Every (profile, operation) pair is measured in a fresh Python process, which reports for each
+    call its wall time, the number of processes spawned by gitcmd and the peak resident set size
+    of those processes, along with the peak RSS of the Python process itself. Results are written
+    as JSON so that two runs can be compared:
+        
+        python benchmarks/bench.py --output before.json
+        git checkout new-version
+        python benchmarks/bench.py --output after.json --compare before.json
+    
+    --compare exits with status 1 if the median time of an operation regressed by more than
+    --threshold."""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT)  # Benchmark the working tree, not an installed version
+
+import gitcmd  # noqa: E402
+
+
+PROFILES = {
+    # name: (files, commits, refs, large blobs, size of large blobs in MiB)
+    "small": (100, 10, 0, 0, 0),
+    "10k": (10000, 10, 0, 0, 0),
+    "200k": (200000, 1, 0, 0, 0),
+    "deep": (1000, 20000, 0, 0, 0),
+    "refs": (100, 10, 20000, 0, 0),
+    "blobs": (10, 2, 0, 4, 64),
+}
+DEFAULT_PROFILES = ["small", "10k", "deep", "refs", "blobs"]
+
+# Kibibytes per unit of ru_maxrss
+RSS_UNIT = 1 / 1024 if sys.platform == "darwin" else 1
+
+
+
+class CountingPopen(subprocess.Popen):
+    """subprocess.Popen counting the processes it spawns and recording their peak RSS."""
+    
+    count = 0
+    peak_rss = 0
+    
+    
+    def __init__(self, *args, **kwargs):
+        CountingPopen.count += 1
+        super().__init__(*args, **kwargs)
+    
+    
+    def _try_wait(self, wait_flags):
+        try:
+            pid, status, usage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            return self.pid, 0
+        if pid:
+            CountingPopen.peak_rss = max(CountingPopen.peak_rss, usage.ru_maxrss * RSS_UNIT)
+        return pid, status
+
+
+
+def git(args, cwd):
+    """Execute git without going through gitcmd, raise RuntimeError if it fails."""
+    p = subprocess.Popen(["git"] + args, cwd=cwd, stdin=subprocess.DEVNULL,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = p.communicate()
+    if p.returncode:
+        raise RuntimeError("git %s failed: %s" % (" ".join(args), err.decode()))
+    return out.decode()
+
+
+
+def _fast_import(stream, files, commits, refs, large, large_size):
+    """Write a 'git fast-import' stream creating the history of a profile to <stream>."""
+    def commit(mark, message, changes):
+        header = ("commit refs/heads/master\nmark :%d\n"
+                  "author Bench <bench@example.com> %d +0000\n"
+                  "committer Bench <bench@example.com> %d +0000\n"
+                  "data %d\n%s\n" % (mark, 1500000000 + mark, 1500000000 + mark,
+                                     len(message), message))
+        stream.write(header.encode())
+        if mark > 1:
+            stream.write(b"from :%d\n" % (mark - 1))
+        for path, data in changes:
+            stream.write(b"M 100644 inline %s\ndata %d\n%s\n" % (path.encode(), len(data), data))
+        stream.write(b"\n")
+    
+    def name(i):
+        return "dir%04d/file%06d.txt" % (i // 100, i)
+    
+    def files_of_first_commit():
+        for i in range(files):
+            yield name(i), b"line of file %d\n" % i * 10
+        for i in range(large):
+            yield "large%d.bin" % i, os.urandom(large_size * 1024 * 1024)
+    
+    commit(1, "Initial commit", files_of_first_commit())
+    for mark in range(2, commits + 1):
+        i = mark % files
+        commit(mark, "Commit %d" % mark, [(name(i), b"version %d of file %d\n" % (mark, i))])
+    for i in range(refs // 2):
+        stream.write(b"reset refs/heads/branch%06d\nfrom :1\n\n" % i)
+        stream.write(b"reset refs/tags/tag%06d\nfrom :1\n\n" % i)
+
+
+
+def generate(directory, profile):
+    """Generate the repositories of <profile> in <directory> unless they already exist."""
+    if os.path.exists(os.path.join(directory, "ready")):
+        return
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+    
+    start = time.perf_counter()
+    remote = os.path.join(directory, "remote.git")
+    git(["init", "-q", "--bare", remote], directory)
+    p = subprocess.Popen(["git", "fast-import", "--quiet"], cwd=remote, stdin=subprocess.PIPE)
+    _fast_import(p.stdin, *PROFILES[profile])
+    p.stdin.close()
+    if p.wait():
+        raise RuntimeError("git fast-import failed")
+    git(["symbolic-ref", "HEAD", "refs/heads/master"], remote)
+    
+    for clone in ("local", "writer"):
+        git(["clone", "-q", "file://" + remote, clone], directory)
+        git(["config", "user.name", "Bench"], os.path.join(directory, clone))
+        git(["config", "user.email", "bench@example.com"], os.path.join(directory, clone))
+        git(["config", "pull.rebase", "false"], os.path.join(directory, clone))
+    
+    open(os.path.join(directory, "ready"), "w").close()
+    print("Generated '%s' in %.1fs" % (profile, time.perf_counter() - start), file=sys.stderr)
+
+
+
+class Context:
+    """Paths of the repositories of a profile given to the operations."""
+    
+    def __init__(self, directory):
+        self.remote = os.path.join(directory, "remote.git")
+        self.local = os.path.join(directory, "local")
+        self.writer = os.path.join(directory, "writer")
+        self.file = os.path.join(self.local, "dir0000", "file000000.txt")
+        self.scratch = tempfile.mkdtemp(dir=directory)
+    
+    
+    def new_file(self, i):
+        path = os.path.join(self.local, "bench", "%d-%d.txt" % (os.getpid(), i))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            print(path, time.time(), file=f)
+        return path
+
+
+
+def _stage(ctx, i):
+    path = ctx.new_file(i)
+    git(["add", "--", path], ctx.local)
+    return path
+
+
+
+def _commit(ctx, i):
+    path = _stage(ctx, i)
+    git(["commit", "-q", "-m", "bench %d" % i, "--", path], ctx.local)
+
+
+
+def _unstage(ctx, path):
+    git(["reset", "-q", "--", path], ctx.local)
+    os.remove(path)
+
+
+
+def _remote_commit(ctx, i):
+    git(["pull", "-q", "--ff-only"], ctx.writer)
+    path = os.path.join(ctx.writer, "remote-%d-%d.txt" % (os.getpid(), i))
+    open(path, "w").close()
+    git(["add", "--", path], ctx.writer)
+    git(["commit", "-q", "-m", "remote %d" % i], ctx.writer)
+    git(["push", "-q"], ctx.writer)
+
+
+
+# name: (setup(ctx, i) -> argument, operation(ctx, argument), teardown(ctx, argument))
+OPERATIONS = {
+    "in_repository": (None, lambda ctx, _: (0, gitcmd.in_repository(ctx.file), ""), None),
+    "status": (None, lambda ctx, _: gitcmd.status(ctx.local), None),
+    "branch": (None, lambda ctx, _: gitcmd.branch(ctx.local), None),
+    "current_branch": (None, lambda ctx, _: gitcmd.current_branch(ctx.local), None),
+    "show_last_revision": (None, lambda ctx, _: gitcmd.show_last_revision(ctx.file), None),
+    "add": (Context.new_file, lambda ctx, path: gitcmd.add(path), _unstage),
+    "commit": (_stage, lambda ctx, path: gitcmd.commit(path, "bench"), None),
+    "push": (_commit, lambda ctx, _: gitcmd.push(ctx.local), None),
+    "pull": (_remote_commit, lambda ctx, _: gitcmd.pull(ctx.local), None),
+    "clone": (
+        lambda ctx, i: "clone%d" % i,
+        lambda ctx, to: gitcmd.clone(ctx.scratch, "file://" + ctx.remote, to=to),
+        lambda ctx, to: shutil.rmtree(os.path.join(ctx.scratch, to)),
+    ),
+}
+
+
+
+def worker(directory, operation, repeat, warmup):
+    """Measure <operation> on the repositories in <directory>, print the result as JSON."""
+    subprocess.Popen = CountingPopen
+    setup, run, teardown = OPERATIONS[operation]
+    ctx = Context(directory)
+    times, processes, rss = [], [], []
+    
+    try:
+        for i in range(warmup + repeat):
+            argument = setup(ctx, i) if setup else None
+            CountingPopen.count = CountingPopen.peak_rss = 0
+            start = time.perf_counter()
+            ret, out, err = run(ctx, argument)
+            elapsed = time.perf_counter() - start
+            if ret:
+                raise RuntimeError("%s failed (%d): %s" % (operation, ret, err))
+            if i >= warmup:
+                times.append(elapsed)
+                processes.append(CountingPopen.count)
+                rss.append(CountingPopen.peak_rss)
+            if teardown:
+                teardown(ctx, argument)
+    finally:
+        shutil.rmtree(ctx.scratch)
+    
+    print(json.dumps({
+        "times": times,
+        "processes": processes,
+        "git_peak_rss_kib": max(rss),
+        "python_peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT,
+    }))
+
+
+
+def measure(directory, profile, operation, repeat, warmup):
+    """Run the worker measuring <operation> and return its result."""
+    args = [sys.executable, os.path.realpath(__file__), "--worker", directory, operation,
+            "--repeat", str(repeat), "--warmup", str(warmup)]
+    p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = p.communicate()
+    if p.returncode:
+        raise RuntimeError("Benchmark of %s on '%s' failed:\n%s" % (operation, profile,
+                                                                    err.decode()))
+    
+    raw = json.loads(out.decode().splitlines()[-1])
+    times = raw["times"]
+    return {
+        "profile": profile,
+        "operation": operation,
+        "repeat": repeat,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "max": max(times),
+        "processes": max(raw["processes"]),
+        "git_peak_rss_kib": raw["git_peak_rss_kib"],
+        "python_peak_rss_kib": raw["python_peak_rss_kib"],
+        "times": times,
+    }
+
+
+
+def metadata():
+    return {
+        "gitcmd": gitcmd.__version__,
+        "git": git(["--version"], ROOT).strip(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+
+def compare(results, baseline, threshold):
+    """Print the ratio of the median times of <results> to those of <baseline>, return the
+    number of operations slower than <threshold> times their baseline."""
+    before = {(r["profile"], r["operation"]): r for r in baseline["results"]}
+    regressions = 0
+    print("\n%-8s %-20s %12s %12s %8s" % ("profile", "operation", "before (ms)", "after (ms)",
+                                           "ratio"), file=sys.stderr)
+    for result in results:
+        old = before.get((result["profile"], result["operation"]))
+        if old is None:
+            continue
+        ratio = result["median"] / old["median"]
+        regressed = ratio > threshold
+        regressions += regressed
+        print("%-8s %-20s %12.2f %12.2f %7.2fx%s" % (
+            result["profile"], result["operation"], old["median"] * 1000,
+            result["median"] * 1000, ratio, "  REGRESSION" if regressed else ""
+        ), file=sys.stderr)
+    return regressions
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", default=",".join(DEFAULT_PROFILES),
+                        help="Comma-separated profiles among %s, or 'all' (default: %s)"
+                             % (", ".join(PROFILES), ",".join(DEFAULT_PROFILES)))
+    parser.add_argument("--operations", default=",".join(OPERATIONS),
+                        help="Comma-separated operations (default: all)")
+    parser.add_argument("--repeat", type=int, default=10, help="Measured calls per operation")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured calls beforehand")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "gitcmd-bench"),
+                        help="Directory where repositories are generated and kept")
+    parser.add_argument("--output", help="Write the results to this file instead of stdout")
+    parser.add_argument("--compare", help="Results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Ratio of median times considered a regression (default: 1.2)")
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        worker(args.worker[0], args.worker[1], args.repeat, args.warmup)
+        return 0
+    
+    profiles = list(PROFILES) if args.profiles == "all" else args.profiles.split(",")
+    operations = args.operations.split(",")
+    for name in profiles:
+        if name not in PROFILES:
+            parser.error("Unknown profile '%s'" % name)
+    for name in operations:
+        if name not in OPERATIONS:
+            parser.error("Unknown operation '%s'" % name)
+    
+    results = []
+    print("%-8s %-20s %12s %12s %10s %14s" % ("profile", "operation", "median (ms)", "min (ms)",
+                                              "processes", "git RSS (KiB)"), file=sys.stderr)
+    for profile in profiles:
+        directory = os.path.join(args.workdir, profile)
+        generate(directory, profile)
+        for operation in operations:
+            result = measure(directory, profile, operation, args.repeat, args.warmup)
+            results.append(result)
+            print("%-8s %-20s %12.2f %12.2f %10d %14d" % (
+                profile, operation, result["median"] * 1000, result["min"] * 1000,
+                result["processes"], result["git_peak_rss_kib"]
+            ), file=sys.stderr)
+    
+    report = json.dumps({"metadata": metadata(), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    
+    if args.compare:
+        with open(args.compare) as f:
+            return 1 if compare(results, json.load(f), args.threshold) else 0
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,21 @@
 
 from .gitcmd import (in_repository, add, commit, checkout, status, branch, current_branch, reset,
                      pull, push, clone, remote_url, make_public_url, set_url, top_level,
-                     show_last_revision, GIT_LANG, NotInRepositoryError)
+                     show_last_revision, status_entries, stream_clone, stream_pull, stream_push,
+                     filter_ignored, worktree_add, worktree_list, worktree_entries,
+                     worktree_remove, worktree_prune, write_commit, log, Repository, GIT_LANG,
+                     NotInRepositoryError, RefConflictError)
+from .bulk import run_many, RunResult
+from .cache import CloneCache
+from .fastimport import BulkCommitWriter
+from .ignore import IgnoreMatch
+from .launcher import GitTimeoutError
+from .log import LogEntry
+from .pool import WorktreePool
+from .result import Result
+from .status import StatusBranch, StatusEntry
+from .stream import Line, Progress, Stream
+from .worktree import Worktree
 
 __title__ = 'gitcmd'
 __version__ = '1.1.5'
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+""" Asynchronous interface to git, built on asyncio's subprocesses. Requires python 3.5+.
+    
+    Every coroutine of this module takes the same arguments and returns the same
+    (return_code, stdout, stderr) tuple as its counterpart in gitcmd, without blocking the event
+    loop while git is running. Cancelling a coroutine kills the git process it is waiting for.
+    
+    As in gitcmd, coroutines spawning git accept a <timeout> (default to gitcmd.TIMEOUT), after
+    which git is killed and gitcmd.GitTimeoutError is raised."""
+
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import time
+
+from . import instrument, refs, trace
+from .result import Result
+from .gitcmd import (Repository, _checkout_args, _clone_args, _commit_args, _credentials,
+                     _decode, _decode_remote, _directory, _entry, _environment, _pathspec, _paths,
+                     _pull_options, _repository, _reset_args, _timeout, _timeout_error)
+
+
+logger = logging.getLogger(__name__)
+
+
+
+def _kill(p):
+    """Kill the process group of <p>."""
+    try:
+        os.killpg(p.pid, signal.SIGKILL)
+    except ProcessLookupError:  # pragma: no cover
+        pass
+
+
+
+async def _execute(args, path, env=None, input=None, timeout=None):
+    """Asynchronous version of gitcmd._execute().
+    
+    Git is started in its own process group. If the calling task is cancelled, the whole group is
+    killed, including processes started by git (ssh, remote helpers, hooks...), before
+    CancelledError is propagated. The same happens if git does not exit within <timeout> seconds
+    (default to gitcmd.TIMEOUT), GitTimeoutError being raised instead.
+    
+    Return:
+        (return_code, stdout, stderr, profile), see gitcmd._execute()"""
+    timeout = _timeout(timeout)
+    capture = trace.capture()
+    if capture is not None:
+        env = dict(env or {}, **capture.environment)
+    
+    start = time.perf_counter()
+    p = await asyncio.create_subprocess_exec(
+        "git", *args, cwd=_directory(path), env=_environment(env),
+        stdin=subprocess.DEVNULL if input is None else subprocess.PIPE,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True
+    )
+    spawned = time.perf_counter()
+    
+    try:
+        out, err = await asyncio.wait_for(p.communicate(input), timeout)
+    except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+        _kill(p)
+        await p.wait()
+        instrument.record(args, _directory(path), spawned - start, time.perf_counter() - start,
+                          p.returncode, profile=capture and capture.finish())
+        if isinstance(e, asyncio.TimeoutError):
+            logger.warning("git %s: killed after %ss", args[0], timeout)
+            raise _timeout_error(args, timeout)
+        raise
+    end = time.perf_counter()
+    
+    logger.debug("git %s: spawned in %.3fms, returned %d in %.3fms", args[0],
+                 (spawned - start) * 1000, p.returncode, (end - start) * 1000)
+    profile = capture and capture.finish()
+    instrument.record(args, _directory(path), spawned - start, end - start, p.returncode,
+                      len(out), len(err), profile)
+    return p.returncode, out, err, profile
+
+
+
+def _check(path):
+    """Return the Repository containing <path>, raise NotInRepositoryError if <path> is not
+    inside a repository."""
+    return Repository(path)
+
+
+
+async def remote_url(path, remote='origin', timeout=None):
+    """See gitcmd.remote_url()."""
+    _check(path)
+    return _decode(*await _execute(["config", "--get", "remote." + remote + ".url"], path,
+                                   timeout=timeout))
+
+
+
+async def add(path, timeout=None):
+    """See gitcmd.add()."""
+    path = _paths(path)
+    cwd, input = _repository(path)._target(path)
+    return _decode(*await _execute(_pathspec(["add"], path), cwd, input=input, timeout=timeout))
+
+
+
+async def commit(path, log, name=None, mail=None, timeout=None):
+    """See gitcmd.commit()."""
+    path = _paths(path)
+    cwd, input = _repository(path)._target(path)
+    return _decode(*await _execute(_commit_args(path, log, name, mail), cwd, input=input,
+                                   timeout=timeout))
+
+
+
+async def checkout(path, branch=None, new=False, timeout=None):
+    """See gitcmd.checkout()."""
+    path = _paths(path)
+    repository = _repository(path)
+    if branch and isinstance(path, list):
+        path = repository._path(None)  # Paths are not used when switching branches
+    cwd, input = repository._target(path)
+    return _decode(*await _execute(_checkout_args(path, branch, new), cwd, input=input,
+                                   timeout=timeout))
+
+
+
+async def status(path, timeout=None):
+    """See gitcmd.status()."""
+    _check(path)
+    return _decode(*await _execute(["status"], path, timeout=timeout))
+
+
+
+async def branch(path, timeout=None):
+    """See gitcmd.branch()."""
+    _check(path)
+    return _decode(*await _execute(["branch"], path, timeout=timeout))
+
+
+
+async def current_branch(path, timeout=None):
+    """See gitcmd.current_branch()."""
+    repository = _check(path)
+    branch = refs.current_branch(repository.git_dir, repository.common_dir)
+    if branch is not None:
+        return Result(0, branch)
+    return _decode(*await _execute(["rev-parse", "--abbrev-ref", "HEAD"], path, timeout=timeout))
+
+
+
+async def reset(path, mode="mixed", commit='HEAD', timeout=None):
+    """See gitcmd.reset()."""
+    path = _paths(path)
+    cwd, input = _repository(path)._target(path)
+    return _decode(*await _execute(_reset_args(path, mode, commit), cwd, input=input,
+                                   timeout=timeout))
+
+
+
+async def pull(path, url=None, username=None, password=None, timeout=None, depth=None,
+               unshallow=False):
+    """See gitcmd.pull()."""
+    _check(path)
+    options = _pull_options(depth, unshallow)
+    
+    if not url:
+        ret, url, err = await remote_url(path)
+        if ret:  # pragma: no cover
+            return ret, url, "No url was given and couldn't retrieve origin's URL: " + err
+    
+    url = _credentials(url, username, password, "file")
+    args = ["pull"] + options + ([url] if url else [])
+    return _decode_remote(*await _execute(args, path, timeout=timeout), password=password)
+
+
+
+async def push(path, url=None, username=None, password=None, timeout=None):
+    """See gitcmd.push()."""
+    _check(path)
+    
+    if not url:
+        ret, url, err = await remote_url(path)
+        if ret:  # pragma: no cover
+            return ret, url, "No url was given and couldn't retrieve origin's URL: " + err
+    
+    ret, branch, err = await current_branch(path)
+    if ret:  # pragma: no cover
+        return ret, branch, "Couldn't retrieve current branch name \n" + err
+    
+    args = ["push", "-u", _credentials(url, username, password) or "origin", branch]
+    return _decode_remote(*await _execute(args, path, timeout=timeout), password=password)
+
+
+
+async def clone(path, url, to=None, username=None, password=None, timeout=None, depth=None,
+                shallow_since=None, single_branch=False, branch=None, filter=None,
+                no_checkout=False, sparse=False):
+    """See gitcmd.clone()."""
+    args = _clone_args(url, to, username, password, depth, shallow_since, single_branch, branch,
+                       filter, no_checkout, sparse)
+    return _decode_remote(*await _execute(args, path, timeout=timeout), password=password)
+
+
+
+async def show_last_revision(path, timeout=None):
+    """See gitcmd.show_last_revision()."""
+    _check(path)
+    if not os.path.isfile(path):
+        raise ValueError("Error: '%s' is a directory" % path)
+    
+    return _decode(*await _execute(["cat-file", "blob", "HEAD:./" + _entry(path)], path,
+                                   timeout=timeout))
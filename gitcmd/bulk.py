@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+""" Execution of a gitcmd function over many repositories at once."""
+
+import collections
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+RunResult = collections.namedtuple("RunResult", ["path", "result", "error"])
+RunResult.__doc__ = """Outcome of an operation executed by run_many() on a path.
+    
+    result is the value returned by the operation (None if it raised), error the exception it
+    raised (None if it returned)."""
+
+
+
+def _run(operation, paths, max_workers, kwargs):
+    """Generator behind run_many(), <max_workers> being already validated."""
+    paths = iter(paths)
+    pending = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    
+    def submit():
+        for path in paths:
+            pending[executor.submit(operation, path, **kwargs)] = path
+            if len(pending) >= 2 * max_workers:
+                break
+    
+    try:
+        submit()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                error = future.exception()
+                yield RunResult(path, None if error else future.result(), error)
+            submit()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+
+def run_many(operation, paths, max_workers=None, **kwargs):
+    """Call operation(path, **kwargs) for every path of <paths> on a pool of threads.
+    
+    Results are yielded as soon as each operation completes, in no particular order. Exceptions
+    raised by an operation are captured in its RunResult instead of interrupting the others.
+    
+    Paths are consumed lazily, at most twice <max_workers> operations are queued at any time. If
+    the generator is closed before its end, queued operations are cancelled and the generator
+    waits for those already running.
+    
+    Parameter:
+        operation   : (callable) Function to execute, e.g. gitcmd.pull
+        paths       : (iterable) Paths given as first argument to <operation>
+        max_workers : (int) Maximum number of operations running at once, default to the number
+                            of processors plus four, at most 32.
+        kwargs      : Keyword arguments given to every call of <operation>
+    
+    Return:
+        A generator of RunResult(path, result, error). Raise ValueError immediately if
+        <max_workers> is not greater than 0."""
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+    if max_workers <= 0:
+        raise ValueError("max_workers must be greater than 0")
+    return _run(operation, paths, max_workers, kwargs)
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+""" Local cache of mirror repositories making repeated clones of the same repository fast.
+    
+    The cache is a directory of bare mirrors, one per repository, keyed by the URL stripped of
+    its credentials (see make_public_url()). Cloning through the cache first refreshes the mirror
+    with a fetch, then clones the working copy from the mirror on the disk, hardlinking its
+    objects when possible, and finally points its 'origin' back to the real URL:
+        
+        cache = CloneCache('/var/cache/gitcmd', max_size=10 * 2 ** 30)
+        gitcmd.clone('/tmp/sandbox', 'https://github.com/qcoumes/gitcmd', cache=cache)
+    
+    Every mirror is protected by a lock file (see fcntl.flock()), so that several processes can
+    share the same cache. Clones of the same URL waiting for a fetch in progress reuse it instead
+    of fetching again. Once the cache grows above <max_size>, the least recently used mirrors are
+    deleted. Working copies never depend on the mirror they were cloned from, deleting a mirror
+    is thus always safe."""
+
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from urllib.parse import urlparse
+
+from .gitcmd import _clone_args, _credentials, _execute, _execute_remote, make_public_url
+
+
+
+def _humanish(url):
+    """Return the name of the directory 'git clone' would create for <url>."""
+    path = (urlparse(url).path if "://" in url else url.rpartition(":")[2]).rstrip("/")
+    if path.endswith("/.git"):
+        path = path[:-len("/.git")]
+    name = path.rpartition("/")[2]
+    return name[:-len(".git")] if name.endswith(".git") else name
+
+
+
+def _size(path):
+    """Return the number of bytes used by the files inside <path>."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:  # pragma: no cover
+                pass
+    return total
+
+
+
+class _Lock:
+    """Lock on a mirror of the cache, held through fcntl.flock() on a file next to it."""
+    
+    def __init__(self, path, mode=fcntl.LOCK_EX):
+        self.path = path
+        self.mode = mode
+        self._fd = None
+    
+    
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._fd, self.mode)
+        except OSError:
+            os.close(self._fd)
+            raise
+        return self
+    
+    
+    def downgrade(self):
+        """Let other processes read the mirror, but not update or delete it."""
+        fcntl.flock(self._fd, fcntl.LOCK_SH)
+    
+    
+    def __exit__(self, *_):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+
+
+
+class CloneCache:
+    """Directory of mirror repositories used by clone(..., cache=CloneCache(...)).
+    
+    Parameter:
+        directory : (str) Directory of the cache, created if it does not exist
+        max_size  : (int) Number of bytes above which the least recently used mirrors are
+                          deleted, None for no limit
+        max_age   : (float) Number of seconds during which a mirror is not fetched again, 0 to
+                          fetch on every clone. Clones waiting for a fetch in progress always
+                          reuse it."""
+    
+    def __init__(self, directory, max_size=None, max_age=0):
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+        self.max_age = max_age
+        os.makedirs(self.directory, exist_ok=True)
+    
+    
+    def key(self, url):
+        """Return the key of the mirror of <url>, the credentials of <url> being ignored."""
+        return hashlib.sha256(make_public_url(url).rstrip("/").encode()).hexdigest()[:32]
+    
+    
+    def path(self, url):
+        """Return the path of the mirror of <url>, which may not exist yet."""
+        return os.path.join(self.directory, self.key(url) + ".git")
+    
+    
+    def _files(self, key):
+        """Return the paths of the mirror, the lock file and the file whose modification time is
+        the one of the last fetch, for <key>."""
+        base = os.path.join(self.directory, key)
+        return base + ".git", base + ".lock", base + ".fetched"
+    
+    
+    def _update(self, url, username, password, progress, timeout, requested):
+        """Create or fetch the mirror of <url>, the exclusive lock being held. Skip the fetch if
+        another one completed after <requested> (in ns) or less than max_age seconds ago.
+        
+        Return the Result of git, None if nothing had to be done."""
+        mirror, _, fetched = self._files(self.key(url))
+        remote = _credentials(url, username, password) or url
+        
+        if os.path.isdir(mirror):
+            try:
+                last = os.stat(fetched).st_mtime_ns
+            except FileNotFoundError:
+                last = 0
+            if last >= requested or time.time() - last / 1e9 < self.max_age:
+                return None
+            args = ["fetch", "--prune", "--", remote, "+refs/*:refs/*"]
+            result = _execute_remote(args, mirror, password, progress, timeout)
+        else:
+            tmp = tempfile.mkdtemp(prefix=os.path.basename(mirror) + ".tmp-", dir=self.directory)
+            try:
+                result = _execute_remote(["clone", "--mirror", "--", remote, tmp], self.directory,
+                                         password, progress, timeout)
+                if not result.returncode:
+                    _execute(["config", "remote.origin.url", make_public_url(url)], tmp)
+                    _execute(["config", "uploadpack.allowFilter", "true"], tmp)
+                    os.rename(tmp, mirror)
+            finally:
+                if os.path.isdir(tmp):
+                    shutil.rmtree(tmp, ignore_errors=True)
+        
+        if not result.returncode:
+            with open(fetched, "w"):
+                pass
+        return result
+    
+    
+    def clone(self, path, url, to=None, username=None, password=None, progress=None,
+              timeout=None, depth=None, shallow_since=None, single_branch=False, branch=None,
+              filter=None, no_checkout=False, sparse=False):
+        """Clone <url> through the cache, see gitcmd.clone() for the parameters.
+        
+        The mirror of <url> is created or refreshed, then the working copy is cloned from it and
+        its 'origin' set to <url> (including the credentials, as a regular clone would).
+        
+        Return:
+            The Result of the failing fetch if the mirror could not be refreshed, the Result of
+            the clone of the working copy otherwise."""
+        key = self.key(url)
+        mirror, lock, _ = self._files(key)
+        requested = int(time.time() * 1e9)
+        
+        with _Lock(lock) as held:
+            result = self._update(url, username, password, progress, timeout, requested)
+            if result is not None and result.returncode:
+                return result
+            os.utime(lock)  # Last use, for the eviction
+            held.downgrade()
+            
+            # Shallow and partial clones are ignored for local paths, the 'file://' transport is
+            # used for them instead of hardlinks
+            source = "file://" + mirror if depth or shallow_since or filter else mirror
+            to = to or _humanish(make_public_url(url))
+            args = _clone_args(source, to, None, None, depth, shallow_since, single_branch,
+                               branch, filter, no_checkout, sparse)
+            result = _execute_remote(args, path, None, progress, timeout)
+        
+        if not result.returncode:
+            remote = _credentials(url, username, password) or url
+            _execute(["remote", "set-url", "origin", remote],
+                     os.path.join(os.path.abspath(path), to))
+            self.evict(keep=key)
+        return result
+    
+    
+    def entries(self):
+        """Return a list of (key, path, size, last_use) for every mirror of the cache, the least
+        recently used first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".git"):
+                continue
+            key = name[:-len(".git")]
+            mirror, lock, _ = self._files(key)
+            try:
+                last_use = os.stat(lock).st_mtime
+            except FileNotFoundError:  # pragma: no cover
+                last_use = 0
+            entries.append((key, mirror, _size(mirror), last_use))
+        return sorted(entries, key=lambda e: e[3])
+    
+    
+    def evict(self, keep=None):
+        """Delete the least recently used mirrors until the size of the cache is at most
+        max_size. Mirrors currently in use and the mirror <keep> are never deleted.
+        
+        Return the keys of the deleted mirrors."""
+        if self.max_size is None:
+            return []
+        
+        entries = self.entries()
+        total = sum(e[2] for e in entries)
+        deleted = []
+        for key, mirror, size, _ in entries:
+            if total <= self.max_size:
+                break
+            if key == keep:
+                continue
+            _, lock, fetched = self._files(key)
+            try:
+                with _Lock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB):
+                    shutil.rmtree(mirror, ignore_errors=True)
+                    if os.path.exists(fetched):
+                        os.remove(fetched)
+            except BlockingIOError:  # In use
+                continue
+            total -= size
+            deleted.append(key)
+        return deleted
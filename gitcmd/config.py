@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+""" Cached access to the effective configuration of a repository.
+    
+    The configuration is loaded with a single 'git config --list -z --show-origin', so that
+    system, global, local and worktree files, includes and conditional includes are all handled
+    by git itself. It is then kept until one of the files it was read from (or one of the files
+    git would read if they were created) changes, checking it only costs a few stat() calls."""
+
+import collections
+import os
+import subprocess
+import threading
+import time
+
+from . import instrument, launcher
+
+
+_cache = {}
+_lock = threading.Lock()
+
+# Environment variables changing which configuration git reads
+ENVIRONMENT = ("HOME", "XDG_CONFIG_HOME", "GIT_CONFIG", "GIT_CONFIG_GLOBAL", "GIT_CONFIG_SYSTEM",
+               "GIT_CONFIG_NOSYSTEM", "GIT_CONFIG_PARAMETERS", "GIT_CONFIG_COUNT")
+
+
+Remote = collections.namedtuple("Remote", ["name", "url", "push_url", "fetch"])
+Remote.__doc__ = """Configuration of a remote ('remote.<name>.*').
+    
+    url      : (str) 'remote.<name>.url', None if not set
+    push_url : (str) 'remote.<name>.pushurl', None if not set
+    fetch    : (list) Every 'remote.<name>.fetch' refspec"""
+
+Branch = collections.namedtuple("Branch", ["name", "remote", "merge"])
+Branch.__doc__ = """Configuration of a branch ('branch.<name>.*').
+    
+    remote : (str) 'branch.<name>.remote', None if not set
+    merge  : (str) 'branch.<name>.merge', None if not set"""
+
+
+
+def _normalize(name):
+    """Return the canonical form of the variable <name>: section and key are case-insensitive,
+    the subsection is not."""
+    section, _, rest = name.partition(".")
+    subsection, _, key = rest.rpartition(".")
+    if not key:
+        raise ValueError("Invalid configuration variable name: %r" % name)
+    return ".".join(p for p in (section.lower(), subsection, key.lower()) if p)
+
+
+
+class Config:
+    """Effective configuration of a repository, as listed by 'git config --list'.
+    
+    Parameter:
+        entries : (list) (origin, name, value) tuples in the order given by git, value is None for
+                         a variable without '=' (an implicit boolean true)"""
+    
+    
+    def __init__(self, entries):
+        self.entries = entries
+        self._values = {}
+        for _, name, value in entries:
+            self._values.setdefault(name, []).append(value)
+    
+    
+    def __contains__(self, name):
+        return _normalize(name) in self._values
+    
+    
+    def get(self, name, default=None):
+        """Return the last value of the variable <name> as 'git config --get' would, <default> if
+        it is not set."""
+        values = self._values.get(_normalize(name))
+        return values[-1] if values else default
+    
+    
+    def get_all(self, name):
+        """Return every value of the variable <name> in order, an empty list if it is not set."""
+        return list(self._values.get(_normalize(name), ()))
+    
+    
+    def origin(self, name):
+        """Return the origin (e.g. 'file:/path/to/config') of the last value of <name>, None if it
+        is not set."""
+        name = _normalize(name)
+        for origin, entry, _ in reversed(self.entries):
+            if entry == name:
+                return origin
+        return None
+    
+    
+    def _subsections(self, section):
+        names = []
+        for _, name, _ in self.entries:
+            prefix, _, rest = name.partition(".")
+            subsection = rest.rpartition(".")[0]
+            if prefix == section and subsection and subsection not in names:
+                names.append(subsection)
+        return names
+    
+    
+    def remotes(self):
+        """Return the names of the configured remotes, in order of appearance."""
+        return self._subsections("remote")
+    
+    
+    def remote(self, name='origin'):
+        """Return the Remote <name>, None if it is not configured."""
+        if name not in self.remotes():
+            return None
+        prefix = "remote." + name + "."
+        return Remote(name, self.get(prefix + "url"), self.get(prefix + "pushurl"),
+                      self.get_all(prefix + "fetch"))
+    
+    
+    def branches(self):
+        """Return the names of the branches having a configuration, in order of appearance."""
+        return self._subsections("branch")
+    
+    
+    def branch(self, name):
+        """Return the Branch <name>, None if it has no configuration."""
+        if name not in self.branches():
+            return None
+        prefix = "branch." + name + "."
+        return Branch(name, self.get(prefix + "remote"), self.get(prefix + "merge"))
+
+
+
+def _parse(out, cwd):
+    """Return the entries and the configuration files listed in the output of 'git config --list
+    -z --show-origin'."""
+    entries = []
+    files = set()
+    records = out.split(b"\0")
+    for origin, record in zip(records[::2], records[1::2]):
+        origin = os.fsdecode(origin)
+        name, newline, value = record.decode("utf-8", "replace").partition("\n")
+        entries.append((origin, name, value if newline else None))
+        if origin.startswith("file:"):
+            files.add(os.path.join(cwd, origin[5:]))
+    return entries, files
+
+
+
+def _stamp(paths, env):
+    """Return a value changing whenever one of <paths> is created, deleted or modified, or when
+    the environment changes which files git reads."""
+    stats = []
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+            stats.append((path, stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            stats.append((path, None))
+    env = env if env is not None else os.environ
+    return tuple(stats), tuple(env.get(v) for v in ENVIRONMENT)
+
+
+
+def _candidates(git_dir, common_dir, env):
+    """Return the files git reads by default, whether they exist or not."""
+    env = env if env is not None else os.environ
+    home = env.get("HOME", "")
+    xdg = env.get("XDG_CONFIG_HOME") or os.path.join(home, ".config")
+    return {
+        os.path.join(common_dir, "config"),
+        os.path.join(git_dir, "config.worktree"),
+        os.path.join(git_dir, "HEAD"),  # For 'includeIf "onbranch:..."'
+        os.path.join(home, ".gitconfig"),
+        os.path.join(xdg, "git", "config"),
+    }
+
+
+
+def clear_cache():
+    """Forget every configuration loaded so far."""
+    with _lock:
+        _cache.clear()
+
+
+
+def load(git_dir, common_dir, cwd, env=None, timeout=None):
+    """Return the Config of the repository whose git directory is <git_dir>.
+    
+    The configuration is read once then cached until a file it depends on changes.
+    
+    Parameter:
+        git_dir    : (str) Git directory of the repository
+        common_dir : (str) Common directory of the repository
+        cwd        : (str) Directory inside the repository from where git will be executed
+        env        : (dict) Environment of the git process
+        timeout    : (float) Maximum number of seconds git may run, None for no timeout
+    
+    Raise subprocess.CalledProcessError if git could not read the configuration, or
+    gitcmd.launcher.GitTimeoutError if it was killed after <timeout> seconds."""
+    with _lock:
+        cached = _cache.get(git_dir)
+    if cached is not None and _stamp(cached[0], env) == cached[1]:
+        return cached[2]
+    
+    paths = _candidates(git_dir, common_dir, env)
+    stamp = _stamp(paths, env)  # Taken before reading, a concurrent change triggers a reload
+    args = ["git", "config", "--list", "-z", "--show-origin"]
+    start = time.perf_counter()
+    p = launcher.popen(args, cwd, env)
+    spawned = time.perf_counter()
+    try:
+        out, err = p.communicate(None, timeout)
+    except subprocess.TimeoutExpired:
+        launcher.kill(p)
+        out, err = p.communicate()
+        instrument.record(args[1:], cwd, spawned - start, time.perf_counter() - start,
+                          p.returncode, len(out), len(err))
+        raise launcher.GitTimeoutError(args, timeout, out, err)
+    instrument.record(args[1:], cwd, spawned - start, time.perf_counter() - start, p.returncode,
+                      len(out), len(err))
+    if p.returncode:
+        raise subprocess.CalledProcessError(p.returncode, args, out, stderr=err)
+    
+    entries, files = _parse(out, cwd)
+    if not files <= paths:
+        paths |= files
+        stamp = _stamp(paths, env)
+    config = Config(entries)
+    with _lock:
+        _cache[git_dir] = (paths, stamp, config)
+    return config
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+""" Discovery of the repository containing a path by looking for '.git' entries on the disk, the
+    same way git does, without spawning any process.
+    
+    Handle '.git' directories, '.git' files containing a 'gitdir:' line (linked worktrees and
+    submodules), bare repositories, GIT_CEILING_DIRECTORIES and GIT_DISCOVERY_ACROSS_FILESYSTEM.
+    Repositories configured through GIT_DIR, GIT_WORK_TREE or GIT_COMMON_DIR are not supported,
+    supported() returns False when one of them is set so that the caller can fall back to git."""
+
+import collections
+import os
+import threading
+
+
+# Maximum number of directories kept in the cache, the least recently used being dropped
+MAX_ENTRIES = 65536
+
+_cache = collections.OrderedDict()
+_lock = threading.Lock()
+
+
+
+def supported():
+    """Return False if the environment changes how git finds repositories in a way this module
+    does not handle."""
+    return not any(os.environ.get(v) for v in ("GIT_DIR", "GIT_WORK_TREE", "GIT_COMMON_DIR"))
+
+
+
+def clear_cache():
+    """Forget every repository discovered so far."""
+    with _lock:
+        _cache.clear()
+
+
+
+def _read_gitdir(path):
+    """Return the absolute path contained in the '.git' file <path>, None if it is not valid."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            line = f.readline().rstrip("\r\n")
+    except (OSError, UnicodeDecodeError):
+        return None
+    if not line.startswith("gitdir: "):
+        return None
+    return os.path.join(os.path.dirname(path), line[len("gitdir: "):])
+
+
+
+def _common_dir(git_dir):
+    """Return the common directory of <git_dir>, given by its 'commondir' file in worktrees."""
+    try:
+        with open(os.path.join(git_dir, "commondir"), encoding="utf-8") as f:
+            return os.path.join(git_dir, f.readline().rstrip("\r\n"))
+    except OSError:
+        return git_dir
+
+
+
+def _is_git_directory(git_dir):
+    """Return the common directory of <git_dir> if it looks like a git directory, None
+    otherwise."""
+    common_dir = _common_dir(git_dir)
+    if (os.path.isfile(os.path.join(git_dir, "HEAD"))
+            and os.path.isdir(os.path.join(common_dir, "objects"))
+            and os.path.isdir(os.path.join(common_dir, "refs"))):
+        return common_dir
+    return None
+
+
+
+def _ceilings():
+    ceilings = set()
+    for ceiling in os.environ.get("GIT_CEILING_DIRECTORIES", "").split(os.pathsep):
+        if os.path.isabs(ceiling):
+            ceilings.add(os.path.realpath(ceiling))
+    return ceilings
+
+
+
+def _check(directory):
+    """Return (git_dir, common_dir, top_level) if <directory> is the top-level directory of a
+    repository or a git directory, None otherwise."""
+    dotgit = os.path.join(directory, ".git")
+    if os.path.isdir(dotgit):
+        git_dir = dotgit
+    elif os.path.isfile(dotgit):
+        git_dir = _read_gitdir(dotgit)
+    else:
+        git_dir = None
+    
+    if git_dir is not None:
+        common_dir = _is_git_directory(git_dir)
+        if common_dir is not None:
+            return os.path.realpath(git_dir), os.path.realpath(common_dir), directory
+    
+    common_dir = _is_git_directory(directory)
+    if common_dir is not None:
+        return directory, os.path.realpath(common_dir), None
+    
+    return None
+
+
+
+def _valid(directory, entry):
+    """Check that a cached entry still matches the disk."""
+    mtime, result = entry
+    try:
+        return (os.stat(directory).st_mtime_ns == mtime
+                and os.path.isfile(os.path.join(result[0], "HEAD")))
+    except OSError:
+        return False
+
+
+
+def discover(path):
+    """Return the repository containing <path>.
+    
+    Every directory traversed is cached along with its modification time, looking up another path
+    of an already discovered repository is thus usually a single stat() call. Entries are keyed by
+    the value of GIT_CEILING_DIRECTORIES and GIT_DISCOVERY_ACROSS_FILESYSTEM as well, and at most
+    MAX_ENTRIES directories are kept. Use clear_cache() if a repository is created between a
+    directory and its already discovered parent repository.
+    
+    Return:
+        (git_dir, common_dir, top_level), all absolute paths. top_level is None if <path> is not
+        inside a working tree (bare repository or inside a git directory).
+        None if <path> is not inside a repository."""
+    path = os.path.realpath(path)
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    if not os.path.isdir(directory):
+        return None
+    
+    ceilings = _ceilings()
+    across = os.environ.get("GIT_DISCOVERY_ACROSS_FILESYSTEM", "").lower() in ("1", "true", "yes")
+    device = os.stat(directory).st_dev
+    settings = (frozenset(ceilings), across)
+    traversed = []
+    result = None
+    
+    while True:
+        with _lock:
+            entry = _cache.get((settings, directory))
+            if entry is not None:
+                _cache.move_to_end((settings, directory))
+        if entry is not None and _valid(directory, entry):
+            result = entry[1]
+            break
+        
+        stat = os.stat(directory)
+        traversed.append((directory, stat.st_mtime_ns))
+        result = _check(directory)
+        if result is not None:
+            break
+        
+        parent = os.path.dirname(directory)
+        if (parent == directory or parent in ceilings
+                or (not across and os.stat(parent).st_dev != device)):
+            return None
+        directory = parent
+    
+    with _lock:
+        for directory, mtime in traversed:
+            _cache[(settings, directory)] = (mtime, result)
+            _cache.move_to_end((settings, directory))
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return result
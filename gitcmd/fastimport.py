@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+""" Long-lived 'git fast-import' process used to write many commits to a repository without
+    spawning git processes or rewriting an index for each of them.
+        
+        with BulkCommitWriter('/path/to/repo', 'snapshots') as writer:
+            for snapshot in snapshots:
+                writer.commit('Snapshot ' + snapshot.name, {'data.json': snapshot.data},
+                              date=snapshot.date)
+        writer.commits  # Object names of the commits, in order
+    
+    Blobs, trees and commits are streamed to git, which writes them into a pack. The reference is
+    only updated at checkpoints and on exit."""
+
+import datetime
+import itertools
+import subprocess
+import tempfile
+import threading
+import time
+
+from . import instrument
+from .gitcmd import RefConflictError, Repository, _check, _environment
+
+
+# Number of 'get-mark' commands written before their answers are read, so that the pipes never
+# fill up
+_BATCH = 512
+
+
+
+def _path(path):
+    """Return <path> encoded as expected by fast-import, C-style quoted if needed.
+    
+    Raise ValueError if <path> is not a valid path inside a repository, fast-import accepting
+    some of them (e.g. '../file')."""
+    if not path or "\0" in path or any(part in ("", ".", "..", ".git") for part in path.split("/")):
+        raise ValueError("'%s' is not a valid path inside a repository" % path)
+    if path.startswith('"') or "\n" in path:
+        escaped = path.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        path = '"' + escaped + '"'
+    return path.encode()
+
+
+
+def _date(date=None):
+    """Return <date> (a datetime, default to now) in the raw format of git: '<epoch> <+hhmm>'.
+    Naive datetimes are considered local."""
+    date = date or datetime.datetime.now()
+    if date.tzinfo is None or date.utcoffset() is None:
+        timestamp = int(time.mktime(date.timetuple()))
+        offset = time.localtime(timestamp).tm_gmtoff
+    else:
+        timestamp = int(date.timestamp())
+        offset = int(date.utcoffset().total_seconds())
+    minutes = offset // 60
+    sign = "-" if minutes < 0 else "+"
+    return "%d %s%02d%02d" % (timestamp, sign, abs(minutes) // 60, abs(minutes) % 60)
+
+
+
+class BulkCommitWriter:
+    """Write commits on top of each other to <ref> through a single 'git fast-import' process.
+    
+    The process is started on the first commit. <ref> is updated to the last commit by
+    checkpoint() and close(), only if it is a fast-forward: if <ref> was moved by someone else in
+    the meantime, RefConflictError is raised and <ref> is left untouched. If an exception is
+    raised inside the 'with' block, git is killed without updating <ref>.
+    
+    The committer is taken from the configuration of the repository ('user.name' and
+    'user.email'), falling back to the author of each commit. Calls are serialized with a lock, a
+    BulkCommitWriter can thus be shared between threads.
+    
+    Parameter:
+        path   : (str) Path inside the repository
+        ref    : (str) Branch (e.g. 'master') or reference (e.g. 'refs/heads/master') to write to,
+                       created if it does not exist
+        parent : (str) Commit on top of which the first commit is written, default to the commit
+                       <ref> points to. The first commit is a root commit if <ref> does not
+                       exist."""
+    
+    ARGS = ["git", "fast-import", "--quiet", "--done"]
+    
+    
+    def __init__(self, path, ref, parent=None):
+        self._repository = Repository(path)
+        self.path = self._repository._path(None)
+        self.ref = ref if ref.startswith("refs/") else "refs/heads/" + ref
+        config = self._repository.config
+        self._committer = (config.get("user.name"), config.get("user.email"))
+        if parent is None:
+            parent = self._repository.resolve(self.ref)
+        else:
+            parent = _check(["rev-parse", "--verify", "--quiet", parent + "^{commit}"], self.path)
+        
+        self.parent = parent
+        self.commits = []
+        self._pending = []
+        self._marks = itertools.count(1)
+        self._process = None
+        self._started = None
+        self._stderr = None
+        self._lock = threading.Lock()
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, kind, *_):
+        if kind is None:
+            self.close()
+        else:
+            self.abort()
+    
+    
+    def _start(self):
+        if self._process is None:
+            self._stderr = tempfile.TemporaryFile()
+            start = time.perf_counter()
+            self._process = subprocess.Popen(
+                self.ARGS, cwd=self.path, env=_environment(), stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE, stderr=self._stderr
+            )
+            self._started = (start, time.perf_counter())
+        return self._process
+    
+    
+    def _stopped(self):
+        """Report the process, which has exited, to gitcmd.instrument, and return its standard
+        error."""
+        start, spawned = self._started
+        instrument.record(self.ARGS[1:], self.path, spawned - start,
+                          time.perf_counter() - start, self._process.returncode)
+        self._stderr.seek(0)
+        err = self._stderr.read()
+        self._stderr.close()
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:  # pragma: no cover
+            pass
+        self._process.stdout.close()
+        self._process = None
+        return err
+    
+    
+    def _failed(self):
+        """Kill fast-import and raise subprocess.CalledProcessError with its standard error."""
+        process = self._process
+        process.kill()
+        process.wait()
+        raise subprocess.CalledProcessError(process.returncode, self.ARGS, stderr=self._stopped())
+    
+    
+    def _write(self, data):
+        process = self._start()
+        try:
+            process.stdin.write(data)
+        except BrokenPipeError:
+            self._failed()
+    
+    
+    def _resolve(self):
+        """Return the object names of the commits written since the last call, in order."""
+        names = []
+        for i in range(0, len(self._pending), _BATCH):
+            batch = self._pending[i:i + _BATCH]
+            self._write(b"".join(b"get-mark :%d\n" % mark for mark in batch))
+            try:
+                self._process.stdin.flush()
+            except BrokenPipeError:
+                self._failed()
+            for _ in batch:
+                line = self._process.stdout.readline()
+                if not line:
+                    self._failed()
+                names.append(line.decode().strip())
+        self._pending = []
+        self.commits += names
+        return names
+    
+    
+    def _check_ref(self, names, err=b""):
+        """Raise RefConflictError if <ref> does not point to the last commit of <names>."""
+        if names and self._repository.resolve(self.ref) != names[-1]:
+            raise RefConflictError(1, self.ARGS, stderr=err or ("'%s' was updated by someone else"
+                                                                % self.ref).encode())
+    
+    
+    @staticmethod
+    def _identity(name, mail, date):
+        if any(c in value for value in (name, mail) for c in "<>\n"):
+            raise ValueError("Name and mail cannot contain '<', '>' or a newline")
+        return "%s <%s> %s" % (name, mail, date)
+    
+    
+    def commit(self, log, files=None, deletions=(), name=None, mail=None, date=None):
+        """Write a commit on top of the previous one.
+        
+        Parameter:
+            log       : (str) Message of the commit
+            files     : (dict) Content (bytes, or str encoded in UTF-8) of every file to write,
+                               keyed by their path relative to the root of the repository. Files
+                               are written as regular files (mode 100644).
+            deletions : (iterable) Paths, relative to the root of the repository, to delete
+            name      : (str) Name of the author, default to the committer
+            mail      : (str) Mail of the author, default to the committer
+            date      : (datetime) Date of the commit, default to now
+        
+        Return:
+            The mark (an int) of the commit. Its object name is added to commits once
+            checkpoint() or close() has been called.
+        
+        Raise ValueError if no author can be determined or if a path is not valid,
+        subprocess.CalledProcessError if git exited."""
+        if bool(name) != bool(mail):
+            raise ValueError("Name must be provided if mail is given" if mail
+                             else "Mail must be provided if name is given")
+        if not name:
+            name, mail = self._committer
+            if not (name and mail):
+                raise ValueError("Name and mail must be given if 'user.name' and 'user.email' "
+                                 "are not configured")
+        committer = self._committer if all(self._committer) else (name, mail)
+        date = _date(date)
+        log = log.encode()
+        
+        data = [
+            ("author %s\n" % self._identity(name, mail, date)).encode(),
+            ("committer %s\n" % self._identity(committer[0], committer[1], date)).encode(),
+            b"data %d\n" % len(log), log, b"\n",
+        ]
+        for path, content in (files or {}).items():
+            if isinstance(content, str):
+                content = content.encode()
+            data += [b"M 100644 inline " + _path(path) + b"\n",
+                     b"data %d\n" % len(content), content, b"\n"]
+        data += [b"D " + _path(path) + b"\n" for path in deletions]
+        
+        with self._lock:
+            mark = next(self._marks)
+            header = b"commit %s\nmark :%d\n" % (self.ref.encode(), mark)
+            if self._process is None and self.parent:  # Continue from the parent commit
+                data.insert(5, b"from %s\n" % self.parent.encode())
+            self._write(header + b"".join(data) + b"\n")
+            self._pending.append(mark)
+        return mark
+    
+    
+    def checkpoint(self):
+        """Make git write the pack and update <ref> to the last commit.
+        
+        Return:
+            The object names of the commits written since the last checkpoint, in order. Raise
+            RefConflictError if <ref> was moved by someone else."""
+        with self._lock:
+            if self._process is None:
+                return []
+            self._write(b"checkpoint\n")
+            names = self._resolve()  # Answered once the checkpoint is done
+            try:
+                self._check_ref(names)
+            except RefConflictError:
+                self._kill()
+                raise
+            self.parent = self.commits[-1] if self.commits else self.parent
+            return names
+    
+    
+    def close(self):
+        """Stop git once the pack is written and <ref> updated.
+        
+        Return:
+            The object names of the commits written since the last checkpoint, in order. Raise
+            RefConflictError if <ref> was moved by someone else, subprocess.CalledProcessError if
+            git failed."""
+        with self._lock:
+            if self._process is None:
+                return []
+            names = self._resolve()
+            self._write(b"done\n")
+            process = self._process
+            try:
+                process.stdin.close()
+            except BrokenPipeError:  # pragma: no cover
+                pass
+            process.wait()
+            err = self._stopped()
+            self._check_ref(names, err)
+            if process.returncode:
+                raise subprocess.CalledProcessError(process.returncode, self.ARGS, stderr=err)
+            self.parent = self.commits[-1] if self.commits else self.parent
+            return names
+    
+    
+    def _kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._stopped()
+        self._pending = []
+    
+    
+    def abort(self):
+        """Kill git, the commits written since the last checkpoint are discarded and <ref> is not
+        updated."""
+        with self._lock:
+            self._kill()
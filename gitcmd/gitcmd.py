@@ -2,97 +2,920 @@
 
 """ A light git interface in python of the basic command.
     
-    Does not work with git version prior to 2.7"""
+    Requires git 2.17 or later, for 'git status --porcelain=v2 --no-ahead-behind' and
+    'git worktree remove'. Some arguments need a more recent version:
+        - clone(..., filter=...)                                        : git 2.19
+        - gitcmd.trace.profile()                                        : git 2.22
+        - clone(..., sparse=True)                                       : git 2.25
+        - add(), commit(), checkout() and reset() given a list of paths : git 2.26"""
 
 import locale
+import logging
 import os
 import re
+import datetime
 import subprocess
+import tempfile
+import threading
+import time
 from urllib.parse import urlparse, urlunparse
 
+from . import (config as _config, discovery, instrument, launcher, log as _log, refs,
+               status as _status, trace, worktree as _worktree)
+from .ignore import IgnoreChecker
+from .launcher import GitTimeoutError
+from .objects import ObjectReader
+from .result import Result
+from .stream import Progress, Stream
+
 
 # Can be override to specify git language. Should be in the form 'lang.encoding'.
 # For instance : 'en-US.UTF-8'
 GIT_LANG = 'en-US.UTF-8'
 
+# Default timeout, in seconds, of the functions spawning git. Can be overridden for a single call
+# through their <timeout> argument. None means that git may run forever.
+TIMEOUT = None
+
+
+logger = logging.getLogger(__name__)
+
+
 
 class NotInRepositoryError(Exception):
     pass
 
 
 
-def in_repository(path, ignore=True):
-    """Return True if path is inside a repository, False if not.
+class RefConflictError(subprocess.CalledProcessError):
+    """Raised by write_commit() when the reference was updated by someone else since it was
+    read. The commit has been written but is not referenced by anything."""
+
+
+
+def _directory(path):
+    """Return the directory from where a git command concerning <path> should be executed."""
+    path = os.path.abspath(path)
+    return path if os.path.isdir(path) else os.path.dirname(path)
+
+
+
+def _entry(path):
+    """Return the name of <path> relative to the directory returned by _directory()."""
+    return "." if os.path.isdir(path) else os.path.basename(path)
+
+
+
+def _paths(path):
+    """Return <path> unchanged if it is a single path, or as a list if it is an iterable of paths.
+    
+    Raise ValueError if the iterable is empty."""
+    if path is None or isinstance(path, (str, bytes)) or hasattr(path, "__fspath__"):
+        return path
+    paths = list(path)
+    if not paths:
+        raise ValueError("At least one path must be given")
+    return paths
+
+
+
+def _pathspec(args, path):
+    """Return <args> followed by the entry of <path>, or by the options making git read the
+    pathspecs from its standard input if <path> is a list of paths."""
+    if isinstance(path, list):
+        return args + ["--pathspec-from-file=-", "--pathspec-file-nul"]
+    return args + ["--", _entry(path)]
+
+
+
+def _timeout(timeout):
+    """Return <timeout>, or the default TIMEOUT if it is None."""
+    return TIMEOUT if timeout is None else timeout
+
+
+
+def _environment(env=None):
+    """Return the environment in which git is executed, updated with <env> if given.
+    
+    Git's language is set to GIT_LANG and terminal prompts are disabled, git thus fails instead
+    of waiting for credentials which will never come."""
+    environment = dict(os.environ)
+    environment["LANGUAGE"] = GIT_LANG
+    environment["GIT_TERMINAL_PROMPT"] = "0"
+    if env:
+        environment.update(env)
+    return environment
+
+
+
+def _timeout_error(args, timeout, output=None, stderr=None):
+    """Return the GitTimeoutError of git executed with <args>, the passwords contained in URLs
+    being masked in its arguments and in the output written before git was killed."""
+    return GitTimeoutError(instrument.sanitize(["git"] + list(args)), timeout,
+                           instrument.mask(output, args), instrument.mask(stderr, args))
+
+
+
+def _execute(args, path, env=None, input=None, timeout=None):
+    """Execute git with the arguments <args> from the directory containing <path>.
     
-    If <in_ignore> is set to False, will also return False if the path is inside a repository but
-    is ignored by a .gitignore.
-    """
-    cwd = os.getcwd()
+    Git is executed directly, without any shell, arguments are thus never interpreted and do not
+    need to be quoted. The directory is given to the child process instead of changing the working
+    directory of the current process, making this function safe to use from several threads at
+    once.
+    
+    The time needed to spawn git and the total duration of the call are logged on the DEBUG level
+    of the 'gitcmd.gitcmd' logger, and reported to gitcmd.instrument. Inside a
+    gitcmd.trace.profile() block, git's trace2 events are also captured. If gitcmd.launcher has
+    been started, git is spawned by its helper process.
+    
+    Git is started in its own process group. If it does not exit within <timeout> seconds, the
+    whole group is killed, including processes started by git (ssh, remote helpers, credential
+    helpers...), and GitTimeoutError is raised.
     
+    Parameter:
+        args    : (list) Arguments given to git, e.g. ['status', '--short']
+        path    : (str) Path from where git will be executed
+        env     : (dict) Variables added to the environment of git, see _environment()
+        input   : (bytes) Data sent to git's standard input
+        timeout : (float) Maximum number of seconds git may run, default to TIMEOUT
+    
+    Return:
+        (return_code, stdout, stderr, profile), both stderr and stdout are bytes, profile being
+        the gitcmd.trace.Profile of git inside a gitcmd.trace.profile() block, None otherwise"""
+    timeout = _timeout(timeout)
+    capture = trace.capture()
+    if capture is not None:
+        env = dict(env or {}, **capture.environment)
+    
+    start = time.perf_counter()
+    p = launcher.popen(["git"] + list(args), _directory(path), _environment(env),
+                       subprocess.DEVNULL if input is None else subprocess.PIPE)
+    spawned = time.perf_counter()
     try:
-        if os.path.isdir(path):
-            os.chdir(path)
-            path = "."
-        else:
-            os.chdir(os.path.dirname(path))
-            path = os.path.basename(path)
-        cmd = 'git rev-parse 2> /dev/null > /dev/null'
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        p.communicate()
-        ret = p.returncode == 0
-        if not ignore:
-            cmd = 'git check-ignore ' + path + ' 2> /dev/null > /dev/null'
-            p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-            p.communicate()
-            ret &= p.returncode == 1  # return code is 1 if a file is not ignored
-    finally:
-        os.chdir(cwd)
+        out, err = p.communicate(input, timeout)
+    except subprocess.TimeoutExpired:
+        launcher.kill(p)
+        out, err = p.communicate()
+        instrument.record(args, _directory(path), spawned - start, time.perf_counter() - start,
+                          p.returncode, len(out), len(err), capture and capture.finish())
+        logger.warning("git %s: killed after %ss", args[0], timeout)
+        raise _timeout_error(args, timeout, out, err)
+    end = time.perf_counter()
+    
+    logger.debug("git %s: spawned in %.3fms, returned %d in %.3fms", args[0],
+                 (spawned - start) * 1000, p.returncode, (end - start) * 1000)
+    profile = capture and capture.finish()
+    instrument.record(args, _directory(path), spawned - start, end - start, p.returncode,
+                      len(out), len(err), profile)
+    return p.returncode, out, err, profile
+
+
+
+def _iterate(args, path, env=None, timeout=None):
+    """Execute git like _execute(), yielding its standard output by chunks as it is read.
+    
+    Git's standard error is read once its standard output is closed. If the iteration is
+    interrupted, git is killed.
+    
+    Raise subprocess.CalledProcessError, once the whole output has been yielded, if git returned
+    a non-zero code, or GitTimeoutError if git was killed because it did not exit within
+    <timeout> seconds (default to TIMEOUT)."""
+    timeout = _timeout(timeout)
+    capture = trace.capture()
+    if capture is not None:
+        env = dict(env or {}, **capture.environment)
+    
+    start = time.perf_counter()
+    p = launcher.popen(["git"] + list(args), _directory(path), _environment(env))
+    spawned = time.perf_counter()
+    read, err = 0, b""
+    expired = threading.Event()
+    
+    def expire():
+        expired.set()
+        launcher.kill(p)
+    
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
     
-    return ret
+    try:
+        for chunk in iter(lambda: p.stdout.read1(65536), b""):
+            read += len(chunk)
+            yield chunk
+        err = p.stderr.read()
+        p.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if p.poll() is None:
+            launcher.kill(p)
+            p.wait()
+        p.stdout.close()
+        p.stderr.close()
+        end = time.perf_counter()
+        instrument.record(args, _directory(path), spawned - start, end - start, p.returncode,
+                          read, len(err), capture and capture.finish())
+    
+    logger.debug("git %s: spawned in %.3fms, returned %d in %.3fms", args[0],
+                 (spawned - start) * 1000, p.returncode, (end - start) * 1000)
+    if expired.is_set():
+        raise _timeout_error(args, timeout, stderr=err)
+    if p.returncode:
+        raise subprocess.CalledProcessError(p.returncode, ["git"] + list(args), stderr=err)
 
 
 
-def top_level(path):
-    """Return the absolute path of the top-level directory."""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
+def _decode(ret, out, err, profile=None):
+    """Return the Result of a git command, its output being decoded when it is accessed."""
+    return Result(ret, out, err, profile=profile)
+
+
+
+def _decode_remote(ret, out, err, profile=None, password=None):
+    """Return the Result of a git command reaching a remote, masking <password> if given."""
+    return Result(ret, out, err, password, bool(ret) and b"terminal prompts disabled" in err,
+                  profile=profile)
+
+
+
+def _stream(args, path, password=None, stall_timeout=None, timeout=None):
+    """Return a Stream over the output of git executed with <args> and '--progress' from the
+    directory containing <path>."""
+    args = args[:1] + ["--progress"] + args[1:]
+    return Stream(args, _directory(path), _environment(), password, stall_timeout,
+                  _timeout(timeout))
+
+
+
+def _execute_remote(args, path, password=None, progress=None, timeout=None):
+    """Execute a git command reaching a remote, see _execute() and _decode_remote().
     
-    cwd = os.getcwd()
+    If <progress> is given, git's output is streamed and progress(report) is called for every
+    Progress reported by git. Progress reports are not included in stderr.
     
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
+    Return:
+        A gitcmd.result.Result (return_code, stdout, stderr)"""
+    if progress is None:
+        return _decode_remote(*_execute(args, path, timeout=timeout), password=password)
+    
+    stream = _stream(args, path, password, timeout=timeout)
+    out, err = [], []
+    for event in stream:
+        if isinstance(event, Progress):
+            progress(event)
         else:
-            os.chdir(os.path.dirname(path))
-        cmd = "git rev-parse --show-toplevel"
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-    finally:
-        os.chdir(cwd)
+            (out if event.stream == "stdout" else err).append(event.text + "\n")
     
-    return p.returncode, out.decode().strip("\n"), err.decode()
+    out, err = "".join(out), "".join(err)
+    private = bool(stream.returncode) and "terminal prompts disabled" in err
+    return Result(stream.returncode, out, err, private=private, profile=stream.profile)
+
+
+
+def _credentials(url, username, password, scheme=""):
+    """Return <url> containing <username> and <password>, None if no credentials are given.
+    
+    <scheme> is used if <url> does not contain any.
+    
+    Raise ValueError if only one of <username> and <password> is given."""
+    if username and password:
+        url = urlparse(url)
+        scheme = url.scheme or scheme
+        return ((scheme + "://" if scheme else "")
+                + username + ":" + password + "@" + url.netloc + url.path)
+    elif not (username or password):
+        return None
+    raise ValueError("Password must be provided if username is given" if username
+                     else "Username must be provided if password is given")
+
 
 
+def _commit_args(path, log, name=None, mail=None):
+    if name and mail:
+        return _pathspec(["commit", "-m", log, "--author", name + " <" + mail + ">"], path)
+    elif not (name or mail):
+        return _pathspec(["commit", "-m", log], path)
+    raise ValueError("Name must be provided if mail is given" if mail
+                     else "Mail must be provided if name is given")
 
-def remote_url(path, remote='origin'):
-    """Return the remote's URL (default 'origin') of the repository pointed by path."""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
+
+
+def _check(args, path, env=None, input=None, timeout=None):
+    """Execute git like _execute(), raise subprocess.CalledProcessError if it fails.
     
-    cwd = os.getcwd()
+    Return:
+        The standard output of git, stripped of its trailing newline, as a str"""
+    ret, out, err, _ = _execute(args, path, env, input, timeout)
+    if ret:
+        raise subprocess.CalledProcessError(ret, ["git"] + list(args), out, err)
+    return out.decode().rstrip("\n")
+
+
+
+def _identity(name=None, mail=None):
+    """Return the environment setting the author of a commit to <name> and <mail>."""
+    if name and mail:
+        return {"GIT_AUTHOR_NAME": name, "GIT_AUTHOR_EMAIL": mail}
+    elif not (name or mail):
+        return {}
+    raise ValueError("Name must be provided if mail is given" if mail
+                     else "Mail must be provided if name is given")
+
+
+
+def _checkout_args(path, branch=None, new=False):
+    return (_pathspec(["checkout"], path) if not branch
+            else ["checkout", branch] if not new
+            else ["checkout", "-b", branch])
+
+
+
+def _reset_args(path, mode="mixed", commit='HEAD'):
+    if mode and mode not in ["soft", "mixed", "hard", "merge", "keep"]:
+        raise ValueError("Mode must be one of the following: "
+                         + "'soft', 'mixed', 'hard', 'merge' or 'keep'.")
+    return _pathspec(["reset", "--" + mode, commit], path)
+
+
+
+def _shallow_args(depth=None, shallow_since=None):
+    """Return the options of 'git clone' / 'git pull' limiting the history to <depth> commits
+    and / or to the commits more recent than <shallow_since> (a str or a datetime)."""
+    args = []
+    if depth is not None:
+        if isinstance(depth, bool) or not isinstance(depth, int) or depth < 1:
+            raise ValueError("Depth must be a positive integer")
+        args.append("--depth=%d" % depth)
+    if shallow_since is not None:
+        if isinstance(shallow_since, (datetime.date, datetime.datetime)):
+            shallow_since = shallow_since.isoformat()
+        args.append("--shallow-since=" + shallow_since)
+    return args
+
+
+
+def _clone_args(url, to=None, username=None, password=None, depth=None, shallow_since=None,
+                single_branch=False, branch=None, filter=None, no_checkout=False, sparse=False):
+    args = ["clone"] + _shallow_args(depth, shallow_since)
+    if single_branch:
+        args.append("--single-branch")
+    if branch:
+        args += ["--branch", branch]
+    if filter:
+        args.append("--filter=" + filter)
+    if no_checkout:
+        args.append("--no-checkout")
+    if sparse:
+        args.append("--sparse")
+    args += ["--", _credentials(url, username, password) or url]
+    if to:
+        args.append(to)
+    return args
+
+
+
+def _worktree_add_args(to, commit=None, branch=None, detach=False, force=False):
+    if branch and detach:
+        raise ValueError("Branch and detach cannot be given together")
+    args = ["worktree", "add"]
+    if force:
+        args.append("--force")
+    if detach:
+        args.append("--detach")
+    if branch:
+        args += ["-b", branch]
+    args += ["--", to]
+    if commit:
+        args.append(commit)
+    return args
+
+
+
+def _pull_options(depth=None, unshallow=False):
+    if depth is not None and unshallow:
+        raise ValueError("Depth and unshallow cannot be given together")
+    return _shallow_args(depth) + (["--unshallow"] if unshallow else [])
+
+
+
+class Repository:
+    """A git repository, resolved once from any path inside of it.
     
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
+    The top-level directory, the git directory and the common directory (which differs from the
+    git directory in linked worktrees) are discovered at creation by looking for the '.git' entry
+    on the disk (see gitcmd.discovery), falling back to 'git rev-parse' when the environment
+    overrides the discovery. They are kept for the lifetime of the object, every method then only
+    spawns the git command it wraps.
+    
+    Every method taking a <path> default to the top-level directory of the repository. Relative
+    paths are interpreted relatively to the current working directory, as in the module-level
+    functions.
+    
+    Objects are read through a 'git cat-file --batch' process, and paths are checked against the
+    ignore rules through a 'git check-ignore --stdin' process. Both are started on their first use
+    and kept until close() is called. A Repository can be used as a context manager to close them
+    automatically.
+    
+    Raise NotInRepositoryError if <path> is not inside a repository."""
+    
+    
+    def __init__(self, path):
+        found = discovery.discover(path) if discovery.supported() else self._rev_parse(path)
+        if found is None:
+            raise NotInRepositoryError("'" + path + "' is not inside a repository")
+        
+        self.git_dir, self.common_dir, self.top_level = found
+        self._reader = ObjectReader(self._path(None), _environment())
+        self._ignore = IgnoreChecker(self._path(None), _environment())
+    
+    
+    @staticmethod
+    def _rev_parse(path):
+        """Return (git_dir, common_dir, top_level) of the repository containing <path> using
+        'git rev-parse', None if <path> is not inside a repository."""
+        args = ["rev-parse", "--git-dir", "--git-common-dir", "--is-inside-work-tree",
+                "--show-cdup"]
+        ret, out, _, _ = _execute(args, path)
+        if ret:
+            return None
+        
+        directory = _directory(path)
+        git_dir, common_dir, inside, cdup = (out.decode().split("\n") + [""])[:4]
+        return (os.path.realpath(os.path.join(directory, git_dir)),
+                os.path.realpath(os.path.join(directory, common_dir)),
+                os.path.realpath(os.path.join(directory, cdup)) if inside == "true" else None)
+    
+    
+    def __repr__(self):
+        return "<Repository '%s'>" % (self.top_level or self.git_dir)
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, *_):
+        self.close()
+    
+    
+    def close(self):
+        """Stop the long-lived processes started by this repository."""
+        self._reader.close()
+        self._ignore.close()
+    
+    
+    @property
+    def bare(self):
+        """True if the repository does not have a working tree."""
+        return self.top_level is None
+    
+    
+    @property
+    def worktree(self):
+        """True if the repository is a linked worktree (see 'git worktree')."""
+        return self.git_dir != self.common_dir
+    
+    
+    def _path(self, path):
+        return path if path is not None else (self.top_level or self.git_dir)
+    
+    
+    def _relative(self, path):
+        """Return <path> relative to the top-level directory, as expected by '<rev>:<path>'.
+        
+        Paths given to a bare repository are already considered relative to its root. Only the
+        parent directory is resolved, so that a symbolic link designates the link itself."""
+        if self.bare:
+            return path
+        path = os.path.join(os.path.realpath(os.path.dirname(path)), os.path.basename(path))
+        path = os.path.relpath(path, self.top_level)
+        return path.replace(os.sep, "/")
+    
+    
+    def read_file(self, path, rev="HEAD", timeout=None):
+        """Return the content of the file at <path> in the revision <rev> as bytes.
+        
+        Raise ValueError if <path> does not point to a file in <rev>, or GitTimeoutError if it
+        could not be read within <timeout> seconds (default to TIMEOUT)."""
+        kind, content = self._reader.read(rev + ":" + self._relative(path), _timeout(timeout))
+        if kind != "blob":
+            raise ValueError("'%s' is not a file in '%s'" % (path, rev))
+        return content
+    
+    
+    def read_files(self, paths, rev="HEAD"):
+        """Return the content of every file of <paths> in the revision <rev>.
+        
+        Every file is read through the same git process.
+        
+        Return:
+            A dict mapping each path to its content as bytes, or to None if the path does not
+            point to a file in <rev>."""
+        contents = {}
+        for path in paths:
+            kind, content = self._reader.read(rev + ":" + self._relative(path))
+            contents[path] = content if kind == "blob" else None
+        return contents
+    
+    
+    def is_ignored(self, path):
+        """Return True if <path> is ignored by a .gitignore."""
+        ret, _, _, _ = _execute(["check-ignore", "--", _entry(path)], path)
+        return ret != 1  # return code is 1 if a file is not ignored
+    
+    
+    def filter_ignored(self, paths):
+        """Check every path of <paths> against the ignore rules, see filter_ignored()."""
+        paths = list(paths)
+        for i, match in enumerate(self._ignore.check([self._relative(p) for p in paths])):
+            yield match._replace(path=paths[i])
+    
+    
+    @property
+    def config(self):
+        """Effective configuration of the repository (see gitcmd.config.Config), loaded with a
+        single git process then cached until one of the configuration files changes."""
+        return self._config()
+    
+    
+    def _config(self, timeout=None):
+        """Return the effective configuration of the repository, see config, git being killed
+        after <timeout> seconds (default to TIMEOUT) if it has to be read again."""
+        return _config.load(self.git_dir, self.common_dir, self._path(None), _environment(),
+                            _timeout(timeout))
+    
+    
+    def remote_url(self, remote='origin', path=None, timeout=None):
+        """Return the remote's URL (default 'origin'), see remote_url()."""
+        try:
+            url = self._config(timeout).get("remote." + remote + ".url")
+        except subprocess.CalledProcessError as e:
+            return Result(e.returncode, b"", e.stderr)
+        return Result(1) if url is None else Result(0, url)
+    
+    
+    def set_url(self, url, remote='origin', path=None, timeout=None):
+        """Set the url of remote to <url>, see set_url()."""
+        return _decode(*_execute(["remote", "set-url", remote, url], self._path(path),
+                                 timeout=timeout))
+    
+    
+    def _target(self, path):
+        """Return the path from where git must be executed for a command taking <path>, and the
+        data to send to its standard input.
+        
+        If <path> is a list of paths, git is executed from the top-level directory and the
+        paths are sent NUL-separated to its standard input, see _pathspec()."""
+        if isinstance(path, list):
+            pathspecs = b"".join(os.fsencode(self._relative(p)) + b"\0" for p in path)
+            return self._path(None), pathspecs
+        return path, None
+    
+    
+    def add(self, path=None, timeout=None):
+        """Add the file pointed by path to the index, see add()."""
+        path = self._path(_paths(path))
+        cwd, input = self._target(path)
+        return _decode(*_execute(_pathspec(["add"], path), cwd, input=input, timeout=timeout))
+    
+    
+    def commit(self, log, name=None, mail=None, path=None, timeout=None):
+        """Record changes to the repository using log and -m option, see commit()."""
+        path = self._path(_paths(path))
+        cwd, input = self._target(path)
+        return _decode(*_execute(_commit_args(path, log, name, mail), cwd, input=input,
+                                 timeout=timeout))
+    
+    
+    def checkout(self, branch=None, new=False, path=None, timeout=None):
+        """Switch branches or restore working tree files, see checkout()."""
+        path = self._path(_paths(path))
+        if branch and isinstance(path, list):
+            path = self._path(None)  # Paths are not used when switching branches
+        cwd, input = self._target(path)
+        return _decode(*_execute(_checkout_args(path, branch, new), cwd, input=input,
+                                 timeout=timeout))
+    
+    
+    def status(self, path=None, timeout=None):
+        """Show the working tree status, see status()."""
+        return _decode(*_execute(["status"], self._path(path), timeout=timeout))
+    
+    
+    def status_entries(self, path=None, untracked=None, ignore_submodules=None, branch=True,
+                       timeout=None):
+        """Return the status as a generator of entries, see status_entries()."""
+        if untracked is not None and untracked not in _status.UNTRACKED:
+            raise ValueError("Untracked must be one of the following: 'no', 'normal' or 'all'.")
+        if ignore_submodules is not None and ignore_submodules not in _status.IGNORE_SUBMODULES:
+            raise ValueError("Ignore_submodules must be one of the following: "
+                             + "'none', 'untracked', 'dirty' or 'all'.")
+        
+        args = ["status", "--porcelain=v2", "-z"]
+        if untracked is not None:
+            args.append("--untracked-files=" + untracked)
+        if branch:
+            args += ["--branch", "--no-ahead-behind"]
+        if ignore_submodules is not None:
+            args.append("--ignore-submodules=" + ignore_submodules)
+        return _status.parse(_iterate(args, self._path(path), timeout=timeout))
+    
+    
+    def branch(self, path=None, timeout=None):
+        """List branches, see branch()."""
+        return _decode(*_execute(["branch"], self._path(path), timeout=timeout))
+    
+    
+    def current_branch(self, path=None, timeout=None):
+        """Get current branch name, see current_branch().
+        
+        HEAD and the references are read directly from the git directory (see gitcmd.refs),
+        'git rev-parse' is only spawned in the cases the result of git cannot be reproduced."""
+        branch = refs.current_branch(self.git_dir, self.common_dir)
+        if branch is not None:
+            return Result(0, branch)
+        return _decode(*_execute(["rev-parse", "--abbrev-ref", "HEAD"], self._path(path),
+                                 timeout=timeout))
+    
+    
+    def resolve(self, name="HEAD"):
+        """Return the object name pointed to by the reference <name> (e.g. 'HEAD',
+        'refs/heads/master'), None if it does not exist.
+        
+        The reference is read directly from the git directory, following symbolic references."""
+        if refs.supported(self.common_dir):
+            return refs.resolve(self.git_dir, self.common_dir, name)
+        ret, out, _ = _decode(*_execute(["rev-parse", "-q", "--verify", name], self._path(None)))
+        return None if ret else out
+    
+    
+    def log(self, rev_range=None, paths=None, max_count=None, since=None, skip=None, body=False,
+            cursor=None, timeout=None):
+        """Return the history as an iterable of entries, see log()."""
+        args = ["log", "-z", "--no-show-signature", "--format=" + _log.FORMAT[bool(body)]]
+        for name, value in (("max-count", max_count), ("skip", skip)):
+            if value is not None:
+                if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                    raise ValueError("%s must be a non-negative integer" % name.capitalize())
+        # Skipped commits are walked by the Page, so that the cursor continues after them
+        skip = skip or 0
+        if max_count is not None:
+            args.append("--max-count=%d" % (skip + max_count))
+        if since is not None:
+            if isinstance(since, (datetime.date, datetime.datetime)):
+                since = since.isoformat()
+            args.append("--since=" + since)
+        
+        paths = _paths(paths)
+        if paths is not None:
+            args.append("--parents")  # Parents are rewritten to the commits shown
+            paths = [self._relative(p) for p in (paths if isinstance(paths, list) else [paths])]
+        
+        if cursor is not None:
+            revisions = cursor.split()
+            if not revisions or not all(_log.CURSOR.match(r) for r in revisions):
+                raise ValueError("Invalid cursor: %r" % cursor)
         else:
-            os.chdir(os.path.dirname(path))
-        cmd = "git config --get remote." + remote + ".url"
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-    finally:
-        os.chdir(cwd)
+            revisions = [rev_range] if rev_range else []
+        
+        cwd = self._path(None)
+        
+        def resolve():
+            listed = revisions
+            if cursor is None:
+                out = _check(["rev-parse", "--revs-only", rev_range or "HEAD"], cwd,
+                             timeout=timeout)
+                listed = out.split("\n")
+            # The tips of a history limited to some paths are not necessarily shown, they would
+            # be walked again
+            start = [r for r in listed if r and not r.startswith("^")] if paths is None else []
+            return start, [r[1:] for r in listed if r.startswith("^")]
+        
+        chunks = _iterate(args + revisions + ["--"] + (paths or []), cwd, timeout=timeout)
+        return _log.Page(chunks, bool(body), max_count, resolve, skip)
+    
+    
+    def reset(self, mode="mixed", commit='HEAD', path=None, timeout=None):
+        """Reset current HEAD to the specified state, see reset()."""
+        path = self._path(_paths(path))
+        cwd, input = self._target(path)
+        return _decode(*_execute(_reset_args(path, mode, commit), cwd, input=input,
+                                 timeout=timeout))
+    
+    
+    def write_commit(self, ref, log, files=None, deletions=(), name=None, mail=None,
+                     parent=None, timeout=None):
+        """Write a commit without touching the working tree or the index, see write_commit()."""
+        identity = _identity(name, mail)
+        if ref != "HEAD" and not ref.startswith("refs/"):
+            ref = "refs/heads/" + ref
+        files = dict(files or {})
+        cwd = self._path(None)
+        
+        old = self.resolve(ref)
+        parent = old if parent is None else parent
+        if parent is not None:
+            parent = _check(["rev-parse", "--verify", "--quiet", parent + "^{commit}"], cwd,
+                            timeout=timeout)
+        
+        with tempfile.TemporaryDirectory(prefix="gitcmd-index-") as directory:
+            env = {"GIT_INDEX_FILE": os.path.join(directory, "index"), "GIT_LITERAL_PATHSPECS": "1"}
+            _check(["read-tree", parent or "--empty"], cwd, env, timeout=timeout)
+            
+            # Keep the executable bit of the modified files
+            modes = {}
+            if parent is not None and files:
+                out = _check(["ls-files", "--stage", "-z", "--"] + list(files), cwd, env,
+                             timeout=timeout)
+                for entry in filter(None, out.split("\0")):
+                    info, _, path = entry.partition("\t")
+                    modes[path] = info.split(" ")[0]
+            
+            entries = []
+            for path, content in files.items():
+                if isinstance(content, str):
+                    content = content.encode()
+                blob = _check(["hash-object", "-w", "--stdin"], cwd, input=content,
+                              timeout=timeout)
+                mode = modes.get(path) if modes.get(path) == "100755" else "100644"
+                entries.append("%s %s\t%s\0" % (mode, blob, path))
+            if parent is not None:
+                entries += ["0 %s\t%s\0" % ("0" * len(parent), path) for path in deletions]
+            
+            _check(["update-index", "-z", "--index-info"], cwd, env,
+                   "".join(entries).encode(), timeout)
+            tree = _check(["write-tree"], cwd, env, timeout=timeout)
+        
+        args = ["commit-tree", tree] + (["-p", parent] if parent else []) + ["-F", "-"]
+        commit = _check(args, cwd, identity, log.encode(), timeout)
+        
+        args = ["update-ref", "-m", "commit: " + log.split("\n")[0], ref, commit, old or ""]
+        ret, out, err, _ = _execute(args, cwd, timeout=timeout)
+        if ret:
+            cls = RefConflictError if self.resolve(ref) != old else subprocess.CalledProcessError
+            raise cls(ret, ["git"] + args, out, err)
+        return commit
+    
+    
+    def _pull_args(self, url, username, password, path, depth=None, unshallow=False):
+        """Return the arguments of 'git pull' and None, or None and a (return_code, stdout,
+        stderr) tuple describing why they could not be computed."""
+        options = _pull_options(depth, unshallow)
+        if not url:
+            ret, url, err = self.remote_url(path=path)
+            if ret:  # pragma: no cover
+                return None, (ret, url, "No url was given and couldn't retrieve origin's URL: "
+                              + err)
+        
+        url = _credentials(url, username, password, "file")
+        return ["pull"] + options + ([url] if url else []), None
+    
+    
+    def _push_args(self, url, username, password, path):
+        """Return the arguments of 'git push' and None, or None and a (return_code, stdout,
+        stderr) tuple describing why they could not be computed."""
+        if not url:
+            ret, url, err = self.remote_url(path=path)
+            if ret:  # pragma: no cover
+                return None, (ret, url, "No url was given and couldn't retrieve origin's URL: "
+                              + err)
+        
+        ret, branch, err = self.current_branch(path)
+        if ret:  # pragma: no cover
+            return None, (ret, branch, "Couldn't retrieve current branch name \n" + err)
+        
+        return ["push", "-u", _credentials(url, username, password) or "origin", branch], None
+    
+    
+    def pull(self, url=None, username=None, password=None, path=None, progress=None,
+             timeout=None, depth=None, unshallow=False):
+        """Fetch from and integrate with another repository or a local branch, see pull()."""
+        path = self._path(path)
+        args, error = self._pull_args(url, username, password, path, depth, unshallow)
+        if error:  # pragma: no cover
+            return error
+        return _execute_remote(args, path, password, progress, timeout)
+    
+    
+    def push(self, url=None, username=None, password=None, path=None, progress=None,
+             timeout=None):
+        """Update remote refs along with associated objects, see push()."""
+        path = self._path(path)
+        args, error = self._push_args(url, username, password, path)
+        if error:  # pragma: no cover
+            return error
+        return _execute_remote(args, path, password, progress, timeout)
+    
+    
+    def stream_pull(self, url=None, username=None, password=None, path=None,
+                    stall_timeout=None, timeout=None, depth=None, unshallow=False):
+        """Streaming version of pull(), see stream_pull()."""
+        path = self._path(path)
+        args, error = self._pull_args(url, username, password, path, depth, unshallow)
+        if error:  # pragma: no cover
+            raise ValueError(error[2])
+        return _stream(args, path, password, stall_timeout, timeout)
+    
+    
+    def stream_push(self, url=None, username=None, password=None, path=None,
+                    stall_timeout=None, timeout=None):
+        """Streaming version of push(), see stream_push()."""
+        path = self._path(path)
+        args, error = self._push_args(url, username, password, path)
+        if error:  # pragma: no cover
+            raise ValueError(error[2])
+        return _stream(args, path, password, stall_timeout, timeout)
+    
+    
+    def show_last_revision(self, path, timeout=None):
+        """Show the last revision of the file at path, see show_last_revision()."""
+        if not os.path.isfile(path):
+            raise ValueError("Error: '%s' is a directory" % path)
+        
+        try:
+            content = self.read_file(path, timeout=timeout)
+        except ValueError:
+            return Result(128, "", "fatal: path '%s' does not exist in 'HEAD'\n"
+                          % self._relative(path))
+        return Result(0, content)
+    
+    
+    def worktree_add(self, to, commit=None, branch=None, detach=False, force=False, path=None,
+                     timeout=None):
+        """Create a linked worktree, see worktree_add()."""
+        args = _worktree_add_args(to, commit, branch, detach, force)
+        return _decode(*_execute(args, self._path(path), timeout=timeout))
+    
+    
+    def worktree_list(self, path=None, timeout=None):
+        """List the worktrees, see worktree_list()."""
+        return _decode(*_execute(["worktree", "list"], self._path(path), timeout=timeout))
+    
+    
+    def worktree_entries(self, path=None, timeout=None):
+        """Return the worktrees as a list of entries, see worktree_entries()."""
+        args = ["worktree", "list", "--porcelain"]
+        ret, out, err = _decode(*_execute(args, self._path(path), timeout=timeout))
+        if ret:
+            raise subprocess.CalledProcessError(ret, ["git"] + args, out, err)
+        return _worktree.parse(out)
+    
+    
+    def worktree_remove(self, worktree, force=False, path=None, timeout=None):
+        """Remove a linked worktree, see worktree_remove()."""
+        args = ["worktree", "remove"] + (["--force"] if force else []) + ["--", worktree]
+        return _decode(*_execute(args, self._path(path), timeout=timeout))
+    
+    
+    def worktree_prune(self, expire=None, path=None, timeout=None):
+        """Prune the information of deleted worktrees, see worktree_prune()."""
+        args = ["worktree", "prune"]
+        if expire is not None:
+            if isinstance(expire, (datetime.date, datetime.datetime)):
+                expire = expire.isoformat()
+            args += ["--expire", expire]
+        return _decode(*_execute(args, self._path(path), timeout=timeout))
+
+
+
+def _repository(path):
+    """Return the Repository containing <path>, or its first path if <path> is a list of paths."""
+    return Repository(path[0] if isinstance(path, list) else path)
+
+
+
+def in_repository(path, ignore=True):
+    """Return True if path is inside a repository, False if not.
+    
+    If <in_ignore> is set to False, will also return False if the path is inside a repository but
+    is ignored by a .gitignore.
+    """
+    try:
+        repository = Repository(path)
+    except NotInRepositoryError:
+        return False
     
-    return p.returncode, out.decode().strip("\n"), err.decode()
+    return ignore or not repository.is_ignored(path)
+
+
+
+def top_level(path):
+    """Return the absolute path of the top-level directory."""
+    repository = Repository(path)
+    if repository.bare:
+        return Result(128, "", "fatal: this operation must be run in a work tree\n")
+    return Result(0, repository.top_level)
+
+
+
+def remote_url(path, remote='origin', timeout=None):
+    """Return the remote's URL (default 'origin') of the repository pointed by path, see pull()
+    for <timeout>."""
+    return Repository(path).remote_url(remote, path, timeout)
 
 
 
@@ -109,101 +932,56 @@ def make_public_url(url):
 
 
 
-def set_url(path, url, remote='origin'):
-    """Set the url of remote to <url>."""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
-    
-    cwd = os.getcwd()
-    
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
-        else:
-            os.chdir(os.path.dirname(path))
-        cmd = "git remote set-url " + remote + " " + url
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-    finally:
-        os.chdir(cwd)
-    
-    return p.returncode, out.decode().strip("\n"), err.decode()
+def set_url(path, url, remote='origin', timeout=None):
+    """Set the url of remote to <url>, see pull() for <timeout>."""
+    return Repository(path).set_url(url, remote, path, timeout)
 
 
 
-def add(path):
+def add(path, timeout=None):
     """Add the file pointed by path to the index.
     
     if path point to a directory, update the index to match the current state of the directory as
     a whole
     
-    Return:
-        (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
-    
-    cwd = os.getcwd()
+    <path> can also be an iterable of paths inside the same repository. They are then given to a
+    single git process through its standard input ('--pathspec-from-file'), the index being
+    written only once whatever their number. The same applies to commit(), checkout() and
+    reset().
     
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
-            path = "."
-        else:
-            os.chdir(os.path.dirname(path))
-            path = os.path.basename(path)
-        cmd = "LANGUAGE=" + GIT_LANG + " git add " + path
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-    finally:
-        os.chdir(cwd)
+    See pull() for <timeout>.
     
-    return p.returncode, out.decode().strip("\n"), err.decode()
+    Return:
+        (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
+    path = _paths(path)
+    return _repository(path).add(path, timeout)
 
 
 
-def commit(path, log, name=None, mail=None):
+def commit(path, log, name=None, mail=None, timeout=None):
     """Record changes to the repository using log and -m option.
     
+    Only changes of <path>, a path or an iterable of paths (see add()), are recorded. See pull()
+    for <timeout>.
+    
     Return:
         (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
-    
-    cwd = os.getcwd()
-    
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
-            path = "."
-        else:
-            os.chdir(os.path.dirname(path))
-            path = os.path.basename(path)
-        if name and mail:
-            cmd = ("LANGUAGE=" + GIT_LANG + " git commit " + path + " -m " + '"' + log + '"'
-                   + (' --author "' + name + ' <' + mail + '>"' if name else ""))
-        elif not (name or mail):
-            cmd = "LANGUAGE=" + GIT_LANG + " git commit " + path + " -m " + '"' + log + '"'
-        else:
-            raise ValueError("Name must be provided if mail is given" if mail
-                             else "Mail must be provided if name is given")
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-    finally:
-        os.chdir(cwd)
-    
-    return p.returncode, out.decode().strip("\n"), err.decode()
+    path = _paths(path)
+    return _repository(path).commit(log, name, mail, path, timeout)
 
 
 
-def checkout(path, branch=None, new=False):
+def checkout(path, branch=None, new=False, timeout=None):
     """Switch branches or restore working tree files.
     
     Parameter:
         path: (str)
-            if no branch given - Path to the entry wich should be restored.
+            if no branch given - Path to the entry wich should be restored, or an iterable of
+                                 paths (see add()).
             if branch is given - Path from where git checkout command will be executed.
         branch: (str) name of the branch which we should checkout to
         new: (bool) Whether we should create a new branch (True) or not (False)
+        timeout: (float) Maximum number of seconds git may run, see pull()
     
     
     Restore working tree files pointed by path if no <branch> is given.
@@ -211,123 +989,188 @@ def checkout(path, branch=None, new=False):
     
     Return:
         (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
-    
-    cwd = os.getcwd()
-    
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
-            path = "."
-        else:
-            os.chdir(os.path.dirname(path))
-            path = os.path.basename(path)
-        cmd = ("LANGUAGE=" + GIT_LANG + " git checkout " + path if not branch
-               else "LANGUAGE=" + GIT_LANG + " git checkout " + branch if not new
-               else "LANGUAGE=" + GIT_LANG + " git checkout -b " + branch)
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-    finally:
-        os.chdir(cwd)
-    
-    return p.returncode, out.decode().strip("\n"), err.decode()
+    path = _paths(path)
+    return _repository(path).checkout(branch, new, path, timeout)
 
 
 
-def status(path):
+def status(path, timeout=None):
     """Show the working tree status.
     
     Parameter:
         url : (str) path to the repository
+        timeout : (float) Maximum number of seconds git may run, see pull()
     
     Return:
         (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
+    return Repository(path).status(path, timeout)
+
+
+
+def status_entries(path, untracked=None, ignore_submodules=None, branch=True, timeout=None):
+    """Show the working tree status as a generator of entries.
     
-    cwd = os.getcwd()
+    Run 'git status --porcelain=v2 -z' and parse its output as it is read. The output of git is
+    neither localized nor does it include hints, and ahead / behind counts are only computed if
+    HEAD and its upstream point to the same commit (they are None otherwise).
     
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
-        else:
-            os.chdir(os.path.dirname(path))
-        cmd = "LANGUAGE=" + GIT_LANG + " git status"
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-    finally:
-        os.chdir(cwd)
+    Parameter:
+        path              : (str) path to the repository
+        untracked         : (str) How to show untracked files: 'no', 'normal' (directories are
+                                  not recursed into) or 'all', default to the repository's
+                                  configuration ('normal' if not set). 'all' lists every file
+                                  of untracked directories, which is much slower on large trees.
+        ignore_submodules : (str) Ignore changes to submodules: 'none', 'untracked', 'dirty' or
+                                  'all', default to the repository's configuration
+        branch            : (bool) Whether to yield a gitcmd.status.StatusBranch first
+        timeout           : (float) Maximum number of seconds git may run, see pull()
     
-    return p.returncode, out.decode().strip("\n"), err.decode()
+    Return:
+        A generator yielding a gitcmd.status.StatusBranch first if <branch> is True, then a
+        gitcmd.status.StatusEntry for every entry. Raise subprocess.CalledProcessError if git
+        fails, GitTimeoutError if it was killed after <timeout> seconds."""
+    return Repository(path).status_entries(path, untracked, ignore_submodules, branch, timeout)
 
 
 
-def branch(path):
-    """List branches.
+def filter_ignored(path, paths):
+    """Check many paths against the ignore rules of a repository at once.
+    
+    Paths are given to a single 'git check-ignore --stdin -z --non-matching -v' process which
+    streams its answers back, whatever the number of paths. The process is stopped once every
+    path has been checked, use Repository.filter_ignored() to keep it alive between calls.
+    
+    As with 'git check-ignore', tracked files are never considered ignored.
     
     Parameter:
-        url : (str) path to the repository
+        path  : (str) path to the repository
+        paths : (iterable) paths to check, inside the repository
     
     Return:
-        (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
+        A generator yielding a gitcmd.ignore.IgnoreMatch(path, ignored, source, line, pattern) for
+        every path of <paths>, in the same order. Raise subprocess.CalledProcessError if git
+        fails, e.g. because a path is outside of the repository."""
+    repository = Repository(path)
     
-    cwd = os.getcwd()
+    def check():
+        with repository:
+            yield from repository.filter_ignored(paths)
     
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
-        else:
-            os.chdir(os.path.dirname(path))
-        cmd = "LANGUAGE=" + GIT_LANG + " git branch"
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-    finally:
-        os.chdir(cwd)
+    return check()
+
+
+
+def branch(path, timeout=None):
+    """List branches.
+    
+    Parameter:
+        url : (str) path to the repository
+        timeout : (float) Maximum number of seconds git may run, see pull()
     
-    return p.returncode, out.decode().strip("\n"), err.decode()
+    Return:
+        (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
+    return Repository(path).branch(path, timeout)
 
 
 
-def current_branch(path):
+def current_branch(path, timeout=None):
     """Get current branch name
     
     Parameter:
         url : (str) path to the repository
+        timeout : (float) Maximum number of seconds git may run, see pull()
     
     Return:
         (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
+    return Repository(path).current_branch(path, timeout)
+
+
+
+def write_commit(path, ref, log, files=None, deletions=(), name=None, mail=None, parent=None,
+                 timeout=None):
+    """Record a commit of in-memory changes, without touching the working tree or the index.
     
-    cwd = os.getcwd()
+    The tree of <parent> is read into a temporary index, updated with the blobs of <files>
+    ('git hash-object -w --stdin') and <deletions> ('git update-index --index-info'), then
+    committed with 'git commit-tree'. <ref> is finally moved to the new commit with
+    'git update-ref', only if it still points to the commit it pointed to when write_commit() was
+    called, several commits can thus safely be written to different branches at once.
     
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
-        else:
-            os.chdir(os.path.dirname(path))
-        cmd = "LANGUAGE=" + GIT_LANG + " git rev-parse --abbrev-ref HEAD"
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-    finally:
-        os.chdir(cwd)
+    Files keep their executable bit if they already exist in <parent>, new ones are regular files.
+    The committer is taken from the configuration of the repository, as with commit().
     
-    return p.returncode, out.decode().strip("\n"), err.decode()
+    Parameter:
+        path      : (str) Path inside the repository
+        ref       : (str) Branch (e.g. 'master'), reference (e.g. 'refs/heads/master') or 'HEAD'
+                          to update, created if it does not exist
+        log       : (str) Message of the commit
+        files     : (dict) Content (bytes, or str encoded in UTF-8) of every file to write, keyed
+                           by their path relative to the root of the repository
+        deletions : (iterable) Paths, relative to the root of the repository, to delete
+        name      : (str) Name of the author
+        mail      : (str) Mail of the author
+        parent    : (str) Commit on top of which the changes are recorded, default to the commit
+                          <ref> points to. A root commit is written if <ref> does not exist.
+        timeout   : (float) Maximum number of seconds each git command may run, see pull()
+    
+    Return:
+        The object name of the new commit. Raise RefConflictError if <ref> was updated by someone
+        else in the meantime, subprocess.CalledProcessError if git fails, e.g. because <parent>
+        does not exist."""
+    return Repository(path).write_commit(ref, log, files, deletions, name, mail, parent, timeout)
 
 
 
-def reset(path, mode="mixed", commit='HEAD'):
+def log(path, rev_range=None, paths=None, max_count=None, since=None, skip=None, body=False,
+        cursor=None, timeout=None):
+    """Show the history as an iterable of entries.
+    
+    Run 'git log -z' with a fixed format and parse its output as it is read, commits are thus
+    yielded as soon as git has found them and never all kept in memory.
+    
+    The returned gitcmd.log.Page gives, once iterated, the cursor of the next page in its cursor
+    attribute: the commits from which the walk continues. Giving it back to log(), along with the
+    same <paths>, yields the next <max_count> commits without walking the previous ones again:
+    
+        page = gitcmd.log(path, max_count=50)
+        entries = list(page)
+        next_page = gitcmd.log(path, max_count=50, cursor=page.cursor)
+    
+    Cursors are strings of object names, they can be sent to a client and given back later. The
+    commits are the same as those of a single walk as long as commit dates do not go back in time
+    along the history.
+    
+    Parameter:
+        path      : (str) Path inside the repository
+        rev_range : (str) Revision or range to list, e.g. 'master' or 'v1.0..master', default to
+                          HEAD. Ignored if <cursor> is given.
+        paths     : (str or iterable) Only list the commits modifying these paths, absolute or
+                                      relative to the current working directory (see add())
+        max_count : (int) Maximum number of commits to list
+        since     : (str or datetime) Only list the commits more recent than this date
+        skip      : (int) Number of commits walked, but not listed, before the first one
+        body      : (bool) Whether to include the body of the commits
+        cursor    : (str) Cursor of the page to list, see above
+        timeout   : (float) Maximum number of seconds git may run, see pull()
+    
+    Return:
+        A gitcmd.log.Page yielding a gitcmd.log.LogEntry for every commit. Raise ValueError if
+        <cursor> is not valid, subprocess.CalledProcessError if git fails, once every commit has
+        been yielded."""
+    return Repository(path).log(rev_range, paths, max_count, since, skip, body, cursor, timeout)
+
+
+
+def reset(path, mode="mixed", commit='HEAD', timeout=None):
     """Reset current HEAD to the specified state.
     
     Parameter:
-        path   : (str) path the the entry we should be reset.
+        path   : (str) path the the entry we should be reset, or an iterable of paths (see add()).
         mode   : (str) Mode for the reset, should be 'soft', 'mixed', 'hard', 'merge' or 'keep'.
         commit : (str) To which commit the reset should be done. Must be a commit's hash, 'HEAD' for
                        the last commit, to which '~' or '^' can be appended to choose ancestor or
                        parent.
+        timeout : (float) Maximum number of seconds git may run, see pull()
     
     Resets the current branch head to <commit>
     and possibly updates the index (resetting it to the tree of <commit>) and the working tree
@@ -356,228 +1199,207 @@ def reset(path, mode="mixed", commit='HEAD'):
     
     Return:
         (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
-    if mode and mode not in ["soft", "mixed", "hard", "merge", "keep"]:
-        raise ValueError("Mode must be one of the following: "
-                         + "'soft', 'mixed', 'hard', 'merge' or 'keep'.")
-    
-    cwd = os.getcwd()
-    
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
-            path = "."
-        else:
-            os.chdir(os.path.dirname(path))
-            path = os.path.basename(path)
-        cmd = "LANGUAGE=%s git reset --%s %s %s" % (GIT_LANG, mode, commit, path)
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-    finally:
-        os.chdir(cwd)
-    
-    return p.returncode, out.decode().strip("\n"), err.decode()
+    path = _paths(path)
+    return _repository(path).reset(mode, commit, path, timeout)
 
 
 
-def pull(path, url=None, username=None, password=None):
+def pull(path, url=None, username=None, password=None, progress=None, timeout=None, depth=None,
+         unshallow=False):
     """Fetch from and integrate with another repository or a local branch.
     
-    If <url> is not given, will try to get the url of origin.
+    If <url> is not given, will try to get the url of origin. In a shallow repository, <depth>
+    keeps it shallow while <unshallow> fetches the whole history.
     
     Parameter:
         path : (str) Path from where git pull command will be executed
         url  : (str) URL of the remote
         username : (str) Username for authentification if repository is private
         password : (str) Password for authentification if repository is private
+        progress : (callable) Called with every gitcmd.stream.Progress reported by git
+        timeout  : (float) Maximum number of seconds git may run, default to TIMEOUT. On expiry,
+                           git and its children are killed and GitTimeoutError is raised
+        depth    : (int) Only fetch the <depth> most recent commits of the history
+        unshallow : (bool) Fetch the whole history of a shallow repository
     
     Return:
         (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
+    return Repository(path).pull(url, username, password, path, progress, timeout, depth,
+                                 unshallow)
+
+
+
+def stream_pull(path, url=None, username=None, password=None, stall_timeout=None,
+                timeout=None, depth=None, unshallow=False):
+    """Streaming version of pull().
+    
+    Return a gitcmd.stream.Stream yielding git's output as soon as it is written, see pull() for
+    the parameters. If <stall_timeout> is given and git does not write anything for that many
+    seconds, git is killed and TimeoutError is raised during the iteration. If the iteration
+    lasts more than <timeout> seconds, git is killed and GitTimeoutError is raised."""
+    return Repository(path).stream_pull(url, username, password, path, stall_timeout, timeout,
+                                        depth, unshallow)
+
+
+
+def push(path, url=None, username=None, password=None, progress=None, timeout=None):
+    """Update remote refs along with associated objects.
     
-    if not url:
-        ret, url, err = remote_url(path)
-        if ret:  # pragma: no cover
-            return ret, url, "No url was given and couldn't retrieve origin's URL: " + err
+    If <url> is not given, will try to get the url of origin. If <progress> is given, it is called
+    with every gitcmd.stream.Progress reported by git. See pull() for <timeout>.
     
-    cwd = os.getcwd()
+    Return:
+        (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
+    return Repository(path).push(url, username, password, path, progress, timeout)
+
+
+
+def stream_push(path, url=None, username=None, password=None, stall_timeout=None,
+                timeout=None):
+    """Streaming version of push(), see stream_pull()."""
+    return Repository(path).stream_push(url, username, password, path, stall_timeout, timeout)
+
+
+
+def clone(path, url, to=None, username=None, password=None, progress=None, timeout=None,
+          depth=None, shallow_since=None, single_branch=False, branch=None, filter=None,
+          no_checkout=False, sparse=False, cache=None):
+    """Clone a repository into a new directory.
     
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
-        else:
-            os.chdir(os.path.dirname(path))
-        
-        if username and password:
-            url = urlparse(url)
-            cmd = ("LANGUAGE=" + GIT_LANG + " git pull "
-                   + (url.scheme if url.scheme else "file") + "://"
-                   + username + ":" + password + "@" + url.netloc + url.path)
-        elif not (username or password):
-            cmd = "LANGUAGE=" + GIT_LANG + " GIT_TERMINAL_PROMPT=0 git pull"
-        else:
-            raise ValueError("Password must be provided if username is given" if username
-                             else "Username must be provided if password is given")
-        
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-        
-        out = out.decode()
-        err = err.decode()
-        if password:
-            out = out.replace(password, "•" * len(password))
-            err = err.replace(password, "•" * len(password))
+    Shallow (<depth>, <shallow_since>), single-branch and partial (<filter>) clones only transfer
+    and store part of the repository. Local repositories must be given as 'file://' URLs for
+    them to apply, and partial clones require 'uploadpack.allowFilter' on the remote.
     
-    finally:
-        os.chdir(cwd)
+    Parameter:
+        path : (str) Path from where git clone command will be executed
+        url  : (str) URL of the repository
+        to   : (str) Directory to which clone the repository, default is repository's name
+        username : (str) Username for authentification if repository is private
+        password : (str) Password for authentification if repository is private
+        progress : (callable) Called with every gitcmd.stream.Progress reported by git
+        timeout  : (float) Maximum number of seconds git may run, see pull()
+        depth    : (int) Only fetch the <depth> most recent commits, implies <single_branch>
+        shallow_since : (str or datetime) Only fetch the commits more recent than this date
+        single_branch : (bool) Only fetch the history of <branch>, default to the remote's HEAD
+        branch   : (str) Branch (or tag) to check out instead of the remote's HEAD
+        filter   : (str) Objects to omit, fetched on demand later, e.g. 'blob:none' or 'tree:0'
+        no_checkout : (bool) Do not check out HEAD, only its object name is then known
+        sparse   : (bool) Only check out the files at the root of the repository, see
+                          'git sparse-checkout'
+        cache    : (gitcmd.cache.CloneCache) Cache of mirrors to clone from, refreshing the
+                                             mirror of <url> first
     
-    if p.returncode and "terminal prompts disabled" in err:
-        return p.returncode, out, "Repository is private, please provide credentials"
-    return p.returncode, out.strip("\n"), err
+    Return:
+        (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
+    if cache is not None:
+        return cache.clone(path, url, to, username, password, progress, timeout, depth,
+                           shallow_since, single_branch, branch, filter, no_checkout, sparse)
+    args = _clone_args(url, to, username, password, depth, shallow_since, single_branch, branch,
+                       filter, no_checkout, sparse)
+    return _execute_remote(args, path, password, progress, timeout)
 
 
 
-def push(path, url=None, username=None, password=None):
-    """Update remote refs along with associated objects.
+def stream_clone(path, url, to=None, username=None, password=None, stall_timeout=None,
+                 timeout=None, depth=None, shallow_since=None, single_branch=False, branch=None,
+                 filter=None, no_checkout=False, sparse=False):
+    """Streaming version of clone(), see stream_pull() and clone()."""
+    args = _clone_args(url, to, username, password, depth, shallow_since, single_branch, branch,
+                       filter, no_checkout, sparse)
+    return _stream(args, path, password, stall_timeout, timeout)
+
+
+
+def show_last_revision(path, timeout=None):
+    """Show the last revision of the file at path.
     
-    If <url> is not given, will try to get the url of origin.
+    Parameter:
+        path    : (str) - path to the file
+        timeout : (float) - see pull()
     
     Return:
         (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
-    
-    if not url:
-        ret, url, err = remote_url(path)
-        if ret:  # pragma: no cover
-            return ret, url, "No url was given and couldn't retrieve origin's URL: " + err
-    
-    ret, branch, err = current_branch(path)
-    if ret:  # pragma: no cover
-        return ret, branch, "Couldn't retrieve current branch name \n".encode() + err
+    with Repository(path) as repository:
+        return repository.show_last_revision(path, timeout)
+
+
+
+def worktree_add(path, to, commit=None, branch=None, detach=False, force=False, timeout=None):
+    """Create a linked worktree, an additional working tree sharing the objects and references of
+    the repository. Nothing is copied or transferred, each worktree only has its own HEAD, index
+    and checked out files.
     
-    cwd = os.getcwd()
+    As with 'git worktree add', if neither <commit>, <branch> nor <detach> is given, a new branch
+    named after the last component of <to> is created. A branch cannot be checked out in two
+    worktrees at once unless <force> is True.
     
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
-        else:
-            os.chdir(os.path.dirname(path))
-        
-        if username and password:
-            url = urlparse(url)
-            cmd = ("LANGUAGE=" + GIT_LANG + " git push -u "
-                   + (url.scheme + "://" if url.scheme else "")
-                   + username + ":" + password + "@" + url.netloc + url.path
-                   + " " + branch)
-        elif not (username or password):
-            cmd = ("LANGUAGE=" + GIT_LANG
-                   + " GIT_TERMINAL_PROMPT=0 git push -u origin " + branch)
-        else:
-            raise ValueError("Password must be provided if username is given" if username
-                             else "Username must be provided if password is given")
-        
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-        
-        out = out.decode()
-        err = err.decode()
-        if password:
-            out = out.replace(password, "•" * len(password))
-            err = err.replace(password, "•" * len(password))
+    Every function of gitcmd works inside a linked worktree as in the main one.
     
-    finally:
-        os.chdir(cwd)
+    Parameter:
+        path    : (str) Path inside the repository, or inside one of its worktrees
+        to      : (str) Directory of the new worktree, relative to <path>
+        commit  : (str) Commit or branch to check out, default to HEAD
+        branch  : (str) Name of a new branch, created at <commit> and checked out
+        detach  : (bool) Check out <commit> with a detached HEAD
+        force   : (bool) Create the worktree even if the branch is already checked out elsewhere
+        timeout : (float) Maximum number of seconds git may run, see pull()
     
-    if p.returncode and "terminal prompts disabled" in err:
-        return p.returncode, out, "Repository is private, please provide credentials"
-    return p.returncode, out.strip("\n"), err
+    Return:
+        (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
+    return Repository(path).worktree_add(to, commit, branch, detach, force, path, timeout)
 
 
 
-def clone(path, url, to=None, username=None, password=None):
-    """Clone a repository into a new directory.
+def worktree_list(path, timeout=None):
+    """List the worktrees of the repository, the main one first.
     
     Parameter:
-        path : (str) Path from where git clone command will be executed
-        url  : (str) URL of the repository
-        to   : (str) Directory to which clone the repository, default is repository's name
-        username : (str) Username for authentification if repository is private
-        password : (str) Password for authentification if repository is private
+        path    : (str) Path inside the repository, or inside one of its worktrees
+        timeout : (float) Maximum number of seconds git may run, see pull()
     
     Return:
         (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
-    cwd = os.getcwd()
-    
-    try:
-        if os.path.isdir(path):
-            os.chdir(path)
-        else:
-            os.chdir(os.path.dirname(path))
-        
-        if username and password:
-            url = urlparse(url)
-            cmd = ("LANGUAGE=" + GIT_LANG + " git clone "
-                   + (url.scheme + "://" if url.scheme else "")
-                   + username + ":" + password + "@" + url.netloc + url.path)
-        elif not (username or password):
-            cmd = "LANGUAGE=" + GIT_LANG + " GIT_TERMINAL_PROMPT=0 git clone " + url
-        else:
-            raise ValueError("Password must be provided if username is given" if username
-                             else "Username must be provided if password is given")
-        
-        if to:
-            cmd += " " + to
-        
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-        
-        out = out.decode()
-        err = err.decode()
-        if password:
-            out = out.replace(password, "•" * len(password))
-            err = err.replace(password, "•" * len(password))
+    return Repository(path).worktree_list(path, timeout)
+
+
+
+def worktree_entries(path, timeout=None):
+    """List the worktrees of the repository, the main one first, from the output of
+    'git worktree list --porcelain'.
     
-    finally:
-        os.chdir(cwd)
+    Parameter:
+        path    : (str) Path inside the repository, or inside one of its worktrees
+        timeout : (float) Maximum number of seconds git may run, see pull()
     
-    if p.returncode and "terminal prompts disabled" in err:
-        return p.returncode, out, "Repository is private, please provide credentials"
-    return p.returncode, out.strip("\n"), err
+    Return:
+        A list of gitcmd.worktree.Worktree. Raise subprocess.CalledProcessError if git fails."""
+    return Repository(path).worktree_entries(path, timeout)
 
 
 
-def show_last_revision(path):
-    """Show the last revision of the file at path.
+def worktree_remove(path, worktree, force=False, timeout=None):
+    """Remove a linked worktree, deleting its directory.
     
     Parameter:
-        path : (str) - path to the file
+        path     : (str) Path inside the repository, or inside one of its worktrees
+        worktree : (str) Directory of the worktree, relative to <path>
+        force    : (bool) Remove the worktree even if it has modified or untracked files
+        timeout  : (float) Maximum number of seconds git may run, see pull()
     
     Return:
         (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
-    if not in_repository(path):
-        raise NotInRepositoryError("'" + path + "' is not inside a repository")
+    return Repository(path).worktree_remove(worktree, force, path, timeout)
+
+
+
+def worktree_prune(path, expire=None, timeout=None):
+    """Prune the information kept by the repository about worktrees whose directory was deleted.
     
-    cwd = os.getcwd()
-    try:
-        if not os.path.isfile(path):
-            raise ValueError("Error: '%s' is a directory")
-        os.chdir(os.path.dirname(path))
-        path = os.path.basename(path)
-        
-        cmd = "LANGUAGE=" + GIT_LANG + " git show -1 " + path
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        out, err = p.communicate()
-    finally:
-        os.chdir(cwd)
+    Parameter:
+        path    : (str) Path inside the repository, or inside one of its worktrees
+        expire  : (str or datetime) Only prune worktrees deleted before this date
+        timeout : (float) Maximum number of seconds git may run, see pull()
     
-    out = out.decode()
-    if not p.returncode:
-        if '@@' in out:
-            out = [c[1:] for c in out[out.index('@@'):].split('\n')[1:]]
-            out = '\n'.join(out).replace(' No newline at end of file', '')
-        else:
-            out = '\n'.join([c.strip() for c in out.split('\n')[4:-4]])
-    return p.returncode, out.strip("\n"), err.decode()
+    Return:
+        (return_code, stdout, stderr), both stderr and stdout are decoded in UTF-8"""
+    return Repository(path).worktree_prune(expire, path, timeout)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+""" Long-lived 'git check-ignore --stdin' process used to check many paths against the ignore
+    rules of a repository without spawning a new git process for each of them."""
+
+import collections
+import os
+import subprocess
+import threading
+import time
+
+from . import instrument
+
+
+# Number of paths whose answers are read before being yielded, the lock of the checker being
+# held meanwhile
+_BATCH = 1024
+
+
+IgnoreMatch = collections.namedtuple("IgnoreMatch", ["path", "ignored", "source", "line",
+                                                     "pattern"])
+IgnoreMatch.__doc__ = """Result of the check of a path against the ignore rules.
+    
+    path    : The path as it was given
+    ignored : (bool) Whether the path is ignored
+    source  : (str) File containing the last pattern matching the path (e.g. '.gitignore' or
+                    '.git/info/exclude'), None if no pattern matches
+    line    : (int) Line of the pattern in source, None if no pattern matches
+    pattern : (str) Last pattern matching the path, None if no pattern matches. The path is not
+                    ignored if it is a negated pattern ('!pattern')"""
+
+
+
+class IgnoreChecker:
+    """Check paths through a single 'git check-ignore --stdin -z --non-matching -v' process.
+    
+    The process is started on the first check and kept alive until close() is called. Paths are
+    written to its standard input by a thread while the answers are read back, so that the pipes
+    never fill up. Batches of paths are serialized with a lock, an IgnoreChecker can thus be
+    shared between threads.
+    
+    As with 'git check-ignore', tracked files are never considered ignored.
+    
+    Parameter:
+        path : (str) Path from where git check-ignore will be executed, paths given to check()
+                     are relative to it
+        env  : (dict) Environment of the git process"""
+    
+    ARGS = ["git", "check-ignore", "--stdin", "-z", "--non-matching", "--verbose"]
+    
+    
+    def __init__(self, path, env=None):
+        self.path = path
+        self.env = dict(env if env is not None else os.environ, GIT_FLUSH="1")
+        self._process = None
+        self._started = None
+        self._buffer = b""
+        self._lock = threading.Lock()
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, *_):
+        self.close()
+    
+    
+    def _start(self):
+        if self._process is None or self._process.poll() is not None:
+            self._stopped()
+            start = time.perf_counter()
+            self._process = subprocess.Popen(
+                self.ARGS, cwd=self.path, env=self.env, stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            self._started = (start, time.perf_counter())
+            self._buffer = b""
+        return self._process
+    
+    
+    def _stopped(self):
+        """Report the process, which has exited, to gitcmd.instrument."""
+        if self._process is not None:
+            start, spawned = self._started
+            instrument.record(self.ARGS[1:], self.path, spawned - start,
+                              time.perf_counter() - start, self._process.returncode)
+    
+    
+    def _write(self, process, paths):
+        try:
+            for path in paths:
+                process.stdin.write(path + b"\0")
+            process.stdin.flush()
+        except (BrokenPipeError, ValueError):  # Git died or was killed, the reader reports it
+            pass
+    
+    
+    def _fields(self, process, count):
+        """Read the next <count> NUL-terminated fields of the output."""
+        while self._buffer.count(b"\0") < count:
+            data = process.stdout.read1(65536)
+            if not data:
+                process.wait()
+                raise subprocess.CalledProcessError(process.returncode, self.ARGS,
+                                                    stderr=process.stderr.read())
+            self._buffer += data
+        fields = self._buffer.split(b"\0", count)
+        self._buffer = fields.pop()
+        return fields
+    
+    
+    def _batch(self, paths, encoded):
+        """Check <paths> and return the list of their IgnoreMatch, the lock being held."""
+        process = self._start()
+        writer = threading.Thread(target=self._write, args=(process, encoded), daemon=True)
+        writer.start()
+        matches = []
+        try:
+            for path in paths:
+                source, line, pattern, _ = self._fields(process, 4)
+                if not pattern:
+                    matches.append(IgnoreMatch(path, False, None, None, None))
+                else:
+                    matches.append(IgnoreMatch(path, not pattern.startswith(b"!"),
+                                               os.fsdecode(source), int(line),
+                                               os.fsdecode(pattern)))
+        finally:
+            if len(matches) < len(paths):
+                process.kill()  # Unblock the writer before waiting for it
+            writer.join()
+            if len(matches) < len(paths):
+                self._kill()
+        return matches
+    
+    
+    def check(self, paths):
+        """Check every path of <paths> against the ignore rules.
+        
+        Paths are checked by batches of _BATCH, the lock being released before the answers of a
+        batch are yielded: several checks can thus be interleaved, even in the same thread.
+        
+        Parameter:
+            paths : (iterable) Paths to check, str or bytes
+        
+        Return:
+            A generator yielding an IgnoreMatch for every path, in the same order.
+        
+        Raise subprocess.CalledProcessError if git exited, e.g. because a path is outside of the
+        repository."""
+        paths = list(paths)
+        encoded = [os.fsencode(p) for p in paths]
+        if any(b"\0" in p for p in encoded):
+            raise ValueError("Paths cannot contain a NUL character")
+        
+        for i in range(0, len(paths), _BATCH):
+            with self._lock:
+                matches = self._batch(paths[i:i + _BATCH], encoded[i:i + _BATCH])
+            yield from matches
+    
+    
+    def _kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:  # Paths still buffered cannot be flushed to the dead process
+                pass
+            self._process.stdout.close()
+            self._process.stderr.close()
+            self._stopped()
+            self._process = None
+    
+    
+    def close(self):
+        """Stop the git process, it will be started again by the next check."""
+        with self._lock:
+            if self._process is not None:
+                self._process.stdin.close()
+                self._process.wait()
+                self._process.stdout.close()
+                self._process.stderr.close()
+                self._stopped()
+                self._process = None
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+""" Instrumentation of the git processes spawned by gitcmd.
+    
+    Every git process reports a Call once it has exited, which is given to each registered hook
+    and aggregated into per-operation statistics:
+        
+        calls = []
+        with instrument.hook(calls.append):
+            gitcmd.pull('/path/to/repo')
+        print(calls[0].operation, calls[0].duration)
+        
+        instrument.stats()['pull']  # {'count': ..., 'buckets': {...}, ...}
+    
+    Hooks are called from the thread that executed git (or from the event loop for gitcmd.aio),
+    they should thus be fast and thread-safe. An exception raised by a hook is logged and does
+    not interrupt the call."""
+
+import collections
+import logging
+import re
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+_hooks = ()
+_stats = {}
+_lock = threading.Lock()
+
+# Upper bounds, in seconds, of the buckets of the duration histograms
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+
+CREDENTIALS = re.compile(r'(?P<prefix>://[^/@:\s]*:)(?P<password>[^/@\s]+)(?=@)')
+
+# Global options of git taking a value as separate argument
+OPTIONS_WITH_VALUE = ("-c", "-C", "--git-dir", "--work-tree", "--namespace", "--exec-path")
+
+
+Call = collections.namedtuple("Call", ["operation", "argv", "path", "spawn", "duration",
+                                       "returncode", "stdout_bytes", "stderr_bytes",
+                                       "profile"])
+Call.__doc__ = """A git process spawned by gitcmd.
+    
+    operation    : (str) Git command, e.g. 'status'
+    argv         : (list) Arguments given to git, passwords contained in URLs being masked
+    path         : (str) Directory from where git was executed
+    spawn        : (float) Seconds needed to spawn git
+    duration     : (float) Seconds between the call and the end of the process, spawn included
+    returncode   : (int) Return code of git, negative if it was killed by a signal
+    stdout_bytes : (int) Bytes read from git's standard output, None if not counted (long-lived
+                         processes)
+    stderr_bytes : (int) Bytes read from git's standard error, None if not counted
+    profile      : (gitcmd.trace.Profile) Trace2 events of git if it was executed inside a
+                   gitcmd.trace.profile() block, None otherwise"""
+
+
+
+def operation(args):
+    """Return the git command executed with <args>, skipping global options."""
+    args = iter(args)
+    for arg in args:
+        if arg in OPTIONS_WITH_VALUE:
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg
+    return ""
+
+
+
+def sanitize(args):
+    """Return <args> with the passwords contained in URLs masked, as in the output of pull() and
+    push()."""
+    return [CREDENTIALS.sub(lambda m: m.group("prefix") + "•" * len(m.group("password")), a)
+            for a in args]
+
+
+
+def mask(data, args):
+    """Return <data> (bytes, may be None) with the passwords contained in the URLs of <args>
+    masked, see sanitize()."""
+    for arg in args:
+        for match in CREDENTIALS.finditer(arg):
+            password = match.group("password").encode()
+            data = data and data.replace(password, "•".encode() * len(match.group("password")))
+    return data
+
+
+
+def add_hook(callback):
+    """Call callback(call) with a Call for every git process spawned from now on."""
+    global _hooks
+    with _lock:
+        _hooks = _hooks + (callback,)
+
+
+
+def remove_hook(callback):
+    """Stop calling <callback>, raise ValueError if it is not registered."""
+    global _hooks
+    with _lock:
+        hooks = list(_hooks)
+        hooks.remove(callback)
+        _hooks = tuple(hooks)
+
+
+
+class hook:
+    """Context manager calling callback(call) for every git process spawned inside of it."""
+    
+    def __init__(self, callback):
+        self.callback = callback
+    
+    
+    def __enter__(self):
+        add_hook(self.callback)
+        return self.callback
+    
+    
+    def __exit__(self, *_):
+        remove_hook(self.callback)
+
+
+
+class Histogram:
+    """Aggregated statistics of the calls of an operation."""
+    
+    __slots__ = ("count", "errors", "spawn", "duration", "max", "stdout_bytes", "stderr_bytes",
+                 "buckets")
+    
+    
+    def __init__(self):
+        self.count = self.errors = self.stdout_bytes = self.stderr_bytes = 0
+        self.spawn = self.duration = self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+    
+    
+    def add(self, call):
+        self.count += 1
+        self.errors += call.returncode != 0
+        self.spawn += call.spawn
+        self.duration += call.duration
+        self.max = max(self.max, call.duration)
+        self.stdout_bytes += call.stdout_bytes or 0
+        self.stderr_bytes += call.stderr_bytes or 0
+        for i, bound in enumerate(BUCKETS):
+            if call.duration <= bound:
+                self.buckets[i] += 1
+                break
+    
+    
+    def snapshot(self):
+        """Return the statistics as a dict, buckets being cumulative as in Prometheus."""
+        cumulative, buckets = 0, {}
+        for bound, count in zip(BUCKETS, self.buckets):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "spawn_seconds": self.spawn,
+            "duration_seconds": self.duration,
+            "max_seconds": self.max,
+            "stdout_bytes": self.stdout_bytes,
+            "stderr_bytes": self.stderr_bytes,
+            "buckets": buckets,
+        }
+
+
+
+def stats():
+    """Return the statistics aggregated since the start (or the last reset()) for every
+    operation, as a dict mapping the operation to Histogram.snapshot()."""
+    with _lock:
+        return {name: histogram.snapshot() for name, histogram in _stats.items()}
+
+
+
+def reset():
+    """Clear the aggregated statistics."""
+    with _lock:
+        _stats.clear()
+
+
+
+def record(args, path, spawn, duration, returncode, stdout_bytes=None, stderr_bytes=None,
+           profile=None):
+    """Report a git process which has exited to the hooks and the statistics.
+    
+    Parameter:
+        args       : (list) Arguments given to git, without 'git'
+        path       : (str) Directory from where git was executed
+        spawn      : (float) Seconds needed to spawn git
+        duration   : (float) Seconds between the call and the end of the process
+        returncode : (int) Return code of git"""
+    call = Call(operation(args), sanitize(args), path, spawn, duration, returncode, stdout_bytes,
+                stderr_bytes, profile)
+    with _lock:
+        histogram = _stats.get(call.operation)
+        if histogram is None:
+            histogram = _stats[call.operation] = Histogram()
+        histogram.add(call)
+    
+    for callback in _hooks:
+        try:
+            callback(call)
+        except Exception:
+            logger.exception("Instrumentation hook %r failed", callback)
@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+
+""" Optional helper process spawning git on behalf of gitcmd.
+    
+    Spawning a process forks the current one, whose cost (page tables, copy-on-write faults)
+    grows with its memory. Once start() has been called, preferably early while the application is
+    still small, gitcmd sends its commands (argv, cwd, environment, standard input) through a pipe
+    to a small helper process, which spawns git and streams its output back. The cost of spawning
+    git then no longer depends on the memory of the application:
+        
+        from gitcmd import launcher
+        launcher.start()
+        ...
+        gitcmd.status('/path/to/repo')  # Spawned by the helper
+    
+    This module only depends on the standard library, the helper runs it as a script without
+    importing gitcmd."""
+
+import itertools
+import os
+import pickle
+import queue
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+
+_HEADER = struct.Struct("!I")
+
+_launcher = None
+_lock = threading.Lock()
+
+
+
+class GitTimeoutError(subprocess.TimeoutExpired):
+    """Raised when git did not exit before its timeout. Git and the processes it started
+    (ssh, remote helpers, credential helpers...) have been killed.
+    
+    cmd     : (list) Arguments of git
+    timeout : (float) The timeout, in seconds
+    output  : (bytes) Standard output written by git before it was killed, None if unknown
+    stderr  : (bytes) Standard error written by git before it was killed, None if unknown"""
+
+
+
+def _send(stream, lock, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    with lock:
+        stream.write(_HEADER.pack(len(data)) + data)
+        stream.flush()
+
+
+
+def _receive(stream):
+    """Return the next message read from <stream>, None if it has been closed."""
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    size, = _HEADER.unpack(header)
+    data = stream.read(size)
+    if len(data) < size:
+        return None
+    return pickle.loads(data)
+
+
+
+class _Pipe:
+    """Read end of a pipe of a RemoteProcess, fed with the chunks sent by the helper."""
+    
+    def __init__(self):
+        self._chunks = queue.Queue()
+        self._buffer = b""
+        self._eof = False
+    
+    
+    def feed(self, data):
+        """Add <data> to the pipe, b'' closing it."""
+        self._chunks.put(data)
+    
+    
+    def read1(self, size=-1):
+        if not self._buffer and not self._eof:
+            self._buffer = self._chunks.get()
+            self._eof = not self._buffer
+        size = len(self._buffer) if size < 0 else size
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+    
+    
+    def read(self, deadline=None):
+        """Read until the pipe is closed, raise queue.Empty if <deadline> (see time.monotonic())
+        is reached first. Data already read is then returned by the next call."""
+        while not self._eof:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            chunk = self._chunks.get(timeout=timeout)
+            self._eof = not chunk
+            self._buffer += chunk
+        data, self._buffer = self._buffer, b""
+        return data
+    
+    
+    def close(self):
+        pass
+
+
+
+class _Stdin:
+    """Write end of the standard input of a RemoteProcess, sent to the helper once closed."""
+    
+    def __init__(self, process):
+        self._process = process
+        self._data = []
+    
+    
+    def write(self, data):
+        self._data.append(bytes(data))
+        return len(data)
+    
+    
+    def flush(self):
+        pass
+    
+    
+    def close(self):
+        if self._data is not None:
+            self._process._request("stdin", b"".join(self._data))
+            self._data = None
+
+
+
+class RemoteProcess:
+    """Git process spawned by the helper, with the subset of the interface of subprocess.Popen
+    used by gitcmd: stdin (written to git once closed), stdout and stderr (read1(), read() and
+    close()), poll(), wait(), kill() and communicate()."""
+    
+    def __init__(self, launcher, id, args, stdin):
+        self.args = args
+        self.returncode = None
+        self.stdin = _Stdin(self) if stdin == subprocess.PIPE else None
+        self.stdout = _Pipe()
+        self.stderr = _Pipe()
+        self._launcher = launcher
+        self._id = id
+        self._started = threading.Event()
+        self._exited = threading.Event()
+        self._error = None
+        self._out = None
+    
+    
+    def _request(self, kind, payload=None):
+        self._launcher._request(kind, self._id, payload)
+    
+    
+    def _wait_started(self):
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+    
+    
+    def poll(self):
+        return self.returncode
+    
+    
+    def wait(self, timeout=None):
+        if not self._exited.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+    
+    
+    def kill(self):
+        """Kill the process and its process group."""
+        if self.returncode is None:
+            self._request("kill")
+    
+    
+    def communicate(self, input=None, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.stdin is not None:
+            if input:
+                self.stdin.write(input)
+            self.stdin.close()
+        try:
+            if self._out is None:
+                self._out = self.stdout.read(deadline)
+            err = self.stderr.read(deadline)
+        except queue.Empty:
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        self.wait(None if deadline is None else max(deadline - time.monotonic(), 0))
+        out, self._out = self._out, b""
+        return out, err
+
+
+
+class Launcher:
+    """Helper process spawning git on behalf of the current process.
+    
+    Commands are multiplexed over the helper's standard input and output, a Launcher can thus be
+    used from several threads at once. If the helper dies, the commands still running are reported
+    as killed (return code -1) and spawn() raises OSError."""
+    
+    def __init__(self):
+        self._process = subprocess.Popen(
+            [sys.executable, "-I", "-S", os.path.abspath(__file__)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self.pid = os.getpid()
+        self._ids = itertools.count()
+        self._processes = {}
+        self._closed = False
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+    
+    
+    def _request(self, kind, id, payload=None):
+        try:
+            _send(self._process.stdin, self._write_lock, (kind, id, payload))
+        except (BrokenPipeError, ValueError):
+            raise OSError("gitcmd launcher is not running")
+    
+    
+    def _read(self):
+        for kind, id, payload in iter(lambda: _receive(self._process.stdout), None):
+            with self._lock:
+                process = self._processes.get(id)
+            if process is None:  # pragma: no cover
+                continue
+            
+            if kind == "started":
+                process._started.set()
+            elif kind == "stdout":
+                process.stdout.feed(payload)
+            elif kind == "stderr":
+                process.stderr.feed(payload)
+            elif kind in ("exit", "error"):
+                if kind == "error":
+                    process._error = payload
+                    process._started.set()
+                process.returncode = payload if kind == "exit" else -1
+                process._exited.set()
+                with self._lock:
+                    del self._processes[id]
+        
+        # The helper exited, fail the commands still running
+        with self._lock:
+            processes, self._processes = list(self._processes.values()), {}
+            self._closed = True
+        for process in processes:
+            process._error = OSError("gitcmd launcher exited")
+            process.stdout.feed(b"")
+            process.stderr.feed(b"")
+            process.returncode = -1
+            process._started.set()
+            process._exited.set()
+    
+    
+    def alive(self):
+        """Return whether the helper is still running."""
+        return not self._closed and self._process.poll() is None
+    
+    
+    def spawn(self, args, cwd=None, env=None, stdin=None):
+        """Spawn <args> from the helper, with its standard output and error piped, in a new
+        process group.
+        
+        Parameter:
+            args  : (list) Program and its arguments
+            cwd   : (str) Directory from where the program is executed
+            env   : (dict) Environment of the program, default to the one of the helper
+            stdin : subprocess.PIPE to write to its standard input, subprocess.DEVNULL otherwise
+        
+        Return:
+            A RemoteProcess, once the program has been spawned.
+        
+        Raise OSError if the program could not be spawned or if the helper is not running."""
+        id = next(self._ids)
+        process = RemoteProcess(self, id, list(args), stdin)
+        with self._lock:
+            if self._closed:
+                raise OSError("gitcmd launcher is not running")
+            self._processes[id] = process
+        try:
+            self._request("spawn", id, (process.args, cwd, env, stdin == subprocess.PIPE))
+        except OSError:
+            with self._lock:
+                self._processes.pop(id, None)
+            raise
+        process._wait_started()
+        return process
+    
+    
+    def close(self):
+        """Stop the helper, killing the processes still running."""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:  # pragma: no cover
+            pass
+        self._process.wait()
+        self._reader.join()
+        self._process.stdout.close()
+
+
+
+def start():
+    """Start the helper, every git command executed by gitcmd will then be spawned by it.
+    
+    Return the Launcher, calling start() again returns the running one."""
+    global _launcher
+    with _lock:
+        if _launcher is None or not _launcher.alive():
+            _launcher = Launcher()
+        return _launcher
+
+
+
+def stop():
+    """Stop the helper, git will then be spawned by the current process again."""
+    global _launcher
+    with _lock:
+        launcher, _launcher = _launcher, None
+    if launcher is not None:
+        launcher.close()
+
+
+
+def popen(args, cwd, env, stdin=subprocess.DEVNULL):
+    """Spawn <args> with its standard output and error piped, through the helper if it has been
+    started, with subprocess.Popen otherwise.
+    
+    The process is started in its own process group (and session), kill() thus also kills the
+    processes it started.
+    
+    The helper is not used from a process forked after start(), as it belongs to the parent."""
+    launcher = _launcher
+    if launcher is not None and launcher.pid == os.getpid():
+        return launcher.spawn(args, cwd, env, stdin)
+    return subprocess.Popen(args, cwd=cwd, env=env, stdin=stdin, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, start_new_session=True)
+
+
+
+def kill(process):
+    """Kill <process>, returned by popen(), and the processes of its process group."""
+    if isinstance(process, RemoteProcess):
+        process.kill()
+    elif process.poll() is None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:  # pragma: no cover
+            pass
+
+
+
+def _serve(requests, responses):
+    """Main loop of the helper: spawn the programs requested on <requests>, and send their output
+    to <responses>."""
+    lock = threading.Lock()
+    processes = {}
+    
+    def forward(id, name, pipe):
+        for chunk in iter(lambda: pipe.read1(65536), b""):
+            _send(responses, lock, (name, id, chunk))
+        _send(responses, lock, (name, id, b""))
+        pipe.close()
+    
+    def run(id, args, cwd, env, stdin):
+        try:
+            p = subprocess.Popen(args, cwd=cwd, env=env,
+                                 stdin=subprocess.PIPE if stdin else subprocess.DEVNULL,
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                 start_new_session=True)
+        except OSError as e:
+            _send(responses, lock, ("error", id, e))
+            return
+        processes[id] = p
+        _send(responses, lock, ("started", id, None))
+        threads = [threading.Thread(target=forward, args=(id, name, pipe))
+                   for name, pipe in (("stdout", p.stdout), ("stderr", p.stderr))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        p.wait()
+        del processes[id]
+        _send(responses, lock, ("exit", id, p.returncode))
+    
+    def write(p, data):
+        try:
+            p.stdin.write(data)
+            p.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+    
+    for kind, id, payload in iter(lambda: _receive(requests), None):
+        if kind == "spawn":
+            threading.Thread(target=run, args=(id,) + tuple(payload), daemon=True).start()
+        elif kind == "stdin" and id in processes and processes[id].stdin:
+            threading.Thread(target=write, args=(processes[id], payload), daemon=True).start()
+        elif kind == "kill" and id in processes:
+            kill(processes[id])
+    
+    # The parent closed the pipe, it exited or called stop()
+    for p in list(processes.values()):
+        kill(p)
+
+
+
+if __name__ == "__main__":
+    _serve(sys.stdin.buffer, sys.stdout.buffer)
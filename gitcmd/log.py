@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+""" Parser of the output of 'git log -z' with a fixed format, and pages of the history.
+    
+    Each commit is written as NUL-separated fields, commits being terminated by a NUL as well
+    ('-z'). The output is parsed as it is read, commits are thus available as soon as git has
+    found them, whatever the size of the history."""
+
+import re
+
+
+# Fields of a commit, without and with its body
+FIELDS = ["%H", "%P", "%an", "%ae", "%at", "%cn", "%ce", "%ct", "%s"]
+FORMAT = {
+    False: "%x00".join(FIELDS),
+    True: "%x00".join(FIELDS + ["%b"]),
+}
+
+CURSOR = re.compile(r"^\^?[0-9a-f]{40,64}$")
+
+
+
+class LogEntry:
+    """A commit of the history.
+    
+    sha             : (str) Object name of the commit
+    parents         : (tuple) Object names of its parents, rewritten to the commits shown when
+                              the history is limited to some paths
+    author          : (str) Name of the author
+    author_email    : (str) Mail of the author
+    author_time     : (int) Date of the commit by the author, as a Unix timestamp
+    committer       : (str) Name of the committer
+    committer_email : (str) Mail of the committer
+    committer_time  : (int) Date of the commit by the committer, as a Unix timestamp
+    subject         : (str) First paragraph of the message, joined on a single line
+    body            : (str) Rest of the message, None if it was not requested"""
+    
+    __slots__ = ("sha", "parents", "author", "author_email", "author_time", "committer",
+                 "committer_email", "committer_time", "subject", "body")
+    
+    
+    def __init__(self, fields):
+        self.sha = fields[0]
+        self.parents = tuple(fields[1].split())
+        self.author = fields[2]
+        self.author_email = fields[3]
+        self.author_time = int(fields[4])
+        self.committer = fields[5]
+        self.committer_email = fields[6]
+        self.committer_time = int(fields[7])
+        self.subject = fields[8]
+        self.body = fields[9].strip("\n") if len(fields) > 9 else None
+    
+    
+    def __repr__(self):
+        return "<LogEntry %s %r>" % (self.sha[:12], self.subject)
+
+
+
+def parse(chunks, body=False):
+    """Parse the output of 'git log -z --format=<FORMAT[body]>' given by <chunks>, an iterable of
+    bytes, yielding a LogEntry for every commit."""
+    count = len(FIELDS) + body
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        fields = buffer.split(b"\0")
+        buffer = fields.pop()
+        # Keep the fields of a commit not entirely read yet
+        complete = len(fields) - len(fields) % count
+        if complete < len(fields):
+            buffer = b"\0".join(fields[complete:] + [buffer])
+        for i in range(0, complete, count):
+            yield LogEntry([f.decode(errors="replace") for f in fields[i:i + count]])
+
+
+
+class Page:
+    """Iterable over the commits yielded by gitcmd.log(), started when the iteration begins.
+    
+    Once the iteration is over, cursor contains the cursor of the next page: the commits from
+    which git has to continue walking the history, along with the commits excluded by the range.
+    It is None if every commit has been yielded, the next page may otherwise still be empty.
+    
+    The first <skip> commits are parsed but not yielded, so that the cursor still continues the
+    walk after them: git must thus be given '--max-count=<skip + max_count>', not '--skip'.
+    
+    Parameter:
+        chunks    : (iterable) Output of git, see parse()
+        body      : (bool) Whether the body of the commits is included in the output
+        max_count : (int) Maximum number of commits in the page
+        resolve   : (callable) Return the object names of the commits the walk started from and
+                               of those excluded by the range, only called if a cursor is
+                               needed
+        skip      : (int) Number of commits to walk before the first one yielded"""
+    
+    
+    def __init__(self, chunks, body, max_count, resolve, skip=0):
+        self.cursor = None
+        self._chunks = chunks
+        self._body = body
+        self._max_count = max_count
+        self._resolve = resolve
+        self._skip = skip
+    
+    
+    def __iter__(self):
+        seen = set()
+        pending = {}  # Parents not yielded yet, in the order they were found
+        for entry in parse(self._chunks, self._body):
+            seen.add(entry.sha)
+            pending.pop(entry.sha, None)
+            for parent in entry.parents:
+                if parent not in seen:
+                    pending[parent] = None
+            if len(seen) > self._skip:
+                yield entry
+        
+        if self._max_count is None or len(seen) < self._skip + self._max_count:
+            return  # Every commit has been yielded
+        
+        # Starting commits not reached yet, e.g. the older tip of 'git log a b', are walked too
+        start, excluded = self._resolve()
+        pending.update((sha, None) for sha in start if sha not in seen)
+        for sha in excluded:
+            pending.pop(sha, None)
+        if pending:
+            self.cursor = " ".join(list(pending) + ["^" + sha for sha in excluded])
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+""" Long-lived 'git cat-file --batch' process used to read objects of a repository without
+    spawning a new git process for each of them."""
+
+import subprocess
+import threading
+import time
+
+from . import instrument
+from .launcher import GitTimeoutError
+
+
+
+class ObjectReader:
+    """Read objects of a repository through a single 'git cat-file --batch' process.
+    
+    The process is started on the first read and kept alive until close() is called, every read
+    then costs a single round-trip through its standard input and output. Reads are serialized
+    with a lock, an ObjectReader can thus be shared between threads.
+    
+    Parameter:
+        path : (str) Path from where git cat-file will be executed
+        env  : (dict) Environment of the git process"""
+    
+    ARGS = ["git", "cat-file", "--batch"]
+    
+    
+    def __init__(self, path, env=None):
+        self.path = path
+        self.env = env
+        self._process = None
+        self._started = None
+        self._lock = threading.Lock()
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, *_):
+        self.close()
+    
+    
+    def _start(self):
+        if self._process is None or self._process.poll() is not None:
+            self._stopped()
+            start = time.perf_counter()
+            self._process = subprocess.Popen(
+                self.ARGS, cwd=self.path, env=self.env,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+            self._started = (start, time.perf_counter())
+        return self._process
+    
+    
+    def _stopped(self):
+        """Report the process, which has exited, to gitcmd.instrument."""
+        if self._process is not None:
+            start, spawned = self._started
+            instrument.record(self.ARGS[1:], self.path, spawned - start,
+                              time.perf_counter() - start, self._process.returncode)
+    
+    
+    def read(self, obj, timeout=None):
+        """Return the type and the content of <obj>, or (None, None) if it does not exist.
+        
+        Parameter:
+            obj     : (str) Name of the object, in any form understood by git rev-parse, e.g. a
+                            SHA-1 or '<rev>:<path>'.
+            timeout : (float) Maximum number of seconds the read may last, None for no timeout
+        
+        Return:
+            (type, content), type is a str ('blob', 'tree', 'commit' or 'tag') and content bytes
+        
+        Raise gitcmd.launcher.GitTimeoutError if the object was not read within <timeout>
+        seconds, the process is then killed."""
+        if "\n" in obj:
+            raise ValueError("Object name cannot contain a newline: %r" % obj)
+        
+        with self._lock:
+            process = self._start()
+            expired = threading.Event()
+            timer = None
+            if timeout is not None:
+                timer = threading.Timer(timeout, self._expire, (process, expired))
+                timer.daemon = True
+                timer.start()
+            try:
+                process.stdin.write(obj.encode() + b"\n")
+                process.stdin.flush()
+                header = process.stdout.readline()
+                if not header:
+                    raise BrokenPipeError("git cat-file exited unexpectedly")
+                # '<obj> missing' or '<obj> ambiguous', <obj> being echoed and possibly
+                # containing spaces
+                if header.endswith((b" missing\n", b" ambiguous\n")):
+                    return None, None
+                fields = header.split()
+                size = int(fields[2])
+                content = process.stdout.read(size + 1)[:-1]  # Strip trailing LF
+                if len(content) < size:
+                    raise BrokenPipeError("git cat-file exited unexpectedly")
+            except (BrokenPipeError, ValueError):
+                self._kill()
+                if expired.is_set():
+                    raise GitTimeoutError(self.ARGS, timeout) from None
+                raise
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                if expired.is_set() and self._process is not None:  # Expired once read
+                    self._kill()
+        
+        return fields[1].decode(), content
+    
+    
+    @staticmethod
+    def _expire(process, expired):
+        expired.set()
+        process.kill()
+    
+    
+    def _kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process.stdin.close()
+            self._process.stdout.close()
+            self._stopped()
+            self._process = None
+    
+    
+    def close(self):
+        """Stop the git process, it will be started again by the next read."""
+        with self._lock:
+            if self._process is not None:
+                self._process.stdin.close()
+                self._process.wait()
+                self._process.stdout.close()
+                self._stopped()
+                self._process = None
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+""" Pool of linked worktrees of a repository, reused between checkouts.
+    
+    Creating a linked worktree neither copies nor transfers any object, but still writes every
+    file of the commit. A WorktreePool keeps the worktrees released by its users and checks the
+    next commit out in one of them, git then only rewrites the files which differ:
+        
+        with WorktreePool('/path/to/repo', '/tmp/checkouts', max_idle=4) as pool:
+            with pool.checkout('feature') as path:
+                gitcmd.status(path)
+    
+    Every worktree of the pool has a detached HEAD, so that the same commit or branch can be
+    checked out in several of them at once."""
+
+import contextlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from .gitcmd import Repository, _decode, _execute
+
+
+
+class WorktreePool:
+    """Linked worktrees of the repository containing <path>, created inside <directory>.
+    
+    A pool can be shared between threads, not between processes.
+    
+    Parameter:
+        path      : (str) Path inside the repository
+        directory : (str) Directory in which the worktrees are created, created if it does not
+                          exist. It should not be inside the working tree of the repository.
+        max_idle  : (int) Maximum number of idle worktrees kept, None for no limit"""
+    
+    def __init__(self, path, directory, max_idle=None):
+        with Repository(path) as repository:
+            self.path = repository._path(None)
+        self.directory = os.path.abspath(directory)
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, *_):
+        self.close()
+    
+    
+    def _git(self, args, path, timeout):
+        """Execute git, raise subprocess.CalledProcessError if it fails."""
+        ret, out, err = _decode(*_execute(args, path, timeout=timeout))
+        if ret:
+            raise subprocess.CalledProcessError(ret, ["git"] + args, out, err)
+        return out
+    
+    
+    def _remove(self, worktree, timeout=None):
+        _execute(["worktree", "remove", "--force", "--", worktree], self.path, timeout=timeout)
+    
+    
+    def _reuse(self, worktree, commit, timeout):
+        """Check <commit> out in the idle <worktree>, discarding every change left in it.
+        
+        Return whether it succeeded."""
+        if not os.path.isfile(os.path.join(worktree, ".git")):
+            return False  # Deleted, git would otherwise be executed in the parent directory
+        for args in (["checkout", "--quiet", "--force", "--detach", commit],
+                     ["clean", "--quiet", "-ffdx"]):
+            ret, _, _, _ = _execute(args, worktree, timeout=timeout)
+            if ret:
+                return False
+        return True
+    
+    
+    def acquire(self, commit="HEAD", timeout=None):
+        """Check <commit> out in an idle worktree, or in a new one if none is idle.
+        
+        <commit> is resolved in the repository the pool was created from, 'HEAD' thus being
+        the HEAD of that repository. Modified and untracked files (ignored ones included) left
+        in a reused worktree are discarded.
+        
+        Parameter:
+            commit  : (str) Commit, branch or tag to check out
+            timeout : (float) Maximum number of seconds each git command may run
+        
+        Return:
+            The absolute path of the worktree, to give back with release(). Raise
+            subprocess.CalledProcessError if <commit> does not exist or if the worktree could not
+            be created."""
+        commit = self._git(["rev-parse", "--verify", "--quiet", commit + "^{commit}"],
+                           self.path, timeout)
+        
+        while True:
+            with self._lock:
+                worktree = self._idle.pop() if self._idle else None
+            if worktree is None:
+                break
+            if self._reuse(worktree, commit, timeout):
+                return worktree
+            self._remove(worktree, timeout)  # Broken, e.g. its directory was deleted
+        
+        worktree = tempfile.mkdtemp(prefix="worktree-", dir=self.directory)
+        try:
+            self._git(["worktree", "add", "--detach", "--", worktree, commit], self.path, timeout)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            shutil.rmtree(worktree, ignore_errors=True)
+            raise
+        return worktree
+    
+    
+    def release(self, worktree):
+        """Give <worktree>, returned by acquire(), back to the pool. It is removed if max_idle
+        worktrees are already idle."""
+        with self._lock:
+            keep = self.max_idle is None or len(self._idle) < self.max_idle
+            if keep:
+                self._idle.append(worktree)
+        if not keep:
+            self._remove(worktree)
+    
+    
+    @contextlib.contextmanager
+    def checkout(self, commit="HEAD", timeout=None):
+        """Context manager acquiring a worktree with <commit> checked out, see acquire(), and
+        releasing it on exit."""
+        worktree = self.acquire(commit, timeout)
+        try:
+            yield worktree
+        finally:
+            self.release(worktree)
+    
+    
+    def idle(self):
+        """Return the list of the idle worktrees."""
+        with self._lock:
+            return list(self._idle)
+    
+    
+    def close(self):
+        """Remove the idle worktrees. Worktrees still in use are removed once released."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.max_idle = 0
+        for worktree in idle:
+            self._remove(worktree)
+        _execute(["worktree", "prune"], self.path)
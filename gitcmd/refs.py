@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+""" Resolution of HEAD and references by reading the git directory, without spawning any
+    process.
+    
+    Handle symbolic references, detached HEAD, loose references, 'packed-refs' and linked
+    worktrees (whose HEAD and per-worktree references live in their own git directory while the
+    others live in the common directory).
+    
+    Files are cached along with their inode, size and modification time, reading an unchanged
+    reference thus costs a single stat() call. Functions return None when a case is not handled
+    (e.g. reftable repositories), so that the caller can fall back to git."""
+
+import os
+import re
+import threading
+
+
+_cache = {}
+_lock = threading.Lock()
+
+SHA = re.compile(r'^[0-9a-f]{40}([0-9a-f]{24})?$')
+PER_WORKTREE = ("refs/bisect/", "refs/worktree/", "refs/rewritten/")
+
+# Rules used by git to expand a short name, see 'git help revisions'
+RULES = ("%s", "refs/%s", "refs/tags/%s", "refs/heads/%s", "refs/remotes/%s",
+         "refs/remotes/%s/HEAD")
+
+
+
+def _load(path, parse):
+    """Return parse(content) of the file at <path>, None if it does not exist.
+    
+    The result is cached until the inode, size or modification time of the file changes."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        with _lock:
+            _cache.pop(path, None)
+        return None
+    
+    key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        entry = _cache.get(path)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    
+    try:
+        with open(path, "rb") as f:
+            value = parse(f.read())
+    except OSError:
+        return None
+    with _lock:
+        _cache[path] = (key, value)
+    return value
+
+
+
+def _parse_ref(content):
+    return content.decode("utf-8", "replace").strip()
+
+
+
+def _parse_packed_refs(content):
+    refs = {}
+    for line in content.decode("utf-8", "replace").splitlines():
+        if line and line[0] not in "#^":
+            sha, _, name = line.partition(" ")
+            refs[name] = sha
+    return refs
+
+
+
+def clear_cache():
+    """Forget every file read so far."""
+    with _lock:
+        _cache.clear()
+
+
+
+def supported(common_dir):
+    """Return False if references of the repository are not stored in files (reftable)."""
+    return not os.path.isdir(os.path.join(common_dir, "reftable"))
+
+
+
+def _directory(git_dir, common_dir, name):
+    """Return the directory containing the reference <name>."""
+    if "/" not in name or name.startswith(PER_WORKTREE):  # HEAD, ORIG_HEAD...
+        return git_dir
+    return common_dir
+
+
+
+def read(git_dir, common_dir, name):
+    """Return the raw value of the reference <name>: either an object name or 'ref: <target>'
+    for a symbolic reference. Return None if the reference does not exist."""
+    value = _load(os.path.join(_directory(git_dir, common_dir, name), name), _parse_ref)
+    if value is None and name.startswith("refs/"):
+        packed = _load(os.path.join(common_dir, "packed-refs"), _parse_packed_refs)
+        value = packed.get(name) if packed is not None else None
+    return value
+
+
+
+def exists(git_dir, common_dir, name):
+    """Return True if the reference <name> exists."""
+    return read(git_dir, common_dir, name) is not None
+
+
+
+def resolve(git_dir, common_dir, name="HEAD"):
+    """Return the object name pointed to by the reference <name>, following symbolic
+    references. Return None if it does not exist or could not be resolved."""
+    for _ in range(5):  # Same maximum depth as git
+        value = read(git_dir, common_dir, name)
+        if value is None:
+            return None
+        if not value.startswith("ref: "):
+            return value if SHA.match(value) else None
+        name = value[5:]
+    return None
+
+
+
+def symbolic_head(git_dir):
+    """Return the reference HEAD points to (e.g. 'refs/heads/master'), None if HEAD is detached
+    or could not be read."""
+    value = _load(os.path.join(git_dir, "HEAD"), _parse_ref)
+    if value is None or not value.startswith("ref: "):
+        return None
+    return value[5:]
+
+
+
+def current_branch(git_dir, common_dir):
+    """Return the name of the current branch as 'git rev-parse --abbrev-ref HEAD' would: the
+    short name of the branch or 'HEAD' if it is detached.
+    
+    Return None if the result of git cannot be reproduced exactly: unborn branch, reference
+    outside 'refs/heads/', short name ambiguous with another reference or reftable repository."""
+    if not supported(common_dir):
+        return None
+    
+    value = _load(os.path.join(git_dir, "HEAD"), _parse_ref)
+    if value is None:
+        return None
+    if not value.startswith("ref: "):
+        return "HEAD" if SHA.match(value) else None
+    
+    name = value[5:]
+    if not name.startswith("refs/heads/") or resolve(git_dir, common_dir, name) is None:
+        return None
+    
+    short = name[len("refs/heads/"):]
+    for rule in RULES:
+        other = rule % short
+        if other != name and exists(git_dir, common_dir, other):
+            return None
+    return short
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+""" Result of a git command, decoding git's output only when it is accessed."""
+
+import collections.abc
+
+
+# Default encoding of git's output and how decoding errors are handled, see bytes.decode()
+ENCODING = "utf-8"
+ERRORS = "strict"
+
+PRIVATE = "Repository is private, please provide credentials"
+
+
+
+class Result(collections.abc.Sequence):
+    """(return_code, stdout, stderr) returned by the functions of gitcmd.
+    
+    A Result behaves like the tuple it used to be: it can be unpacked, indexed and compared with a
+    tuple. Git's output is however kept as bytes and only decoded, stripped of its surrounding
+    newlines for stdout, on the first access to stdout or stderr. Callers only checking the
+    return code or reading the raw output thus never pay for it.
+    
+    Parameter:
+        returncode : (int) Return code of git
+        stdout     : (bytes) Standard output of git, str is also accepted
+        stderr     : (bytes) Standard error of git, str is also accepted
+        password   : (str) Password to mask from the decoded output
+        private    : (bool) Replace stderr by a message telling that credentials are needed
+        encoding   : (str) Encoding of the output, default to ENCODING
+        errors     : (str) Handling of decoding errors ('strict', 'replace'...), default to ERRORS
+        profile    : (gitcmd.trace.Profile) Trace2 events of git, if it was profiled"""
+    
+    __slots__ = ("returncode", "stdout_bytes", "stderr_bytes", "password", "private", "encoding",
+                 "errors", "profile", "_stdout", "_stderr")
+    
+    
+    def __init__(self, returncode, stdout=b"", stderr=b"", password=None, private=False,
+                 encoding=None, errors=None, profile=None):
+        self.returncode = returncode
+        self.stdout_bytes = stdout.encode() if isinstance(stdout, str) else stdout
+        self.stderr_bytes = stderr.encode() if isinstance(stderr, str) else stderr
+        self._stdout = stdout.strip("\n") if isinstance(stdout, str) else None
+        self._stderr = PRIVATE if private else stderr if isinstance(stderr, str) else None
+        self.password = password
+        self.private = private
+        self.encoding = encoding
+        self.errors = errors
+        self.profile = profile
+    
+    
+    def _mask(self, text):
+        if self.password:
+            return text.replace(self.password, "•" * len(self.password))
+        return text
+    
+    
+    def decode(self, encoding=None, errors=None):
+        """Return (stdout, stderr) decoded with <encoding> and <errors>, without caching them.
+        
+        Default to the encoding and errors of the Result."""
+        encoding = encoding or self.encoding or ENCODING
+        errors = errors or self.errors or ERRORS
+        stdout = self._mask(self.stdout_bytes.decode(encoding, errors)).strip("\n")
+        if self.private:
+            return stdout, PRIVATE
+        return stdout, self._mask(self.stderr_bytes.decode(encoding, errors))
+    
+    
+    @property
+    def stdout(self):
+        """Standard output of git, decoded and stripped of its surrounding newlines."""
+        if self._stdout is None:
+            encoding, errors = self.encoding or ENCODING, self.errors or ERRORS
+            self._stdout = self._mask(self.stdout_bytes.decode(encoding, errors)).strip("\n")
+        return self._stdout
+    
+    
+    @property
+    def stderr(self):
+        """Standard error of git, decoded."""
+        if self._stderr is None:
+            encoding, errors = self.encoding or ENCODING, self.errors or ERRORS
+            self._stderr = self._mask(self.stderr_bytes.decode(encoding, errors))
+        return self._stderr
+    
+    
+    @property
+    def stdout_view(self):
+        """memoryview over the raw standard output, neither decoded nor stripped."""
+        return memoryview(self.stdout_bytes)
+    
+    
+    @property
+    def stderr_view(self):
+        """memoryview over the raw standard error."""
+        return memoryview(self.stderr_bytes)
+    
+    
+    def __len__(self):
+        return 3
+    
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        if index < 0:
+            index += 3
+        if index == 0:
+            return self.returncode
+        if index == 1:
+            return self.stdout
+        if index == 2:
+            return self.stderr
+        raise IndexError("Result index out of range")
+    
+    
+    def __iter__(self):
+        yield self.returncode
+        yield self.stdout
+        yield self.stderr
+    
+    
+    def __eq__(self, other):
+        if isinstance(other, (Result, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+    
+    
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+    
+    
+    def __hash__(self):
+        return hash(tuple(self))
+    
+    
+    def __repr__(self):
+        return repr(tuple(self))
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+""" Parser of the output of 'git status --porcelain=v2 -z'.
+    
+    See https://git-scm.com/docs/git-status#_porcelain_format_version_2"""
+
+import os
+
+
+UNTRACKED = ("no", "normal", "all")
+IGNORE_SUBMODULES = ("none", "untracked", "dirty", "all")
+
+
+
+class StatusBranch:
+    """Branch information given by the '# branch.*' headers.
+    
+    oid      : (str) Commit of HEAD, None if the branch has no commit yet
+    head     : (str) Current branch, None if HEAD is detached
+    upstream : (str) Upstream branch, None if not set
+    ahead    : (int) Number of commits ahead of upstream, None if unknown
+    behind   : (int) Number of commits behind upstream, None if unknown"""
+    
+    __slots__ = ("oid", "head", "upstream", "ahead", "behind")
+    
+    
+    def __init__(self):
+        self.oid = self.head = self.upstream = self.ahead = self.behind = None
+    
+    
+    def __repr__(self):
+        return "<StatusBranch head=%r upstream=%r ahead=%r behind=%r>" % (
+            self.head, self.upstream, self.ahead, self.behind
+        )
+    
+    
+    def header(self, key, value):
+        """Update the information from the header '# branch.<key> <value>'."""
+        if key == "oid":
+            self.oid = None if value == "(initial)" else value
+        elif key == "head":
+            self.head = None if value == "(detached)" else value
+        elif key == "upstream":
+            self.upstream = value
+        elif key == "ab":
+            ahead, behind = value.split()
+            self.ahead = None if ahead == "+?" else int(ahead)
+            self.behind = None if behind == "-?" else -int(behind)
+
+
+
+class StatusEntry:
+    """An entry of the status.
+    
+    kind      : (str) '1' (changed), '2' (renamed or copied), 'u' (unmerged), '?' (untracked) or
+                      '!' (ignored)
+    index     : (str) Status of the index ('.' if unmodified), None for untracked and ignored
+    worktree  : (str) Status of the working tree ('.' if unmodified), None for untracked and
+                      ignored
+    submodule : (str) Submodule state ('N...' if not a submodule)
+    modes     : (tuple) Octal file modes, (HEAD, index, worktree) or, for unmerged entries,
+                        (stage 1, stage 2, stage 3, worktree)
+    oids      : (tuple) Object names, (HEAD, index) or, for unmerged entries, (stage 1, stage 2,
+                        stage 3)
+    score     : (str) Rename or copy score, e.g. 'R100', only for kind '2'
+    path      : (str) Path relative to the top-level directory
+    orig_path : (str) Path in HEAD or the index before the rename or copy, only for kind '2'"""
+    
+    __slots__ = ("kind", "index", "worktree", "submodule", "modes", "oids", "score", "path",
+                 "orig_path")
+    
+    
+    def __init__(self, kind, path, index=None, worktree=None, submodule=None, modes=(), oids=(),
+                 score=None, orig_path=None):
+        self.kind = kind
+        self.path = path
+        self.index = index
+        self.worktree = worktree
+        self.submodule = submodule
+        self.modes = modes
+        self.oids = oids
+        self.score = score
+        self.orig_path = orig_path
+    
+    
+    def __repr__(self):
+        return "<StatusEntry %s %s%s %r%s>" % (
+            self.kind, self.index or "", self.worktree or "", self.path,
+            " from %r" % self.orig_path if self.orig_path is not None else ""
+        )
+    
+    
+    @classmethod
+    def parse(cls, record):
+        """Create an entry from a record of the output, the original path of renamed and copied
+        entries must be set afterward."""
+        kind = record[:1]
+        if kind in (b"?", b"!"):
+            return cls(kind.decode(), os.fsdecode(record[2:]))
+        
+        if kind == b"1":
+            _, xy, sub, m1, m2, m3, h1, h2, path = record.split(b" ", 8)
+            return cls("1", os.fsdecode(path), chr(xy[0]), chr(xy[1]), sub.decode(),
+                       (m1.decode(), m2.decode(), m3.decode()), (h1.decode(), h2.decode()))
+        if kind == b"2":
+            _, xy, sub, m1, m2, m3, h1, h2, score, path = record.split(b" ", 9)
+            return cls("2", os.fsdecode(path), chr(xy[0]), chr(xy[1]), sub.decode(),
+                       (m1.decode(), m2.decode(), m3.decode()), (h1.decode(), h2.decode()),
+                       score.decode())
+        if kind == b"u":
+            _, xy, sub, m1, m2, m3, mw, h1, h2, h3, path = record.split(b" ", 10)
+            return cls("u", os.fsdecode(path), chr(xy[0]), chr(xy[1]), sub.decode(),
+                       (m1.decode(), m2.decode(), m3.decode(), mw.decode()),
+                       (h1.decode(), h2.decode(), h3.decode()))
+        
+        raise ValueError("Unknown status record: %r" % record)
+
+
+
+def parse(chunks):
+    """Parse the output of 'git status --porcelain=v2 -z' given by pieces as it is read.
+    
+    Records are parsed as soon as they are complete, the whole output is never kept in memory.
+    
+    Parameter:
+        chunks : (iterable) bytes objects, in order, which concatenated form the output
+    
+    Return:
+        A generator yielding a StatusBranch first if the output contains '# branch.*' headers,
+        then a StatusEntry for every entry."""
+    branch = None
+    renamed = None  # Renamed entry waiting for its original path
+    pending = b""
+    
+    for chunk in chunks:
+        records = (pending + chunk).split(b"\0")
+        pending = records.pop()
+        for record in records:
+            if renamed is not None:
+                renamed.orig_path = os.fsdecode(record)
+                yield renamed
+                renamed = None
+            elif record.startswith(b"# branch."):
+                if branch is None:
+                    branch = StatusBranch()
+                key, _, value = record[9:].decode().partition(" ")
+                branch.header(key, value)
+            elif record.startswith(b"#"):
+                continue
+            else:
+                if branch:
+                    yield branch
+                    branch = False
+                entry = StatusEntry.parse(record)
+                if entry.kind == "2":
+                    renamed = entry
+                else:
+                    yield entry
+    
+    if branch:
+        yield branch
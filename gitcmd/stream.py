@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+""" Streaming execution of git, yielding its output line by line as soon as it is written.
+    
+    Used by the network commands (clone, pull and push) to report the progress of transfers
+    without buffering their whole output."""
+
+import collections
+import os
+import re
+import selectors
+import subprocess
+import time
+
+from . import instrument, launcher, trace
+
+
+Line = collections.namedtuple("Line", ["stream", "text"])
+Line.__doc__ = """A line written by git, stream is either 'stdout' or 'stderr'."""
+
+Progress = collections.namedtuple(
+    "Progress", ["phase", "percent", "current", "total", "transferred", "rate", "done", "remote"]
+)
+Progress.__doc__ = """A progress report written by git on stderr, e.g.:
+        
+        'Receiving objects:  45% (450/1000), 1.20 MiB | 2.00 MiB/s'
+    
+    phase       : (str) Name of the phase, e.g. 'Receiving objects'
+    percent     : (int) Percentage of completion, None if the total is unknown
+    current     : (int) Number of objects processed so far
+    total       : (int) Total number of objects, None if unknown
+    transferred : (str) Amount of data transferred, e.g. '1.20 MiB', None if not reported
+    rate        : (str) Throughput, e.g. '2.00 MiB/s', None if not reported
+    done        : (bool) Whether the phase is complete
+    remote      : (bool) Whether the report comes from the remote ('remote: ' prefix)"""
+
+
+PROGRESS = re.compile(
+    r'(?P<remote>remote: )?(?P<phase>[A-Za-z][^:]*):\s+'
+    r'(?:(?P<percent>\d+)% \((?P<current>\d+)/(?P<total>\d+)\)|(?P<count>\d+))'
+    r'(?:, (?P<transferred>[\d.]+ \w+)(?: \| (?P<rate>[\d.]+ \w+/s))?)?'
+    r'(?P<done>, done\.)?\s*$'
+)
+
+
+
+def parse_progress(line):
+    """Return the Progress corresponding to <line>, None if it is not a progress report."""
+    match = PROGRESS.match(line)
+    if match is None:
+        return None
+    
+    percent = match.group("percent")
+    return Progress(
+        phase=match.group("phase"),
+        percent=int(percent) if percent is not None else None,
+        current=int(match.group("current") or match.group("count")),
+        total=int(match.group("total")) if percent is not None else None,
+        transferred=match.group("transferred"),
+        rate=match.group("rate"),
+        done=match.group("done") is not None,
+        remote=match.group("remote") is not None,
+    )
+
+
+
+class Stream:
+    """Iterable over the output of a git command, started when the iteration begins.
+    
+    Each line of stdout and stderr is yielded as soon as git writes it, either as a Progress if it
+    is a progress report, or as a Line otherwise. Lines are split on both '\\n' and '\\r', the
+    latter being used by git to update progress reports in place, and decoded with
+    errors='replace'. Every occurrence of <password> is masked before a line is yielded.
+    
+    If <stall_timeout> is given and git does not write anything for that many seconds, git is
+    killed and TimeoutError is raised. If <timeout> is given and the iteration lasts more than
+    that many seconds, git is killed and gitcmd.launcher.GitTimeoutError is raised. Git is started
+    in its own process group, killing it also kills the processes it started (ssh, remote
+    helpers...).
+    
+    Once the iteration is over, the return code of git is available in returncode, and inside a
+    gitcmd.trace.profile() block, the gitcmd.trace.Profile of git in profile. If the iteration is
+    interrupted, git is killed.
+    
+    Parameter:
+        args          : (list) Arguments given to git
+        cwd           : (str) Directory from where git will be executed
+        env           : (dict) Environment of git
+        password      : (str) Password to mask from the output
+        stall_timeout : (float) Maximum number of seconds without any output
+        timeout       : (float) Maximum number of seconds git may run"""
+    
+    
+    def __init__(self, args, cwd, env=None, password=None, stall_timeout=None, timeout=None):
+        self.args = list(args)
+        self.cwd = cwd
+        self.env = env
+        self.password = password
+        self.stall_timeout = stall_timeout
+        self.timeout = timeout
+        self.returncode = None
+        self.profile = None
+    
+    
+    def _event(self, name, line):
+        text = line.decode(errors="replace")
+        if self.password:
+            text = text.replace(self.password, "•" * len(self.password))
+        progress = parse_progress(text) if name == "stderr" else None
+        return progress if progress is not None else Line(name, text)
+    
+    
+    def __iter__(self):
+        env, capture = self.env, trace.capture()
+        if capture is not None:
+            env = dict(env if env is not None else os.environ, **capture.environment)
+        
+        start = time.perf_counter()
+        p = subprocess.Popen(["git"] + self.args, cwd=self.cwd, env=env,
+                             stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, start_new_session=True)
+        spawned = time.perf_counter()
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        read = {"stdout": 0, "stderr": 0}
+        selector = selectors.DefaultSelector()
+        selector.register(p.stdout, selectors.EVENT_READ, "stdout")
+        selector.register(p.stderr, selectors.EVENT_READ, "stderr")
+        buffers = {"stdout": b"", "stderr": b""}
+        
+        try:
+            while selector.get_map():
+                timeout = self.stall_timeout
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        args = instrument.sanitize(["git"] + self.args)
+                        raise launcher.GitTimeoutError(args, self.timeout)
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                ready = selector.select(timeout=timeout)
+                if not ready:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        continue  # GitTimeoutError is raised at the start of the next loop
+                    raise TimeoutError("git %s did not write anything for %s seconds"
+                                       % (self.args[0], self.stall_timeout))
+                
+                for key, _ in ready:
+                    name = key.data
+                    data = os.read(key.fd, 65536)
+                    read[name] += len(data)
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        lines, buffers[name] = [buffers[name]], b""
+                    else:
+                        lines = re.split(rb"[\r\n]", buffers[name] + data)
+                        buffers[name] = lines.pop()
+                    for line in lines:
+                        if line:
+                            yield self._event(name, line)
+            
+            self.returncode = p.wait()
+        finally:
+            selector.close()
+            if p.poll() is None:
+                launcher.kill(p)
+                p.wait()
+            p.stdout.close()
+            p.stderr.close()
+            self.profile = capture and capture.finish()
+            instrument.record(self.args, self.cwd, spawned - start, time.perf_counter() - start,
+                              p.returncode, read["stdout"], read["stderr"], self.profile)
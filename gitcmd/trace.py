@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+""" Opt-in capture of git's trace2 performance events.
+    
+    Inside a profile() block, every git command executed by gitcmd from the current thread
+    writes its trace2 events (see 'git help trace2') to a private temporary file, through
+    GIT_TRACE2_EVENT. Events of the git processes it spawns itself (e.g. 'fetch' and
+    'index-pack' for 'pull') are written to the same file. Once git has exited, the file is parsed
+    into a Profile and deleted:
+        
+        with trace.profile() as profiles:
+            gitcmd.pull('/path/to/repo')
+        profiles[0].phases()  # {'fetch-pack/negotiation_v2': 0.02, 'index/do_read_index': ...}
+    
+    Profiles are also given to the hooks of gitcmd.instrument, in Call.profile."""
+
+import collections
+import json
+import os
+import tempfile
+import threading
+
+
+_local = threading.local()
+
+# Maximum nesting of the regions reported by git, the default of 2 hides most of them
+NESTING = "10"
+
+
+Process = collections.namedtuple("Process", ["sid", "name", "argv", "duration", "code"])
+Process.__doc__ = """A git process which took part in a command.
+    
+    sid      : (str) Session id of the process, those of children are prefixed by their parent's
+    name     : (str) Name of the git command, e.g. 'fetch'
+    argv     : (list) Arguments of the process, including 'git'
+    duration : (float) Seconds between the start and the exit of the process, None if unknown
+    code     : (int) Exit code of the process, None if unknown"""
+
+Region = collections.namedtuple("Region", ["process", "category", "label", "nesting",
+                                           "duration"])
+Region.__doc__ = """A timed region of the code of git, e.g. ('status', 'index', 'do_read_index').
+    
+    process  : (str) Name of the git command the region belongs to
+    category : (str) Category of the region, e.g. 'index'
+    label    : (str) Label of the region, e.g. 'do_read_index'
+    nesting  : (int) Depth of the region, 1 for the outermost ones
+    duration : (float) Seconds spent in the region"""
+
+
+
+class Profile:
+    """Performance events of a git command and of the git processes it spawned.
+    
+    processes : (list) Process of every git process, the command itself first
+    regions   : (list) Region of every region left, in order
+    data      : (list) (process, category, key, value) tuples of the 'data' events, e.g.
+                       ('status', 'index', 'read/cache_nr', '1')
+    
+    Parameter:
+        events : (iterable) trace2 events, as dicts"""
+    
+    def __init__(self, events):
+        processes = collections.OrderedDict()
+        self.regions = []
+        self.data = []
+        
+        for event in events:
+            sid, kind = event.get("sid"), event.get("event")
+            process = processes.setdefault(sid, {"name": None, "argv": None, "duration": None,
+                                                 "code": None})
+            if kind == "start":
+                process["argv"] = event.get("argv")
+            elif kind == "cmd_name":
+                process["name"] = event.get("name")
+            elif kind == "exit":
+                process["duration"], process["code"] = event.get("t_abs"), event.get("code")
+            elif kind == "region_leave":
+                self.regions.append(Region(process["name"], event.get("category"),
+                                           event.get("label"), event.get("nesting"),
+                                           event.get("t_rel")))
+            elif kind in ("data", "data_json"):
+                self.data.append((process["name"], event.get("category"), event.get("key"),
+                                  event.get("value")))
+        
+        # The command itself has the shortest sid, children sids are prefixed by their parent's
+        self.processes = [Process(sid, p["name"], p["argv"], p["duration"], p["code"])
+                          for sid, p in sorted(processes.items(), key=lambda i: len(i[0] or ""))]
+    
+    
+    def __repr__(self):
+        return "<Profile %s: %d processes, %d regions>" % (self.command, len(self.processes),
+                                                          len(self.regions))
+    
+    
+    @property
+    def command(self):
+        """Name of the git command, None if no event was captured."""
+        return self.processes[0].name if self.processes else None
+    
+    
+    @property
+    def duration(self):
+        """Seconds spent in the git command as measured by git, None if unknown."""
+        return self.processes[0].duration if self.processes else None
+    
+    
+    def phases(self, process=None):
+        """Return the total number of seconds spent in each region, as a dict mapping
+        'category/label' to seconds. Nested regions are also included in their parents.
+        
+        Parameter:
+            process : (str) Only count the regions of the git processes with this name"""
+        phases = collections.OrderedDict()
+        for region in self.regions:
+            if process is None or region.process == process:
+                key = "%s/%s" % (region.category, region.label)
+                phases[key] = phases.get(key, 0.0) + (region.duration or 0.0)
+        return phases
+    
+    
+    def get(self, category, key, default=None):
+        """Return the value of the last 'data' event <category>/<key>, <default> if none."""
+        for _, c, k, value in reversed(self.data):
+            if (c, k) == (category, key):
+                return value
+        return default
+
+
+
+def parse(path):
+    """Return the Profile of the trace2 events written to the file at <path>."""
+    events = []
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:  # Truncated line of a killed process
+                    continue
+    except OSError:
+        pass
+    return Profile(events)
+
+
+
+class Capture:
+    """Temporary file to which git writes its trace2 events during a single call."""
+    
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(prefix="gitcmd-trace2-", suffix=".json")
+        os.close(fd)
+        self.environment = {"GIT_TRACE2_EVENT": self.path, "GIT_TRACE2_EVENT_NESTING": NESTING}
+    
+    
+    def finish(self):
+        """Parse and delete the file, then give the Profile to the active profile() blocks of the
+        current thread."""
+        result = parse(self.path)
+        try:
+            os.remove(self.path)
+        except OSError:  # pragma: no cover
+            pass
+        for profiles in getattr(_local, "profiles", ()):
+            profiles.append(result)
+        return result
+
+
+
+def capture():
+    """Return a Capture if the current thread is inside a profile() block, None otherwise."""
+    return Capture() if getattr(_local, "profiles", None) else None
+
+
+
+class profile:
+    """Context manager capturing the trace2 events of every git command executed by gitcmd from
+    the current thread inside of it, giving a list which receives a Profile per command."""
+    
+    def __enter__(self):
+        self.profiles = []
+        _local.profiles = getattr(_local, "profiles", ()) + (self.profiles,)
+        return self.profiles
+    
+    
+    def __exit__(self, *_):
+        _local.profiles = tuple(p for p in _local.profiles if p is not self.profiles)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+""" Parser of the output of 'git worktree list --porcelain'.
+    
+    See https://git-scm.com/docs/git-worktree#_porcelain_format"""
+
+import collections
+
+
+Worktree = collections.namedtuple("Worktree", ["path", "head", "branch", "bare", "detached",
+                                               "locked", "prunable"])
+Worktree.__doc__ = """A worktree of a repository, the main one being listed first.
+    
+    path     : (str) Absolute path of the worktree
+    head     : (str) Commit checked out, None for a bare repository or a branch without commit
+    branch   : (str) Branch checked out (e.g. 'refs/heads/master'), None if HEAD is detached
+    bare     : (bool) Whether this is a bare repository
+    detached : (bool) Whether HEAD is detached
+    locked   : (str) Reason why the worktree is locked ('' if none was given), None if it is not
+                     locked
+    prunable : (str) Reason why the worktree can be pruned (e.g. its directory was deleted),
+                     None if it cannot"""
+
+
+
+def _worktree(attributes):
+    return Worktree(
+        path=attributes["worktree"],
+        head=attributes.get("HEAD"),
+        branch=attributes.get("branch"),
+        bare="bare" in attributes,
+        detached="detached" in attributes,
+        locked=attributes.get("locked"),
+        prunable=attributes.get("prunable"),
+    )
+
+
+
+def parse(output):
+    """Return the list of Worktree described by <output>, the decoded output of
+    'git worktree list --porcelain'."""
+    worktrees = []
+    attributes = {}
+    for line in output.split("\n") + [""]:
+        if not line:
+            if attributes:
+                worktrees.append(_worktree(attributes))
+            attributes = {}
+            continue
+        name, _, value = line.partition(" ")
+        attributes[name] = value
+    return worktrees
@@ -14,7 +14,6 @@ CLASSIFIERS = [
     'License :: OSI Approved :: MIT License',
     'Natural Language :: English',
     'Operating System :: POSIX :: Linux',
-    'Programming Language :: Python :: 3.4',
     'Programming Language :: Python :: 3.5',
     'Programming Language :: Python :: 3.6',
     'Programming Language :: Python :: 3.7',
@@ -38,6 +37,7 @@ setup(
     author_email='coumes.quentin@gmail.com',
     url='https://github.com/qcoumes/gitcmd',
     packages=['gitcmd'],
+    python_requires='>=3.5',
     install_requires=[],
     classifiers=CLASSIFIERS
 )
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+""" Helpers shared by the tests."""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+
+
+def command(cmd, cwd):
+    p = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        shell=True,
+        cwd=cwd
+    )
+    out, err = p.communicate()
+    if p.returncode:
+        raise RuntimeError(
+            "Return code : " + str(p.returncode) + " - " + err.decode() + out.decode())
+    return p.returncode, out.decode().strip(), err.decode()
+
+
+
+class TemporaryTestCase(unittest.TestCase):
+    """Test case working inside a temporary directory, self.root, removed after each test."""
+    
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+    
+    
+    def tearDown(self):
+        shutil.rmtree(self.root)
+    
+    
+    def init(self, name, bare=False):
+        """Create the repository <name> inside self.root and return its path. The identity of
+        the committer is configured if it is not bare."""
+        path = os.path.join(self.root, name)
+        command('git init ' + ('--bare ' if bare else '') + name, self.root)
+        if not bare:
+            command('git config user.email "you@example.com"', path)
+            command('git config user.name "Your Name"', path)
+        return path
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import time
+from unittest import mock
+
+from gitcmd import aio, gitcmd
+
+from . import TemporaryTestCase, command
+
+
+gitcmd.GIT_LANG = 'en_US.UTF-8'
+
+
+
+class TestAio(TemporaryTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.loop = asyncio.new_event_loop()
+        self.host = self.init('host', bare=True)
+        self.local = self.init('local')
+        command('git remote add origin ' + self.host, self.local)
+        command('touch file.txt && git add file.txt && git commit -m "test"', self.local)
+        command('git push --set-upstream origin master', self.local)
+    
+    
+    def tearDown(self):
+        self.loop.close()
+        super().tearDown()
+    
+    
+    def run_until_complete(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+    
+    
+    def test0000_workflow(self):
+        test_file = os.path.join(self.local, 'test')
+        local2 = os.path.join(self.root, 'local2')
+        
+        ret, out, err = self.run_until_complete(aio.clone(self.root, self.host, to='local2'))
+        self.assertEqual(ret, 0, err)
+        with open(test_file, 'w+') as f:
+            print("content", file=f)
+        ret, out, err = self.run_until_complete(aio.add(test_file))
+        self.assertEqual(ret, 0, err)
+        ret, out, err = self.run_until_complete(aio.status(self.local))
+        self.assertIn("Changes to be committed", out)
+        ret, out, err = self.run_until_complete(aio.commit(test_file, 'test', "Its Me", "a@b.c"))
+        self.assertEqual(ret, 0, err)
+        ret, out, err = self.run_until_complete(aio.push(self.local))
+        self.assertEqual(ret, 0, err)
+        self.assertIn("master -> master", err)
+        ret, out, err = self.run_until_complete(aio.pull(local2))
+        self.assertEqual(ret, 0, err)
+        self.assertIn("Fast-forward\n test", out)
+        
+        with open(test_file, 'w+') as f:
+            print("modified", file=f)
+        ret, out, err = self.run_until_complete(aio.show_last_revision(test_file))
+        self.assertEqual((ret, out), (0, "content"))
+        ret, out, err = self.run_until_complete(aio.checkout(test_file))
+        self.assertEqual(ret, 0, err)
+        with open(test_file) as f:
+            self.assertEqual(f.read(), "content\n")
+    
+    
+    def test0001_branches(self):
+        ret, out, err = self.run_until_complete(aio.checkout(self.local, 'other', True))
+        self.assertEqual(ret, 0, err)
+        ret, out, err = self.run_until_complete(aio.current_branch(self.local))
+        self.assertEqual(out, "other")
+        ret, out, err = self.run_until_complete(aio.branch(self.local))
+        self.assertEqual(out, "  master\n* other")
+        ret, out, err = self.run_until_complete(aio.reset(self.local, 'mixed', 'HEAD'))
+        self.assertEqual(ret, 0, err)
+    
+    
+    def test0002_same_results(self):
+        test_file = os.path.join(self.local, 'file.txt')
+        for function in ('status', 'branch', 'current_branch', 'remote_url'):
+            self.assertEqual(getattr(gitcmd, function)(test_file),
+                             self.run_until_complete(getattr(aio, function)(test_file)))
+    
+    
+    def test0003_concurrent(self):
+        async def many():
+            return await asyncio.gather(*[aio.current_branch(self.local) for _ in range(64)])
+        
+        for ret, out, err in self.run_until_complete(many()):
+            self.assertEqual((ret, out), (0, "master"))
+    
+    
+    def test0004_cancel(self):
+        processes = []
+        create_subprocess_exec = asyncio.create_subprocess_exec
+        
+        async def spy(*args, **kwargs):
+            processes.append(await create_subprocess_exec(*args, **kwargs))
+            return processes[-1]
+        
+        async def cancel():
+            task = asyncio.ensure_future(
+                aio._execute(["-c", "alias.hang=!sleep 5", "hang"], self.local)
+            )
+            while not processes:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        
+        with mock.patch.object(aio.asyncio, 'create_subprocess_exec', spy):
+            start = time.perf_counter()
+            self.run_until_complete(cancel())
+        self.assertLess(time.perf_counter() - start, 4)
+        self.assertIsNotNone(processes[0].returncode)
+    
+    
+    def test0005_exception(self):
+        with self.assertRaises(gitcmd.NotInRepositoryError):
+            self.run_until_complete(aio.status(self.root))
+        with self.assertRaises(ValueError):
+            self.run_until_complete(aio.reset(self.local, mode="error"))
+        with self.assertRaises(ValueError):
+            self.run_until_complete(aio.clone(self.root, self.host, username="user"))
+    
+    
+    def test0006_batch(self):
+        paths = [os.path.join(self.local, 'file %d' % i) for i in range(50)]
+        for path in paths:
+            open(path, 'w+').close()
+        ret, out, err = self.run_until_complete(aio.add(iter(paths)))
+        self.assertEqual(ret, 0, err)
+        ret, out, err = self.run_until_complete(aio.commit(paths, 'batch'))
+        self.assertEqual(ret, 0, err)
+        self.assertIn("50 files changed", out)
+        with self.assertRaises(ValueError):
+            self.run_until_complete(aio.add([]))
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import os
+from unittest import mock
+
+from gitcmd import config, gitcmd
+
+from . import TemporaryTestCase, command
+
+
+
+class TestConfig(TemporaryTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        config.clear_cache()
+        self.local = os.path.join(self.root, 'local')
+        command('git init local', self.root)
+        command('git remote add origin https://example.com/origin.git', self.local)
+        command('git remote add Upstream https://example.com/upstream.git', self.local)
+        command('git config --add remote.origin.fetch +refs/tags/*:refs/tags/*', self.local)
+        command('git config branch.master.remote origin', self.local)
+        command('git config branch.master.merge refs/heads/master', self.local)
+    
+    
+    def tearDown(self):
+        super().tearDown()
+        config.clear_cache()
+    
+    
+    def test0000_get(self):
+        conf = gitcmd.Repository(self.local).config
+        self.assertEqual(conf.get('remote.origin.url'), 'https://example.com/origin.git')
+        self.assertEqual(conf.get('REMOTE.Upstream.URL'), 'https://example.com/upstream.git')
+        self.assertIsNone(conf.get('remote.upstream.url'))
+        self.assertEqual(conf.get('remote.nonexistent.url', 'default'), 'default')
+        self.assertEqual(conf.get_all('remote.origin.fetch'),
+                         ['+refs/heads/*:refs/remotes/origin/*', '+refs/tags/*:refs/tags/*'])
+        self.assertEqual(conf.get_all('remote.nonexistent.fetch'), [])
+        self.assertIn('core.bare', conf)
+        self.assertTrue(conf.origin('remote.origin.url').startswith('file:'))
+        with self.assertRaises(ValueError):
+            conf.get('core')
+    
+    
+    def test0001_remote_branch(self):
+        conf = gitcmd.Repository(self.local).config
+        self.assertEqual(conf.remotes(), ['origin', 'Upstream'])
+        self.assertEqual(
+            conf.remote(),
+            config.Remote('origin', 'https://example.com/origin.git', None,
+                          ['+refs/heads/*:refs/remotes/origin/*', '+refs/tags/*:refs/tags/*'])
+        )
+        self.assertIsNone(conf.remote('nonexistent'))
+        self.assertEqual(conf.branches(), ['master'])
+        self.assertEqual(conf.branch('master'),
+                         config.Branch('master', 'origin', 'refs/heads/master'))
+        self.assertIsNone(conf.branch('nonexistent'))
+    
+    
+    def test0002_include(self):
+        with open(os.path.join(self.root, 'included'), 'w') as f:
+            f.write('[remote "included"]\n\turl = https://example.com/included.git\n')
+        command('git config include.path ' + os.path.join(self.root, 'included'), self.local)
+        self.assertEqual(gitcmd.remote_url(self.local, 'included'),
+                         (0, 'https://example.com/included.git', ''))
+        
+        with open(os.path.join(self.root, 'included'), 'w') as f:
+            f.write('[remote "included"]\n\turl = https://example.com/changed.git\n')
+        self.assertEqual(gitcmd.remote_url(self.local, 'included'),
+                         (0, 'https://example.com/changed.git', ''))
+    
+    
+    def test0003_cached(self):
+        repository = gitcmd.Repository(self.local)
+        self.assertEqual(repository.remote_url(), (0, 'https://example.com/origin.git', ''))
+        with mock.patch('subprocess.Popen', side_effect=AssertionError("spawned git")):
+            for _ in range(10):
+                self.assertEqual(repository.remote_url('Upstream'),
+                                 (0, 'https://example.com/upstream.git', ''))
+                self.assertEqual(repository.remote_url('nonexistent'), (1, '', ''))
+        
+        repository.set_url('https://example.com/new.git')
+        self.assertEqual(repository.remote_url(), (0, 'https://example.com/new.git', ''))
+    
+    
+    def test0004_invalid_config(self):
+        with open(os.path.join(self.local, '.git', 'config'), 'a') as f:
+            f.write('[invalid\n')
+        ret, out, err = gitcmd.remote_url(self.local)
+        self.assertNotEqual(ret, 0)
+        self.assertIn('bad config', err)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+from unittest import mock
+
+from gitcmd import discovery, gitcmd
+
+from . import TemporaryTestCase, command
+
+
+
+class TestDiscovery(TemporaryTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        discovery.clear_cache()
+        self.local = self.init('local')
+        self.bare = self.init('bare', bare=True)
+        os.makedirs(os.path.join(self.local, 'a', 'b'))
+        command('touch a/b/file.txt', self.local)
+        command('git add . && git commit -m "test"', self.local)
+    
+    
+    def tearDown(self):
+        super().tearDown()
+        discovery.clear_cache()
+    
+    
+    def assertSameAsGit(self, path):
+        self.assertEqual(discovery.discover(path), gitcmd.Repository._rev_parse(path))
+    
+    
+    def test0000_work_tree(self):
+        self.assertEqual(
+            discovery.discover(os.path.join(self.local, 'a', 'b', 'file.txt')),
+            (os.path.join(self.local, '.git'), os.path.join(self.local, '.git'), self.local)
+        )
+        self.assertSameAsGit(self.local)
+        self.assertSameAsGit(os.path.join(self.local, 'a'))
+        self.assertSameAsGit(os.path.join(self.local, 'a', 'b', 'file.txt'))
+    
+    
+    def test0001_git_dir(self):
+        self.assertEqual(discovery.discover(self.bare), (self.bare, self.bare, None))
+        self.assertSameAsGit(self.bare)
+        self.assertSameAsGit(os.path.join(self.bare, 'refs', 'heads'))
+        self.assertSameAsGit(os.path.join(self.local, '.git'))
+        self.assertSameAsGit(os.path.join(self.local, '.git', 'objects'))
+    
+    
+    def test0002_not_in_repository(self):
+        self.assertIsNone(discovery.discover(self.root))
+        self.assertIsNone(discovery.discover(os.path.join(self.root, 'nonexistent', 'file')))
+        with self.assertRaises(gitcmd.NotInRepositoryError):
+            gitcmd.Repository(self.root)
+    
+    
+    def test0003_linked_worktree(self):
+        worktree = os.path.join(self.root, 'worktree')
+        command('git worktree add ../worktree -b other', self.local)
+        
+        git_dir, common_dir, top_level = discovery.discover(os.path.join(worktree, 'a'))
+        self.assertEqual(git_dir, os.path.join(self.local, '.git', 'worktrees', 'worktree'))
+        self.assertEqual(common_dir, os.path.join(self.local, '.git'))
+        self.assertEqual(top_level, worktree)
+        self.assertSameAsGit(os.path.join(worktree, 'a', 'b', 'file.txt'))
+        self.assertTrue(gitcmd.Repository(worktree).worktree)
+    
+    
+    def test0004_gitdir_file(self):
+        # Submodules use a '.git' file with a path relative to the working tree
+        submodule = os.path.join(self.local, 'sub')
+        modules = os.path.join(self.local, '.git', 'modules')
+        command('git init sub', self.local)
+        os.makedirs(modules)
+        shutil.move(os.path.join(submodule, '.git'), os.path.join(modules, 'sub'))
+        with open(os.path.join(submodule, '.git'), 'w') as f:
+            print("gitdir: ../.git/modules/sub", file=f)
+        
+        self.assertEqual(
+            discovery.discover(submodule),
+            (os.path.join(modules, 'sub'), os.path.join(modules, 'sub'), submodule)
+        )
+        self.assertSameAsGit(submodule)
+    
+    
+    def test0005_ceiling_directories(self):
+        directory = os.path.join(self.local, 'a', 'b')
+        ceilings = {'GIT_CEILING_DIRECTORIES': os.path.join(self.local, 'a')}
+        with mock.patch.dict(os.environ, ceilings):
+            self.assertIsNone(discovery.discover(directory))
+            self.assertFalse(gitcmd.in_repository(directory))
+            self.assertSameAsGit(directory)
+        with mock.patch.dict(os.environ, {'GIT_CEILING_DIRECTORIES': self.root}):
+            self.assertEqual(discovery.discover(directory)[2], self.local)
+        
+        # Repositories cached before the ceilings change are not returned
+        self.assertEqual(discovery.discover(directory)[2], self.local)
+        with mock.patch.dict(os.environ, {'GIT_CEILING_DIRECTORIES': self.local}):
+            self.assertIsNone(discovery.discover(directory))
+            self.assertSameAsGit(directory)
+    
+    
+    def test0006_cache(self):
+        directory = os.path.join(self.local, 'a', 'b')
+        self.assertEqual(discovery.discover(directory)[2], self.local)
+        
+        # Creating a repository in a cached directory invalidates its entry
+        command('git init', directory)
+        self.assertEqual(discovery.discover(directory)[2], directory)
+        
+        # Removing the repository invalidates every entry pointing to it
+        shutil.rmtree(os.path.join(self.local, '.git'))
+        self.assertIsNone(discovery.discover(os.path.join(self.local, 'a')))
+        
+        with mock.patch.object(discovery, 'MAX_ENTRIES', 2):
+            discovery.discover(directory)
+            discovery.discover(os.path.join(self.local, 'a'))
+            self.assertEqual(len(discovery._cache), 2)
+    
+    
+    def test0007_fallback(self):
+        with mock.patch.dict(os.environ, {'GIT_DIR': os.path.join(self.local, '.git')}):
+            self.assertFalse(discovery.supported())
+            with mock.patch.object(discovery, 'discover') as discover:
+                repository = gitcmd.Repository(self.root)
+                discover.assert_not_called()
+        self.assertEqual(repository.git_dir, os.path.join(self.local, '.git'))
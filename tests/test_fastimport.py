@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import os
+import subprocess
+import time
+from unittest import mock
+
+from gitcmd import BulkCommitWriter, RefConflictError
+
+from . import TemporaryTestCase, command
+
+
+
+class TestBulkCommitWriter(TemporaryTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.local = self.init('local')
+        command('touch file.txt && git add . && git commit -m "first"', self.local)
+        self.head = command('git rev-parse HEAD', self.local)[1]
+    
+    
+    def test0001_commits(self):
+        date = datetime.datetime(2020, 1, 2, 3, 4, 5,
+                                 tzinfo=datetime.timezone(datetime.timedelta(hours=-3)))
+        with BulkCommitWriter(self.local, 'master') as writer:
+            marks = [writer.commit('snapshot %d' % i, {'data/%d.txt' % i: b'%d' % i})
+                     for i in range(1000)]
+            self.assertEqual(list(range(1, 1001)), marks)
+            writer.commit('last', {'data/0.txt': 'zero'}, ['file.txt', 'data/1.txt'],
+                          'Other', 'other@example.com', date)
+        
+        self.assertEqual(1001, len(writer.commits))
+        self.assertEqual(writer.commits[-1], command('git rev-parse master', self.local)[1])
+        self.assertEqual(self.head, command('git rev-parse master~1001', self.local)[1])
+        self.assertEqual(writer.commits[0], command('git rev-parse master~1000', self.local)[1])
+        self.assertEqual('Other <other@example.com> 2020-01-02T03:04:05-03:00|Your Name|last',
+                         command('git log -1 --format="%an <%ae> %aI|%cn|%s"', self.local)[1])
+        self.assertEqual('Your Name|snapshot 999',
+                         command('git log -1 --format="%an|%s" master^', self.local)[1])
+        
+        files = command('git ls-tree -r --name-only master', self.local)[1].split('\n')
+        self.assertEqual(999, len(files))
+        self.assertNotIn('file.txt', files)
+        self.assertNotIn('data/1.txt', files)
+        self.assertEqual('zero', command('git show master:data/0.txt', self.local)[1])
+        self.assertEqual('999', command('git show master:data/999.txt', self.local)[1])
+        command('git fsck --strict', self.local)
+    
+    
+    def test0002_checkpoint(self):
+        with BulkCommitWriter(self.local, 'snapshots') as writer:
+            self.assertEqual([], writer.checkpoint())
+            writer.commit('a', {'a.txt': b'a'})
+            writer.commit('b', {'b.txt': b'b'})
+            names = writer.checkpoint()
+            self.assertEqual(2, len(names))
+            self.assertEqual(names[-1], command('git rev-parse snapshots', self.local)[1])
+            writer.commit('c', {'c.txt': b'c'})
+            self.assertEqual(names, writer.commits)
+            self.assertEqual(names[-1], writer.parent)
+        self.assertEqual(3, len(writer.commits))
+        self.assertEqual(names[-1], command('git rev-parse snapshots^', self.local)[1])
+        # The branch did not exist, its first commit is a root commit
+        self.assertEqual('', command('git log -1 --format=%P snapshots~2', self.local)[1])
+        self.assertEqual(self.head, command('git rev-parse master', self.local)[1])
+        
+        # Writing again continues from the last commit
+        writer.commit('d')
+        self.assertEqual(1, len(writer.close()))
+        self.assertEqual(writer.commits[2], command('git rev-parse snapshots^', self.local)[1])
+    
+    
+    def test0003_root_and_parent(self):
+        with BulkCommitWriter(self.local, 'refs/heads/orphan', parent=None) as writer:
+            pass
+        self.assertEqual([], writer.commits)
+        
+        with BulkCommitWriter(self.local, 'refs/heads/new', parent='HEAD') as writer:
+            writer.commit('new', {'new.txt': b'new'})
+        self.assertEqual(self.head, command('git rev-parse new^', self.local)[1])
+        
+        command('git checkout --orphan empty && git rm -rf . && git commit --allow-empty -m root',
+                self.local)
+        command('git update-ref -d refs/heads/empty', self.local)
+        with BulkCommitWriter(self.local, 'empty') as writer:
+            writer.commit('root', {'root.txt': 'root'})
+        self.assertEqual('', command('git log -1 --format=%P empty', self.local)[1])
+        
+        with self.assertRaises(subprocess.CalledProcessError):
+            BulkCommitWriter(self.local, 'master', parent='unknown')
+    
+    
+    def test0004_conflict(self):
+        writer = BulkCommitWriter(self.local, 'master')
+        writer.commit('mine', {'a.txt': b'a'})
+        command('git commit --allow-empty -m "concurrent"', self.local)
+        with self.assertRaises(RefConflictError):
+            writer.close()
+        self.assertEqual('concurrent', command('git log -1 --format=%s', self.local)[1])
+    
+    
+    def test0005_abort(self):
+        with self.assertRaises(KeyError):
+            with BulkCommitWriter(self.local, 'master') as writer:
+                writer.commit('aborted', {'a.txt': b'a'})
+                raise KeyError
+        self.assertEqual(self.head, command('git rev-parse master', self.local)[1])
+        self.assertEqual([], writer.commits)
+    
+    
+    def test0006_errors(self):
+        writer = BulkCommitWriter(self.local, 'master')
+        with self.assertRaises(ValueError):
+            writer.commit('log', name='Name')
+        with self.assertRaises(ValueError):
+            writer.commit('log', name='Na<me', mail='mail')
+        command('git config --unset user.name', self.local)
+        writer = BulkCommitWriter(self.local, 'master')
+        with self.assertRaises(ValueError):
+            writer.commit('log')
+        # The author is then also the committer
+        writer.commit('log', name='Name', mail='mail@example.com')
+        writer.close()
+        self.assertEqual('Name|Name', command('git log -1 --format=%an\\|%cn', self.local)[1])
+        
+        writer = BulkCommitWriter(self.local, 'master')
+        for path in ('../outside', 'a//b', '/a', '.git/config', 'a\0b', ''):
+            with self.assertRaises(ValueError):
+                writer.commit('log', {path: b'x'}, name='Name', mail='mail@example.com')
+        
+        writer = BulkCommitWriter(self.local, 'refs/heads/in..valid')
+        writer.commit('log', {'a.txt': b'a'}, name='Name', mail='mail@example.com')
+        with self.assertRaises(subprocess.CalledProcessError):
+            writer.close()
+        self.assertEqual('Name|Name', command('git log -1 --format=%an\\|%cn', self.local)[1])
+    
+    
+    def test0007_naive_date(self):
+        self.addCleanup(time.tzset)
+        with mock.patch.dict(os.environ, {'TZ': 'America/Sao_Paulo'}):
+            time.tzset()
+            with BulkCommitWriter(self.local, 'master') as writer:
+                writer.commit('naive', date=datetime.datetime(2020, 1, 2, 3, 4, 5))
+        self.assertEqual('2020-01-02T03:04:05-03:00',
+                         command('git log -1 --format=%aI', self.local)[1])
+
@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import datetime
 import os
 import shutil
 import subprocess
+import threading
 import unittest
+from unittest import mock
 
 from gitcmd import gitcmd
+from gitcmd.ignore import IgnoreMatch
+from gitcmd.status import parse as parse_status
 
 
 gitcmd.GIT_LANG = 'en_US.UTF-8'
@@ -591,7 +596,7 @@ class TestGitcmd(unittest.TestCase):
         
         ret, out, err = gitcmd.show_last_revision(test_file)
         self.assertEqual(ret, 0)
-        self.assertIn('test', out)
+        self.assertEqual('', out)
 
 
     def test1501_show_last_revision(self):
@@ -609,9 +614,538 @@ class TestGitcmd(unittest.TestCase):
         self.assertEqual(ret, 0)
         self.assertIn('A string', out)
     
+    def test1503_show_last_revision_several_hunks(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        test_file = os.path.join(local, 'test')
+        lines = ["line %d" % i for i in range(50)]
+        
+        with open(test_file, 'w+') as f:
+            print("\n".join(lines), file=f)
+        gitcmd.add(test_file)
+        gitcmd.commit(test_file, 'test')
+        lines[2], lines[45] = "first change", "second change"
+        with open(test_file, 'w+') as f:
+            print("\n".join(lines), file=f)
+        gitcmd.add(test_file)
+        gitcmd.commit(test_file, 'test')
+        with open(test_file, 'w+') as f:
+            print("Uncommitted", file=f)
+        
+        ret, out, err = gitcmd.show_last_revision(test_file)
+        self.assertEqual(ret, 0)
+        self.assertEqual("\n".join(lines), out)
+    
+    
+    def test1504_show_last_revision_untracked(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        test_file = os.path.join(local, 'test')
+        open(test_file, 'w+').close()
+        
+        ret, out, err = gitcmd.show_last_revision(test_file)
+        self.assertEqual(ret, 128)
+        self.assertIn("does not exist", err)
+    
+    
     def test1502_show_last_revision_exception(self):
         local = os.path.join(LOCAL_DIRS, 'local')
         with self.assertRaises(ValueError):
             gitcmd.show_last_revision(local)
         with self.assertRaises(gitcmd.NotInRepositoryError):
             gitcmd.show_last_revision("/")
+    
+    
+    def test1600_repository(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        test_file = os.path.join(local, 'test')
+        
+        repository = gitcmd.Repository(test_file)
+        self.assertEqual(repository.top_level, os.path.realpath(local))
+        self.assertEqual(repository.git_dir, os.path.realpath(os.path.join(local, '.git')))
+        self.assertFalse(repository.bare)
+        self.assertFalse(repository.worktree)
+        
+        open(test_file, 'w+').close()
+        ret, out, err = repository.add(test_file)
+        self.assertEqual(ret, 0)
+        ret, out, err = repository.commit('test')
+        self.assertEqual(ret, 0)
+        ret, out, err = repository.current_branch()
+        self.assertEqual(ret, 0)
+        self.assertEqual(out, "master")
+        ret, out, err = repository.push()
+        self.assertEqual(ret, 0)
+        self.assertIn("master -> master", err)
+    
+    
+    def test1601_repository_bare(self):
+        repository = gitcmd.Repository(HOST_DIR)
+        self.assertTrue(repository.bare)
+        self.assertEqual(repository.git_dir, os.path.realpath(HOST_DIR))
+    
+    
+    def test1602_repository_exception(self):
+        with self.assertRaises(gitcmd.NotInRepositoryError):
+            gitcmd.Repository('/tmp')
+    
+    
+    def test1700_special_characters(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        test_file = os.path.join(local, 'a "file" with \'quotes\' & spaces; $HOME')
+        log = 'A "log" with \'quotes\', `backquotes` and $HOME'
+        
+        open(test_file, 'w+').close()
+        ret, out, err = gitcmd.add(test_file)
+        self.assertEqual(ret, 0, err)
+        ret, out, err = gitcmd.commit(test_file, log, name="Miles O'Brien", mail="ob@test.com")
+        self.assertEqual(ret, 0, err)
+        cwd = os.getcwd()
+        os.chdir(local)
+        _, out, _ = command("git log -1 --format='%an%n%s' --name-only")
+        os.chdir(cwd)
+        self.assertEqual(out.split('\n')[:2], ["Miles O'Brien", log])
+        self.assertIn("with 'quotes' & spaces; $HOME", out)
+    
+    
+    def test1701_spawn_time_logged(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        
+        with self.assertLogs('gitcmd.gitcmd', 'DEBUG') as logs:
+            gitcmd.status(local)
+        self.assertTrue(any("git status: spawned in" in line for line in logs.output))
+    
+    
+    def test1800_read_file(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        test_file = os.path.join(local, 'test')
+        
+        with open(test_file, 'wb') as f:
+            f.write(b"first\x00\xff")
+        gitcmd.add(test_file)
+        gitcmd.commit(test_file, 'test')
+        with open(test_file, 'wb') as f:
+            f.write(b"second")
+        gitcmd.add(test_file)
+        gitcmd.commit(test_file, 'test')
+        
+        with gitcmd.Repository(local) as repository:
+            self.assertEqual(b"second", repository.read_file(test_file))
+            self.assertEqual(b"first\x00\xff", repository.read_file(test_file, "HEAD~1"))
+            self.assertEqual(b"", repository.read_file(os.path.join(local, 'file.txt')))
+            with self.assertRaises(ValueError):
+                repository.read_file(os.path.join(local, 'nonexistent'))
+            with self.assertRaises(ValueError):
+                repository.read_file(local)
+            
+            repository.close()  # A closed repository starts a new process on the next read
+            self.assertEqual(b"second", repository.read_file(test_file))
+    
+    
+    def test1801_read_files(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        paths = [os.path.join(local, 'test%d' % i) for i in range(100)]
+        for i, path in enumerate(paths):
+            with open(path, 'w+') as f:
+                print(i, file=f)
+        gitcmd.add(local)
+        gitcmd.commit(local, 'test')
+        
+        with gitcmd.Repository(local) as repository:
+            contents = repository.read_files(paths + [os.path.join(local, 'nonexistent')])
+            # The name of a missing object is echoed by git, and may contain spaces
+            missing = [os.path.join(local, 'x y'), os.path.join(local, 'a b c')]
+            self.assertEqual(repository.read_files(missing), dict.fromkeys(missing))
+            self.assertEqual(contents[paths[0]], repository.read_file(paths[0]))
+        self.assertEqual(len(contents), 101)
+        self.assertIsNone(contents[os.path.join(local, 'nonexistent')])
+        for i, path in enumerate(paths):
+            self.assertEqual(contents[path], ("%d\n" % i).encode())
+    
+    
+    def test1802_read_file_symlink(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        link = os.path.join(local, 'link')
+        with open(os.path.join(local, 'target'), 'w+') as f:
+            f.write('T')
+        os.symlink('target', link)
+        gitcmd.add(local)
+        gitcmd.commit(local, 'test')
+        
+        with gitcmd.Repository(local) as repository:
+            self.assertEqual(b"target", repository.read_file(link))
+            self.assertEqual({link: b"target"}, repository.read_files([link]))
+        self.assertEqual((0, "target", ""), gitcmd.show_last_revision(link))
+    
+    
+    def test1900_status_entries(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        gitcmd.clone(LOCAL_DIRS, HOST_DIR, to='local')
+        
+        entries = list(gitcmd.status_entries(local))
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].head, "master")
+        self.assertEqual(entries[0].upstream, "origin/master")
+        self.assertEqual((entries[0].ahead, entries[0].behind), (0, 0))
+        self.assertEqual(len(entries[0].oid), 40)
+        
+        with open(os.path.join(local, 'file.txt'), 'w+') as f:
+            print("modified", file=f)
+        os.makedirs(os.path.join(local, 'dir'))
+        open(os.path.join(local, 'dir', 'untracked file'), 'w+').close()
+        open(os.path.join(local, 'staged'), 'w+').close()
+        gitcmd.add(os.path.join(local, 'staged'))
+        
+        entries = gitcmd.status_entries(local, untracked="all", branch=False)
+        entries = {e.path: e for e in entries}
+        self.assertEqual(set(entries), {'file.txt', 'dir/untracked file', 'staged'})
+        self.assertEqual((entries['file.txt'].kind, entries['file.txt'].index,
+                          entries['file.txt'].worktree), ('1', '.', 'M'))
+        self.assertEqual(entries['file.txt'].modes, ('100644', '100644', '100644'))
+        self.assertEqual((entries['staged'].kind, entries['staged'].index), ('1', 'A'))
+        self.assertEqual(entries['staged'].modes[0], '000000')
+        self.assertEqual(entries['dir/untracked file'].kind, '?')
+        
+        entries = [e.path for e in gitcmd.status_entries(local, branch=False)]
+        self.assertIn('dir/', entries)
+        command('cd %s && git config status.showUntrackedFiles all' % local)
+        entries = [e.path for e in gitcmd.status_entries(local, branch=False)]
+        self.assertIn('dir/untracked file', entries)
+        entries = [e.path for e in gitcmd.status_entries(local, untracked="normal", branch=False)]
+        self.assertIn('dir/', entries)
+        entries = [e.path for e in gitcmd.status_entries(local, untracked="no", branch=False)]
+        self.assertEqual(sorted(entries), ['file.txt', 'staged'])
+    
+    
+    def test1901_status_entries_renamed(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        cwd = os.getcwd()
+        os.chdir(local)
+        command('git mv file.txt "new name.txt"')
+        os.chdir(cwd)
+        
+        entries = list(gitcmd.status_entries(local, branch=False))
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].kind, '2')
+        self.assertEqual(entries[0].index, 'R')
+        self.assertEqual(entries[0].score, 'R100')
+        self.assertEqual(entries[0].path, 'new name.txt')
+        self.assertEqual(entries[0].orig_path, 'file.txt')
+    
+    
+    def test1902_status_entries_incremental(self):
+        output = (b"# branch.oid (initial)\0# branch.head (detached)\0"
+                  b"1 .M N... 100644 100644 100644 " + b"a" * 40 + b" " + b"b" * 40 + b" f\0"
+                  b"2 R. N... 100644 100644 100644 " + b"a" * 40 + b" " + b"b" * 40 + b" R90 to\0"
+                  b"from\0? untracked\0")
+        
+        for size in (1, 7, len(output)):
+            chunks = [output[i:i + size] for i in range(0, len(output), size)]
+            branch, changed, renamed, untracked = parse_status(chunks)
+            self.assertIsNone(branch.oid)
+            self.assertIsNone(branch.head)
+            self.assertEqual((changed.path, changed.oids), ('f', ("a" * 40, "b" * 40)))
+            self.assertEqual((renamed.path, renamed.orig_path, renamed.score),
+                             ('to', 'from', 'R90'))
+            self.assertEqual(untracked.path, 'untracked')
+    
+    
+    def test1903_status_entries_exception(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        with self.assertRaises(gitcmd.NotInRepositoryError):
+            gitcmd.status_entries('/tmp')
+        with self.assertRaises(ValueError):
+            gitcmd.status_entries(local, untracked="error")
+        with self.assertRaises(ValueError):
+            gitcmd.status_entries(local, ignore_submodules="error")
+        with self.assertRaises(subprocess.CalledProcessError):
+            list(gitcmd.status_entries(HOST_DIR))
+    
+    
+    def test2000_batch_add_commit(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        gitcmd.clone(LOCAL_DIRS, HOST_DIR, to='local')
+        os.makedirs(os.path.join(local, 'sub dir'))
+        paths = [os.path.join(local, 'sub dir', 'file %d' % i) for i in range(500)]
+        paths.append(os.path.join(local, "it's a file"))
+        for path in paths:
+            open(path, 'w+').close()
+        
+        with mock.patch.object(gitcmd, '_execute', wraps=gitcmd._execute) as execute:
+            ret, out, err = gitcmd.add(p for p in paths)
+            self.assertEqual(ret, 0, err)
+            self.assertEqual(execute.call_count, 1)
+        entries = {e.path: e.index for e in gitcmd.status_entries(local, branch=False)}
+        self.assertEqual(len(entries), 501)
+        self.assertEqual(set(entries.values()), {'A'})
+        
+        ret, out, err = gitcmd.commit(paths[:10], 'batch')
+        self.assertEqual(ret, 0, err)
+        self.assertIn("10 files changed", out)
+        self.assertEqual(len(list(gitcmd.status_entries(local, branch=False))), 491)
+    
+    
+    def test2001_batch_checkout_reset(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        gitcmd.clone(LOCAL_DIRS, HOST_DIR, to='local')
+        paths = [os.path.join(local, 'file%d' % i) for i in range(3)]
+        for path in paths:
+            open(path, 'w+').close()
+        gitcmd.add(paths)
+        gitcmd.commit(local, 'files')
+        for path in paths:
+            with open(path, 'w+') as f:
+                print("modified", file=f)
+        
+        ret, out, err = gitcmd.add(paths)
+        self.assertEqual(ret, 0, err)
+        ret, out, err = gitcmd.reset(paths[:2])
+        self.assertEqual(ret, 0, err)
+        entries = {e.path: (e.index, e.worktree)
+                   for e in gitcmd.status_entries(local, branch=False)}
+        self.assertEqual(entries, {'file0': ('.', 'M'), 'file1': ('.', 'M'), 'file2': ('M', '.')})
+        
+        ret, out, err = gitcmd.checkout(paths[:2])
+        self.assertEqual(ret, 0, err)
+        for path in paths[:2]:
+            with open(path) as f:
+                self.assertEqual(f.read(), "")
+        
+        ret, out, err = gitcmd.checkout(paths, "other", True)
+        self.assertEqual(ret, 0, err)
+        self.assertEqual(gitcmd.current_branch(local), (0, "other", ""))
+    
+    
+    def test2002_batch_symlink(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        gitcmd.clone(LOCAL_DIRS, HOST_DIR, to='local')
+        target = os.path.join(local, 'target')
+        with open(target, 'w+') as f:
+            f.write('T')
+        os.symlink('target', os.path.join(local, 'link'))
+        os.symlink('/tmp', os.path.join(local, 'outside'))
+        
+        ret, out, err = gitcmd.add([os.path.join(local, 'link'), os.path.join(local, 'outside')])
+        self.assertEqual(ret, 0, err)
+        entries = {e.path: e.index for e in gitcmd.status_entries(local, branch=False)}
+        self.assertEqual(entries, {'link': 'A', 'outside': 'A', 'target': None})
+    
+    
+    def test2003_batch_exception(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        gitcmd.clone(LOCAL_DIRS, HOST_DIR, to='local')
+        with self.assertRaises(ValueError):
+            gitcmd.add([])
+        with self.assertRaises(ValueError):
+            gitcmd.commit(iter(()), 'empty')
+        with self.assertRaises(gitcmd.NotInRepositoryError):
+            gitcmd.add(['/tmp'])
+        ret, out, err = gitcmd.add([os.path.join(local, 'file.txt'), '/tmp'])
+        self.assertNotEqual(ret, 0)
+        self.assertIn("outside repository", err)
+    
+    
+    def test2100_filter_ignored(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        gitcmd.clone(LOCAL_DIRS, HOST_DIR, to='local')
+        with open(os.path.join(local, '.gitignore'), 'w+') as f:
+            print("*.log\n!keep.log\nbuild/", file=f)
+        os.makedirs(os.path.join(local, 'build'))
+        paths = [os.path.join(local, p) for p in
+                 ('a.log', 'keep.log', 'file.txt', 'build/out', 'dir/b.log', 'sp ace.log')]
+        
+        matches = list(gitcmd.filter_ignored(local, iter(paths)))
+        self.assertEqual([m.path for m in matches], paths)
+        self.assertEqual([m.ignored for m in matches], [True, False, False, True, True, True])
+        self.assertEqual(matches[0], IgnoreMatch(paths[0], True, '.gitignore', 1, '*.log'))
+        self.assertEqual(matches[1].pattern, '!keep.log')
+        self.assertEqual(matches[2], IgnoreMatch(paths[2], False, None, None, None))
+        self.assertEqual((matches[3].line, matches[3].pattern), (3, 'build/'))
+    
+    
+    def test2101_filter_ignored_persistent(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        gitcmd.clone(LOCAL_DIRS, HOST_DIR, to='local')
+        with open(os.path.join(local, '.gitignore'), 'w+') as f:
+            print("*.log", file=f)
+        paths = [os.path.join(local, 'file%d.%s' % (i, 'log' if i % 2 else 'txt'))
+                 for i in range(5000)]
+        
+        with gitcmd.Repository(local) as repository:
+            with mock.patch('subprocess.Popen', wraps=subprocess.Popen) as popen:
+                ignored = [m.path for m in repository.filter_ignored(paths) if m.ignored]
+                self.assertEqual(ignored, paths[1::2])
+                # Interrupting a check does not corrupt the next one
+                next(repository.filter_ignored(paths))
+                matches = list(repository.filter_ignored(paths[:3]))
+                self.assertEqual([m.ignored for m in matches], [False, True, False])
+                self.assertEqual(popen.call_count, 1)
+            with self.assertRaises(subprocess.CalledProcessError):
+                list(repository.filter_ignored(['/tmp']))
+            self.assertTrue(next(repository.filter_ignored(paths[1:])).ignored)
+    
+    
+    def test2102_filter_ignored_interleaved(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        gitcmd.clone(LOCAL_DIRS, HOST_DIR, to='local')
+        with open(os.path.join(local, '.gitignore'), 'w+') as f:
+            print("*.log", file=f)
+        paths = [os.path.join(local, 'file%d.%s' % (i, 'log' if i % 2 else 'txt'))
+                 for i in range(3000)]
+        
+        with gitcmd.Repository(local) as repository:
+            a = repository.filter_ignored(paths)
+            b = repository.filter_ignored(paths[1:])
+            self.assertFalse(next(a).ignored)
+            self.assertTrue(next(b).ignored)
+            self.assertEqual(next(a).path, paths[1])
+            self.assertEqual(next(b).path, paths[2])
+            repository.close()  # Does not wait for the checks to be over
+            self.assertEqual(len(list(a)), len(paths) - 2)
+            self.assertEqual(len(list(b)), len(paths) - 3)
+    
+    
+    def test2200_clone_shallow(self):
+        host = 'file://' + HOST_DIR
+        local = os.path.join(LOCAL_DIRS, 'local')
+        for i in range(3):
+            command('cd %s && git commit --allow-empty -m "commit %d" && git push -q' % (local, i))
+        command('cd %s && git checkout -b other && git push -q origin other' % local)
+        
+        ret, _, err = gitcmd.clone(LOCAL_DIRS, host, to='shallow', depth=1)
+        self.assertEqual(ret, 0, err)
+        shallow = os.path.join(LOCAL_DIRS, 'shallow')
+        self.assertEqual(command('cd %s && git rev-list --count HEAD' % shallow)[1], '1')
+        self.assertNotIn('origin/other', command('cd %s && git branch -r' % shallow)[1])
+        
+        ret, _, err = gitcmd.pull(shallow, depth=2)
+        self.assertEqual(ret, 0, err)
+        self.assertEqual(command('cd %s && git rev-parse --is-shallow-repository' % shallow)[1],
+                         'true')
+        ret, _, err = gitcmd.pull(shallow, unshallow=True)
+        self.assertEqual(ret, 0, err)
+        self.assertEqual(command('cd %s && git rev-list --count HEAD' % shallow)[1], '4')
+        
+        ret, _, err = gitcmd.clone(LOCAL_DIRS, host, to='since',
+                                   shallow_since=datetime.datetime(2000, 1, 1))
+        self.assertEqual(ret, 0, err)
+    
+    
+    def test2201_clone_branch_partial(self):
+        host = 'file://' + HOST_DIR
+        local = os.path.join(LOCAL_DIRS, 'local')
+        command('git -C %s config uploadpack.allowFilter true' % HOST_DIR)
+        command('cd %s && mkdir dir && echo content > dir/file.txt && git add dir '
+                '&& git commit -m "dir" && git checkout -b other && git push -q origin master other'
+                % local)
+        
+        ret, _, err = gitcmd.clone(LOCAL_DIRS, host, to='single', single_branch=True,
+                                   branch='other')
+        self.assertEqual(ret, 0, err)
+        single = os.path.join(LOCAL_DIRS, 'single')
+        self.assertEqual(gitcmd.current_branch(single)[1], 'other')
+        self.assertEqual(command('cd %s && git branch -r' % single)[1], 'origin/other')
+        
+        ret, _, err = gitcmd.clone(LOCAL_DIRS, host, to='partial', filter='blob:none',
+                                   no_checkout=True)
+        self.assertEqual(ret, 0, err)
+        partial = os.path.join(LOCAL_DIRS, 'partial')
+        self.assertFalse(os.path.exists(os.path.join(partial, 'file.txt')))
+        self.assertEqual(command('cd %s && git config remote.origin.partialclonefilter'
+                                 % partial)[1], 'blob:none')
+        
+        ret, _, err = gitcmd.clone(LOCAL_DIRS, host, to='sparse', sparse=True)
+        self.assertEqual(ret, 0, err)
+        sparse = os.path.join(LOCAL_DIRS, 'sparse')
+        self.assertTrue(os.path.isfile(os.path.join(sparse, 'file.txt')))
+        self.assertFalse(os.path.exists(os.path.join(sparse, 'dir')))
+    
+    
+    def test2202_clone_options_exception(self):
+        for depth in (0, -1, 1.5, True, '1'):
+            with self.assertRaises(ValueError):
+                gitcmd.clone(LOCAL_DIRS, HOST_DIR, depth=depth)
+        with self.assertRaises(ValueError):
+            gitcmd.pull(os.path.join(LOCAL_DIRS, 'local'), depth=1, unshallow=True)
+        self.assertEqual(
+            gitcmd._clone_args('url', 'to', depth=3, filter='tree:0', branch='dev'),
+            ['clone', '--depth=3', '--branch', 'dev', '--filter=tree:0', '--', 'url', 'to']
+        )
+    
+    def test2300_write_commit(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        command('cd %s && printf "#!/bin/sh\\n" > run.sh && chmod +x run.sh && touch old.txt '
+                '&& git add . && git commit -m "first"' % local)
+        first = command('git -C %s rev-parse HEAD' % local)[1]
+        
+        sha = gitcmd.write_commit(local, 'master', 'second\n\nbody', {
+            'dir/new.txt': b'new\n', 'run.sh': '#!/bin/sh\necho\n'
+        }, ['old.txt'], 'Other', 'other@example.com')
+        self.assertEqual(sha, command('git -C %s rev-parse master' % local)[1])
+        self.assertEqual(first, command('git -C %s rev-parse master^' % local)[1])
+        self.assertEqual('Other <other@example.com>|second',
+                         command('git -C %s log -1 --format="%%an <%%ae>|%%s"' % local)[1])
+        self.assertEqual('new', command('git -C %s show master:dir/new.txt' % local)[1])
+        self.assertEqual('100755', command('git -C %s ls-tree master run.sh' % local)[1][:6])
+        self.assertEqual(['dir/new.txt', 'file.txt', 'run.sh'],
+                         command('git -C %s ls-tree -r --name-only master' % local)[1].split())
+        self.assertIn('commit: second', command('git -C %s reflog -1 master' % local)[1])
+        # Neither the working tree nor the index were touched
+        self.assertFalse(os.path.exists(os.path.join(local, 'dir')))
+        self.assertTrue(os.path.exists(os.path.join(local, 'old.txt')))
+        self.assertEqual(['file.txt', 'old.txt', 'run.sh'],
+                         command('git -C %s ls-files' % local)[1].split())
+    
+    
+    def test2301_write_commit_branches(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        head = command('git -C %s rev-parse HEAD' % local)[1]
+        
+        root = gitcmd.write_commit(local, 'refs/heads/root', 'root', {'a.txt': b'a'})
+        self.assertEqual('', command('git -C %s log -1 --format=%%P root' % local)[1])
+        self.assertEqual('a.txt', command('git -C %s ls-tree --name-only root' % local)[1])
+        
+        other = gitcmd.write_commit(local, 'other', 'other', {'b.txt': b'b'}, parent='root')
+        self.assertEqual(root, command('git -C %s rev-parse other^' % local)[1])
+        self.assertEqual(root, command('git -C %s rev-parse root' % local)[1])
+        self.assertEqual(head, command('git -C %s rev-parse master' % local)[1])
+        
+        with self.assertRaises(subprocess.CalledProcessError):
+            gitcmd.write_commit(local, 'master', 'log', {'c.txt': b'c'}, parent='unknown')
+        with self.assertRaises(ValueError):
+            gitcmd.write_commit(local, 'master', 'log', {'c.txt': b'c'}, name='Name')
+        
+        # Concurrent commits to different branches
+        results = {}
+        
+        def write(branch):
+            results[branch] = gitcmd.write_commit(local, branch, branch, {branch: b'x'},
+                                                  parent=other)
+        
+        threads = [threading.Thread(target=write, args=('b%d' % i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(4, len(results))
+        for branch, sha in results.items():
+            self.assertEqual(sha, command('git -C %s rev-parse %s' % (local, branch))[1])
+            self.assertEqual(other, command('git -C %s rev-parse %s^' % (local, branch))[1])
+    
+    
+    def test2302_write_commit_conflict(self):
+        local = os.path.join(LOCAL_DIRS, 'local')
+        head = command('git -C %s rev-parse HEAD' % local)[1]
+        resolve = gitcmd.Repository.resolve
+        calls = []
+        
+        def moved(repository, name="HEAD"):
+            value = resolve(repository, name)
+            if not calls:  # Another process updates master once it has been read
+                calls.append(name)
+                command('git -C %s commit --allow-empty -m concurrent' % local)
+            return value
+        
+        with mock.patch.object(gitcmd.Repository, 'resolve', moved):
+            with self.assertRaises(gitcmd.RefConflictError):
+                gitcmd.write_commit(local, 'master', 'second', {'b.txt': b'b'})
+        self.assertEqual(head, command('git -C %s rev-parse master^' % local)[1])
+        self.assertEqual('concurrent', command('git -C %s log -1 --format=%%s' % local)[1])
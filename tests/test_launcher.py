@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+from gitcmd import gitcmd, launcher, run_many
+
+from . import TemporaryTestCase, command
+
+
+
+class TestLauncher(TemporaryTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.local = self.init('local')
+        command('touch file.txt && git add . && git commit -m "test"', self.local)
+        self.launcher = launcher.start()
+    
+    
+    def tearDown(self):
+        launcher.stop()
+        super().tearDown()
+    
+    
+    def parent(self):
+        """Return the pid of the parent of the git process executing the alias."""
+        ret, out, err, _ = gitcmd._execute(
+            ["-c", "alias.parent=!cut -d' ' -f4 /proc/$PPID/stat", "parent"], self.local
+        )
+        self.assertEqual(ret, 0, err)
+        return int(out)
+    
+    
+    @unittest.skipUnless(os.path.exists('/proc/self/stat'), "Requires /proc")
+    def test0000_spawned_by_helper(self):
+        self.assertIs(launcher.start(), self.launcher)
+        self.assertEqual(self.parent(), self.launcher._process.pid)
+        launcher.stop()
+        self.assertEqual(self.parent(), os.getpid())
+    
+    
+    def test0001_commands(self):
+        for name in ('a.txt', 'b c.txt'):
+            open(os.path.join(self.local, name), 'w').close()
+        paths = [os.path.join(self.local, n) for n in ('a.txt', 'b c.txt')]
+        self.assertEqual(gitcmd.add(paths)[0], 0)
+        ret, out, _ = gitcmd.commit(paths, 'batch')
+        self.assertEqual(ret, 0)
+        self.assertIn('2 files changed', out)
+        self.assertEqual(gitcmd.status(self.local)[0], 0)
+        self.assertEqual(gitcmd.remote_url(self.local), (1, '', ''))
+        self.assertEqual(gitcmd.current_branch(self.local), (0, 'master', ''))
+        
+        ret, _, err = gitcmd.checkout(self.local, 'unknown')
+        self.assertNotEqual(ret, 0)
+        self.assertIn('unknown', err)
+        
+        self.assertEqual([e.path for e in gitcmd.status_entries(self.local, branch=False)], [])
+        open(os.path.join(self.local, 'new.txt'), 'w').close()
+        entries = gitcmd.status_entries(self.local, branch=False)
+        self.assertEqual(next(entries).path, 'new.txt')
+        entries.close()  # Kills git
+        
+        results = list(run_many(gitcmd.status, [self.local] * 8))
+        self.assertTrue(all(r.result[0] == 0 for r in results))
+    
+    
+    def test0002_errors(self):
+        with self.assertRaises(FileNotFoundError):
+            self.launcher.spawn(['git', 'status'], os.path.join(self.root, 'missing'))
+        with self.assertRaises(FileNotFoundError):
+            self.launcher.spawn(['missing-program'], self.root)
+        
+        process = self.launcher.spawn(['sleep', '10'], self.root)
+        process.kill()
+        self.assertLess(process.wait(), 0)
+        
+        process = self.launcher.spawn(['sleep', '10'], self.root)
+        self.launcher._process.kill()
+        self.assertEqual(process.wait(), -1)
+        with self.assertRaises(OSError):
+            self.launcher.spawn(['git', 'status'], self.root)
+        
+        # A new helper is started once the previous one died
+        self.assertIsNot(launcher.start(), self.launcher)
+        self.assertEqual(gitcmd.status(self.local)[0], 0)
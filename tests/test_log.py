@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import os
+import subprocess
+
+from gitcmd import gitcmd
+from gitcmd.log import parse
+
+from . import TemporaryTestCase, command
+
+
+
+class TestLog(TemporaryTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.local = self.init('local')
+        self.date = 1600000000
+    
+    
+    def commit(self, message, path='file.txt'):
+        """Commit a change of <path>, one minute after the previous commit."""
+        self.date += 60
+        command('mkdir -p "$(dirname %s)" && echo "%s" >> %s && git add -A && '
+                'GIT_AUTHOR_DATE="%d +0000" GIT_COMMITTER_DATE="%d +0000" git commit -qm "%s"'
+                % (path, message, path, self.date, self.date, message), self.local)
+        return command('git rev-parse HEAD', self.local)[1]
+    
+    
+    def pages(self, size, skip=None, **kwargs):
+        """Return the subjects of every page of <size> commits, <skip> commits being skipped
+        before the first page."""
+        pages, cursor = [], None
+        while True:
+            page = gitcmd.log(self.local, max_count=size, cursor=cursor,
+                              skip=None if cursor else skip, **kwargs)
+            pages.append([e.subject for e in page])
+            cursor = page.cursor
+            if cursor is None:
+                return pages
+    
+    
+    def test0001_entries(self):
+        first = self.commit('first')
+        command('git commit --allow-empty -q -m "second" -m "body line 1" -m "body line 2" '
+                '--author "Other <other@example.com>"', self.local)
+        
+        entries = list(gitcmd.log(self.local, body=True))
+        self.assertEqual(2, len(entries))
+        second = entries[0]
+        self.assertEqual(command('git rev-parse HEAD', self.local)[1], second.sha)
+        self.assertEqual((first,), second.parents)
+        self.assertEqual(('Other', 'other@example.com'), (second.author, second.author_email))
+        self.assertEqual(('Your Name', 'you@example.com'),
+                         (second.committer, second.committer_email))
+        self.assertIsInstance(second.committer_time, int)
+        self.assertEqual('second', second.subject)
+        self.assertEqual('body line 1\n\nbody line 2', second.body)
+        self.assertEqual((), entries[1].parents)
+        self.assertEqual(self.date, entries[1].author_time)
+        self.assertEqual('', entries[1].body)
+        
+        self.assertIsNone(next(iter(gitcmd.log(self.local))).body)
+        with self.assertRaises(AttributeError):
+            second.other = 1
+    
+    
+    def test0002_options(self):
+        for i in range(10):
+            self.commit('commit %d' % i, 'dir/file.txt' if i % 3 == 0 else 'file.txt')
+        subjects = lambda page: [e.subject for e in page]  # noqa: E731
+        
+        self.assertEqual(['commit 9', 'commit 6', 'commit 3', 'commit 0'],
+                         subjects(gitcmd.log(self.local, paths=os.path.join(self.local, 'dir'))))
+        self.assertEqual(['commit 7', 'commit 6'],
+                         subjects(gitcmd.log(self.local, 'HEAD~2', max_count=2)))
+        self.assertEqual(['commit 9', 'commit 8'],
+                         subjects(gitcmd.log(self.local, 'HEAD~2..HEAD', skip=0)))
+        self.assertEqual(['commit 5', 'commit 4'],
+                         subjects(gitcmd.log(self.local, max_count=2, skip=4)))
+        since = datetime.datetime.fromtimestamp(self.date - 90, datetime.timezone.utc)
+        self.assertEqual(['commit 9', 'commit 8'], subjects(gitcmd.log(self.local, since=since)))
+        
+        for kwargs in ({'max_count': -1}, {'skip': True}, {'cursor': '--all'}, {'cursor': ''}):
+            with self.assertRaises(ValueError):
+                gitcmd.log(self.local, **kwargs)
+        with self.assertRaises(subprocess.CalledProcessError):
+            list(gitcmd.log(self.local, 'unknown'))
+    
+    
+    def test0003_pagination_linear(self):
+        for i in range(7):
+            self.commit('commit %d' % i)
+        self.assertEqual([['commit 6', 'commit 5', 'commit 4'],
+                          ['commit 3', 'commit 2', 'commit 1'], ['commit 0']], self.pages(3))
+        # The last page is full, the cursor is None as the root commit has no parent
+        self.assertEqual(1, len(self.pages(7)))
+        self.assertEqual([['commit 6', 'commit 5'], ['commit 4', 'commit 3']],
+                         self.pages(2, rev_range='HEAD~4..HEAD'))
+        # The cursor continues after the skipped commits
+        self.assertEqual([['commit 4', 'commit 3', 'commit 2'], ['commit 1', 'commit 0']],
+                         self.pages(3, skip=2))
+    
+    
+    def test0004_pagination_merges(self):
+        self.commit('base')
+        command('git checkout -q -b side', self.local)
+        self.commit('side 1', 'side.txt')
+        command('git checkout -q master', self.local)
+        self.commit('master 1')
+        command('git checkout -q side', self.local)
+        self.commit('side 2', 'side.txt')
+        command('git checkout -q master', self.local)
+        self.commit('master 2')
+        self.date += 60
+        command('GIT_COMMITTER_DATE="%d +0000" GIT_AUTHOR_DATE="%d +0000" '
+                'git merge -q --no-ff side -m merge' % (self.date, self.date), self.local)
+        self.commit('after')
+        
+        walk = [e.subject for e in gitcmd.log(self.local)]
+        self.assertEqual(['after', 'merge', 'master 2', 'side 2', 'master 1', 'side 1', 'base'],
+                         walk)
+        for size in range(1, 8):
+            pages = self.pages(size)
+            self.assertEqual(walk, sum(pages, []), size)
+            self.assertTrue(all(len(page) <= size for page in pages))
+            for skip in range(1, 4):  # Skipped merges keep their other parents in the cursor
+                self.assertEqual(walk[skip:], sum(self.pages(size, skip), []), (size, skip))
+        
+        walk = [e.subject for e in gitcmd.log(self.local, 'master~1..master')]
+        for size in range(1, 4):
+            self.assertEqual(walk, sum(self.pages(size, rev_range='master~1..master'), []))
+        
+        paths = os.path.join(self.local, 'side.txt')
+        walk = [e.subject for e in gitcmd.log(self.local, paths=paths)]
+        self.assertEqual(['side 2', 'side 1'], walk)
+        self.assertEqual([['side 2'], ['side 1']], self.pages(1, paths=paths))
+    
+    
+    def test0005_parse(self):
+        output = (b'a' * 40 + b'\0' + b'b' * 40 + b' ' + b'c' * 40 + b'\0Name\0mail\0' + b'1\0'
+                  + b'Committer\0cmail\0' + b'2\0subject \xff\0body\n\0')
+        for size in (1, 7, 50, len(output)):
+            chunks = [output[i:i + size] for i in range(0, len(output), size)]
+            entries = list(parse(chunks, body=True))
+            self.assertEqual(1, len(entries))
+            self.assertEqual(('b' * 40, 'c' * 40), entries[0].parents)
+            self.assertEqual(2, entries[0].committer_time)
+            self.assertEqual('subject �', entries[0].subject)
+            self.assertEqual('body', entries[0].body)
+        self.assertEqual([], list(parse([])))
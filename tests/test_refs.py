@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import os
+from unittest import mock
+
+from gitcmd import gitcmd, refs
+
+from . import TemporaryTestCase, command
+
+
+
+class TestRefs(TemporaryTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        refs.clear_cache()
+        self.local = self.init('local')
+        self.git_dir = os.path.join(self.local, '.git')
+        command('touch file.txt && git add . && git commit -m "test"', self.local)
+    
+    
+    def tearDown(self):
+        super().tearDown()
+        refs.clear_cache()
+    
+    
+    def assertSameAsGit(self, path):
+        expected = command('git rev-parse --abbrev-ref HEAD', path)[1]
+        with mock.patch.object(gitcmd, '_execute', side_effect=AssertionError("spawned git")):
+            self.assertEqual(gitcmd.current_branch(path), (0, expected, ""))
+    
+    
+    def test0000_current_branch(self):
+        self.assertSameAsGit(self.local)
+        command('git checkout -b feature/x', self.local)
+        self.assertSameAsGit(self.local)
+        command('git checkout --detach', self.local)
+        self.assertSameAsGit(self.local)
+        self.assertEqual(refs.current_branch(self.git_dir, self.git_dir), "HEAD")
+    
+    
+    def test0001_resolve(self):
+        head = command('git rev-parse HEAD', self.local)[1]
+        repository = gitcmd.Repository(self.local)
+        self.assertEqual(repository.resolve(), head)
+        self.assertEqual(repository.resolve('refs/heads/master'), head)
+        self.assertIsNone(repository.resolve('refs/heads/nonexistent'))
+        
+        command('git tag -a v1 -m "v1" && git branch other && git pack-refs --all', self.local)
+        self.assertFalse(os.path.exists(os.path.join(self.git_dir, 'refs', 'heads', 'master')))
+        self.assertEqual(repository.resolve(), head)
+        self.assertEqual(repository.resolve('refs/heads/other'), head)
+        self.assertEqual(repository.resolve('refs/tags/v1'),
+                         command('git rev-parse refs/tags/v1', self.local)[1])
+        self.assertSameAsGit(self.local)
+    
+    
+    def test0002_cache_invalidated(self):
+        repository = gitcmd.Repository(self.local)
+        first = repository.resolve()
+        command('git commit --allow-empty -m "second"', self.local)
+        self.assertNotEqual(repository.resolve(), first)
+        self.assertEqual(repository.resolve(), command('git rev-parse HEAD', self.local)[1])
+        
+        command('git checkout -b other', self.local)
+        self.assertEqual(repository.current_branch(), (0, "other", ""))
+    
+    
+    def test0003_linked_worktree(self):
+        worktree = os.path.join(self.root, 'worktree')
+        command('git worktree add -b wt ' + worktree, self.local)
+        self.assertSameAsGit(worktree)
+        self.assertSameAsGit(self.local)
+        command('git commit --allow-empty -m "wt"', worktree)
+        self.assertEqual(gitcmd.Repository(worktree).resolve(),
+                         command('git rev-parse HEAD', worktree)[1])
+    
+    
+    def test0004_fallback(self):
+        # Unborn branch: git fails, so must current_branch()
+        command('git checkout --orphan unborn', self.local)
+        self.assertIsNone(refs.current_branch(self.git_dir, self.git_dir))
+        self.assertEqual(gitcmd.current_branch(self.local)[0], 128)
+        
+        # Ambiguous short name: git prefixes it with 'heads/'
+        command('git checkout master && git tag master', self.local)
+        self.assertIsNone(refs.current_branch(self.git_dir, self.git_dir))
+        self.assertEqual(gitcmd.current_branch(self.local), (0, "heads/master", ""))
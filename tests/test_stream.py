@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+from gitcmd import gitcmd
+from gitcmd.stream import Line, Progress, Stream, parse_progress
+
+from . import TemporaryTestCase, command
+
+
+gitcmd.GIT_LANG = 'en_US.UTF-8'
+
+
+
+class TestStream(TemporaryTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.host = self.init('host', bare=True)
+        self.local = self.init('local')
+        command('git remote add origin file://' + self.host, self.local)
+        for i in range(50):
+            with open(os.path.join(self.local, 'file%d' % i), 'w') as f:
+                print(i, file=f)
+        command('git add . && git commit -m "test"', self.local)
+        command('git push --set-upstream origin master', self.local)
+    
+    
+    def test0000_parse_progress(self):
+        self.assertEqual(
+            parse_progress("Receiving objects:  45% (450/1000), 1.20 MiB | 2.00 MiB/s"),
+            Progress("Receiving objects", 45, 450, 1000, "1.20 MiB", "2.00 MiB/s", False, False)
+        )
+        self.assertEqual(
+            parse_progress("remote: Counting objects: 100% (3/3), done."),
+            Progress("Counting objects", 100, 3, 3, None, None, True, True)
+        )
+        self.assertEqual(
+            parse_progress("remote: Enumerating objects: 1234"),
+            Progress("Enumerating objects", None, 1234, None, None, None, False, True)
+        )
+        self.assertEqual(
+            parse_progress("Receiving objects: 100% (10/10), 1.00 KiB | 1.00 KiB/s, done."),
+            Progress("Receiving objects", 100, 10, 10, "1.00 KiB", "1.00 KiB/s", True, False)
+        )
+        self.assertIsNone(parse_progress("Cloning into 'host'..."))
+        self.assertIsNone(parse_progress("fatal: repository 'x' does not exist"))
+    
+    
+    def test0001_stream_clone(self):
+        stream = gitcmd.stream_clone(self.root, 'file://' + self.host, to='clone')
+        events = list(stream)
+        
+        self.assertEqual(stream.returncode, 0)
+        self.assertIn(Line('stderr', "Cloning into 'clone'..."), events)
+        receiving = [e for e in events
+                     if isinstance(e, Progress) and e.phase == "Receiving objects"]
+        self.assertTrue(receiving)
+        self.assertTrue(receiving[-1].done)
+        self.assertEqual(receiving[-1].percent, 100)
+        self.assertTrue(os.path.isfile(os.path.join(self.root, 'clone', 'file0')))
+    
+    
+    def test0002_progress_callback(self):
+        events = []
+        ret, out, err = gitcmd.clone(self.root, 'file://' + self.host, to='clone',
+                                     progress=events.append)
+        self.assertEqual(ret, 0, err)
+        self.assertIn("Cloning into 'clone'...\n", err)
+        self.assertNotIn("Receiving objects", err)
+        self.assertTrue(all(isinstance(e, Progress) for e in events))
+        self.assertIn("Receiving objects", [e.phase for e in events])
+        
+        clone = os.path.join(self.root, 'clone')
+        command('git config user.email "you@example.com"', clone)
+        command('git config user.name "Your Name"', clone)
+        open(os.path.join(clone, 'new'), 'w').close()
+        gitcmd.add(os.path.join(clone, 'new'))
+        gitcmd.commit(clone, 'new')
+        events = []
+        ret, out, err = gitcmd.push(clone, progress=events.append)
+        self.assertEqual(ret, 0, err)
+        self.assertIn("master -> master", err)
+        self.assertIn("Writing objects", [e.phase for e in events])
+        
+        events = []
+        ret, out, err = gitcmd.pull(self.local, progress=events.append)
+        self.assertEqual(ret, 0, err)
+        self.assertIn("Fast-forward", out)
+        self.assertIn(("Counting objects", True), [(e.phase, e.remote) for e in events])
+    
+    
+    def test0003_stream_pull_push(self):
+        clone = os.path.join(self.root, 'clone')
+        command('git clone file://%s clone' % self.host, self.root)
+        command('git config user.email "you@example.com"', clone)
+        command('git config user.name "Your Name"', clone)
+        command('touch new && git add new && git commit -m "new"', clone)
+        
+        stream = gitcmd.stream_push(clone)
+        events = list(stream)
+        self.assertEqual(stream.returncode, 0)
+        self.assertTrue(any(isinstance(e, Line) and "master -> master" in e.text for e in events))
+        
+        stream = gitcmd.stream_pull(self.local)
+        events = list(stream)
+        self.assertEqual(stream.returncode, 0)
+        self.assertIn(Line('stdout', "Fast-forward"), events)
+    
+    
+    def test0004_password_masked(self):
+        args = ["-c", "alias.leak=!echo 'out secret' && echo 'err secret' >&2", "leak"]
+        events = list(Stream(args, self.local, password="secret"))
+        self.assertIn(Line('stdout', "out ••••••"), events)
+        self.assertIn(Line('stderr', "err ••••••"), events)
+    
+    
+    def test0005_stall_timeout(self):
+        stream = Stream(["-c", "alias.hang=!sleep 5", "hang"], self.local, stall_timeout=0.2)
+        start = time.perf_counter()
+        with self.assertRaises(TimeoutError):
+            list(stream)
+        self.assertLess(time.perf_counter() - start, 4)
+        self.assertIsNone(stream.returncode)
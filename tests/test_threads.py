@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import gitcmd as package
+from gitcmd import gitcmd
+
+from . import TemporaryTestCase, command
+
+
+gitcmd.GIT_LANG = 'en_US.UTF-8'
+
+REPOSITORIES = 8
+THREADS = 32
+ROUNDS = 16
+
+
+
+class TestThreads(TemporaryTestCase):
+    """Run gitcmd's functions concurrently on different repositories, each repository being on
+    its own branch so that a command executed in the wrong repository is detected."""
+    
+    def setUp(self):
+        super().setUp()
+        self.cwd = os.getcwd()
+        self.repositories = []
+        for i in range(REPOSITORIES):
+            host = self.init('host%d' % i, bare=True)
+            local = self.init('local%d' % i)
+            command('git remote add origin ' + host, local)
+            command('git checkout -b branch%d' % i, local)
+            command('touch file.txt', local)
+            command('git add file.txt', local)
+            command('git commit -m "test"', local)
+            command('git push --set-upstream origin branch%d' % i, local)
+            self.repositories.append(local)
+    
+    
+    def hammer(self, function, rounds=ROUNDS):
+        """Call function(i, local) for every repository from THREADS threads, <rounds> times."""
+        jobs = [(i, local) for i, local in enumerate(self.repositories)] * rounds
+        barrier = threading.Barrier(THREADS)
+        
+        def job(args):
+            try:
+                barrier.wait(timeout=1)
+            except threading.BrokenBarrierError:
+                pass
+            return function(*args)
+        
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            results = list(executor.map(job, jobs))
+        
+        self.assertEqual(os.getcwd(), self.cwd)
+        return results
+    
+    
+    def test0000_current_branch(self):
+        def job(i, local):
+            ret, out, err = gitcmd.current_branch(local)
+            self.assertEqual(ret, 0, err)
+            self.assertEqual(out, "branch%d" % i)
+        
+        self.hammer(job)
+    
+    
+    def test0001_status_branch(self):
+        def job(i, local):
+            ret, out, err = gitcmd.status(os.path.join(local, 'file.txt'))
+            self.assertEqual(ret, 0, err)
+            self.assertIn("On branch branch%d" % i, out)
+            ret, out, err = gitcmd.branch(local)
+            self.assertEqual(ret, 0, err)
+            self.assertEqual(out, "* branch%d" % i)
+        
+        self.hammer(job)
+    
+    
+    def test0002_remote_url_top_level(self):
+        def job(i, local):
+            ret, out, err = gitcmd.remote_url(local)
+            self.assertEqual(ret, 0, err)
+            self.assertEqual(out, os.path.join(self.root, 'host%d' % i))
+            ret, out, err = gitcmd.top_level(os.path.join(local, 'file.txt'))
+            self.assertEqual(ret, 0, err)
+            self.assertEqual(out, os.path.realpath(local))
+            self.assertTrue(gitcmd.in_repository(local, False))
+        
+        self.hammer(job)
+    
+    
+    def test0003_add_commit_push(self):
+        # Git itself does not allow concurrent writes to the same index, only one thread per
+        # repository writes at a time.
+        def job(i, local):
+            for n in range(ROUNDS):
+                test_file = os.path.join(local, 'test%d' % n)
+                open(test_file, 'w+').close()
+                ret, out, err = gitcmd.add(test_file)
+                self.assertEqual(ret, 0, err)
+                ret, out, err = gitcmd.commit(test_file, 'test')
+                self.assertEqual(ret, 0, err)
+                self.assertIn("branch%d" % i, out)
+            ret, out, err = gitcmd.push(local)
+            self.assertEqual(ret, 0, err)
+            ret, out, err = gitcmd.status(local)
+            self.assertEqual(ret, 0, err)
+            self.assertIn("working tree clean", out)
+        
+        self.hammer(job, rounds=1)
+        for i, local in enumerate(self.repositories):
+            _, out, _ = command('git log --oneline origin/branch%d' % i, local)
+            self.assertEqual(len(out.split('\n')), ROUNDS + 1)
+    
+    
+    def test0100_run_many(self):
+        paths = (self.repositories + ['/tmp']
+                 + [os.path.join(l, 'file.txt') for l in self.repositories])
+        
+        results = list(package.run_many(gitcmd.current_branch, paths, max_workers=4))
+        self.assertEqual(sorted(r.path for r in results), sorted(paths))
+        for path, result, error in results:
+            if path == '/tmp':
+                self.assertIsNone(result)
+                self.assertIsInstance(error, gitcmd.NotInRepositoryError)
+            else:
+                i = self.repositories.index(path.replace(os.sep + 'file.txt', ''))
+                self.assertIsNone(error)
+                self.assertEqual(result, (0, "branch%d" % i, ""))
+    
+    
+    def test0101_run_many_kwargs(self):
+        results = package.run_many(gitcmd.remote_url, iter(self.repositories), remote='nonexistent')
+        for path, result, error in results:
+            self.assertIsNone(error)
+            self.assertEqual(result[0], 1)
+    
+    
+    def test0102_run_many_bounded(self):
+        lock = threading.Lock()
+        running = [0, 0]  # current, maximum
+        
+        def operation(path):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            try:
+                return gitcmd.status(path)
+            finally:
+                with lock:
+                    running[0] -= 1
+        
+        results = list(package.run_many(operation, self.repositories * ROUNDS, max_workers=3))
+        self.assertEqual(len(results), REPOSITORIES * ROUNDS)
+        self.assertLessEqual(running[1], 3)
+        with self.assertRaises(ValueError):
+            package.run_many(operation, self.repositories, max_workers=0)
+    
+    
+    def test0103_run_many_closed(self):
+        calls = []
+        
+        def operation(path):
+            calls.append(path)
+            return gitcmd.status(path)
+        
+        results = package.run_many(operation, self.repositories * ROUNDS, max_workers=2)
+        next(results)
+        results.close()
+        self.assertLessEqual(len(calls), 4 + 1)
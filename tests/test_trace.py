@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+from gitcmd import gitcmd, instrument, trace
+
+from . import TemporaryTestCase, command
+
+
+
+class TestTrace(TemporaryTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.host = self.init('host', bare=True)
+        self.local = self.init('local')
+        command('touch file.txt && git add . && git commit -m "test"', self.local)
+        command('git remote add origin ' + self.host, self.local)
+        command('git push -u origin master', self.local)
+    
+    
+    def test0000_disabled(self):
+        self.assertIsNone(trace.capture())
+        calls = []
+        with instrument.hook(calls.append):
+            gitcmd.status(self.local)
+        self.assertIsNone(calls[0].profile)
+        self.assertIsNone(gitcmd.status(self.local).profile)
+    
+    
+    def test0001_status(self):
+        calls = []
+        with trace.profile() as profiles, instrument.hook(calls.append):
+            result = gitcmd.status(self.local)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(len(profiles), 1)
+        
+        profile = profiles[0]
+        self.assertIs(calls[0].profile, profile)
+        self.assertIs(result.profile, profile)
+        self.assertEqual(profile.command, 'status')
+        self.assertEqual(profile.processes[0].code, 0)
+        self.assertGreater(profile.duration, 0)
+        phases = profile.phases()
+        self.assertIn('index/do_read_index', phases)
+        self.assertIn('status/untracked', phases)
+        self.assertEqual(profile.get('index', 'read/cache_nr'), '1')
+        self.assertFalse([f for f in os.listdir(tempfile.gettempdir())
+                          if f.startswith('gitcmd-trace2-')])
+    
+    
+    def test0002_children(self):
+        other = os.path.join(self.root, 'other')
+        command('git clone host other', self.root)
+        command('git config user.email "you@example.com"', other)
+        command('git config user.name "Your Name"', other)
+        command('touch other.txt && git add . && git commit -m "other"', other)
+        command('git push origin master', other)
+        
+        with trace.profile() as profiles:
+            result = gitcmd.pull(self.local)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        profile = profiles[-1]
+        self.assertIs(result.profile, profile)
+        self.assertEqual(profile.command, 'pull')
+        names = [p.name for p in profile.processes]
+        self.assertIn('fetch', names)
+        self.assertTrue(all(p.sid.startswith(profile.processes[0].sid)
+                            for p in profile.processes))
+        self.assertIn('fetch/remote_refs', profile.phases('fetch'))
+    
+    
+    def test0003_nested_and_stream(self):
+        with trace.profile() as outer:
+            with trace.profile() as inner:
+                list(gitcmd.status_entries(self.local))
+            stream = gitcmd.stream_clone(self.root, 'file://' + self.host, to='clone')
+            list(stream)
+        self.assertEqual(len(inner), 1)
+        self.assertEqual(len(outer), 2)
+        self.assertIs(outer[0], inner[0])
+        self.assertIs(outer[1], stream.profile)
+        self.assertEqual(stream.profile.command, 'clone')
+        self.assertIsNone(trace.capture())
+    
+    
+    def test0004_parse(self):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write('{"event":"cmd_name","sid":"a","name":"status"}\n'
+                    '{"event":"region_leave","sid":"a","category":"index","label":"refresh",'
+                    '"nesting":1,"t_rel":0.5}\n'
+                    '{"event":"region_leave","sid":"a","category":"index","label":"refresh",'
+                    '"nesting":1,"t_rel":0.25}\n'
+                    '{"event":"exit","sid":"a","t_abs":1.0,"code"')
+        try:
+            profile = trace.parse(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(profile.command, 'status')
+        self.assertIsNone(profile.duration)
+        self.assertEqual(profile.phases(), {'index/refresh': 0.75})
+        self.assertEqual(profile.phases('fetch'), {})
+        self.assertEqual(trace.parse(path).processes, [])
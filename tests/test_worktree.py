@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import subprocess
+import threading
+
+from gitcmd import WorktreePool, gitcmd, worktree
+
+from . import TemporaryTestCase, command
+
+
+
+class TestWorktree(TemporaryTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.local = self.init('local')
+        command('echo first > file.txt && git add . && git commit -m "first"', self.local)
+        self.head = command('git rev-parse HEAD', self.local)[1]
+    
+    
+    def test0001_add_list_remove(self):
+        ret, _, err = gitcmd.worktree_add(self.local, '../linked', branch='feature')
+        self.assertEqual(0, ret, err)
+        linked = os.path.join(self.root, 'linked')
+        self.assertTrue(os.path.isfile(os.path.join(linked, 'file.txt')))
+        
+        ret, out, _ = gitcmd.worktree_list(linked)
+        self.assertEqual(0, ret)
+        self.assertIn(linked, out)
+        self.assertIn('[feature]', out)
+        
+        entries = gitcmd.worktree_entries(self.local)
+        self.assertEqual([self.local, linked], [e.path for e in entries])
+        self.assertEqual('refs/heads/master', entries[0].branch)
+        self.assertEqual('refs/heads/feature', entries[1].branch)
+        self.assertEqual(self.head, entries[1].head)
+        self.assertFalse(entries[1].detached)
+        
+        self.assertEqual(0, gitcmd.worktree_remove(self.local, '../linked')[0])
+        self.assertFalse(os.path.exists(linked))
+        self.assertEqual(1, len(gitcmd.worktree_entries(self.local)))
+    
+    
+    def test0002_detach_and_remove_dirty(self):
+        ret, _, err = gitcmd.worktree_add(self.local, '../linked', 'HEAD', detach=True)
+        self.assertEqual(0, ret, err)
+        linked = os.path.join(self.root, 'linked')
+        entry = gitcmd.worktree_entries(self.local)[1]
+        self.assertTrue(entry.detached)
+        self.assertIsNone(entry.branch)
+        
+        command('echo dirty > file.txt', linked)
+        self.assertNotEqual(0, gitcmd.worktree_remove(self.local, linked)[0])
+        self.assertEqual(0, gitcmd.worktree_remove(self.local, linked, force=True)[0])
+        
+        with self.assertRaises(ValueError):
+            gitcmd.worktree_add(self.local, '../other', branch='b', detach=True)
+    
+    
+    def test0003_prune(self):
+        gitcmd.worktree_add(self.local, '../linked', detach=True)
+        command('git worktree lock --reason "kept" ../linked', self.local)
+        self.assertEqual('kept', gitcmd.worktree_entries(self.local)[1].locked)
+        command('git worktree unlock ../linked', self.local)
+        shutil.rmtree(os.path.join(self.root, 'linked'))
+        self.assertIsNotNone(gitcmd.worktree_entries(self.local)[1].prunable)
+        self.assertEqual(0, gitcmd.worktree_prune(self.local)[0])
+        self.assertEqual(1, len(gitcmd.worktree_entries(self.local)))
+    
+    
+    def test0004_commands_in_linked_worktree(self):
+        gitcmd.worktree_add(self.local, '../linked', branch='feature')
+        linked = os.path.join(self.root, 'linked')
+        repository = gitcmd.Repository(linked)
+        self.assertTrue(repository.worktree)
+        self.assertEqual(linked, repository.top_level)
+        
+        command('echo second > file.txt', linked)
+        self.assertIn('modified:   file.txt', gitcmd.status(linked)[1])
+        self.assertEqual((0, 'feature', ''), gitcmd.current_branch(linked))
+        self.assertEqual(0, gitcmd.add(os.path.join(linked, 'file.txt'))[0])
+        self.assertEqual(0, gitcmd.commit(linked, 'second')[0])
+        self.assertEqual([], [e for e in gitcmd.status_entries(linked, branch=False)])
+        # The main worktree is left untouched
+        self.assertEqual('first', command('cat file.txt', self.local)[1])
+        self.assertEqual((0, 'master', ''), gitcmd.current_branch(self.local))
+        
+        self.assertEqual(0, gitcmd.checkout(linked, 'other', new=True)[0])
+        self.assertEqual((0, 'other', ''), gitcmd.current_branch(linked))
+        self.assertEqual('second', gitcmd.show_last_revision(os.path.join(linked, 'file.txt'))[1])
+        # Branches are shared
+        self.assertIn('other', gitcmd.branch(self.local)[1])
+    
+    
+    def test0005_parse(self):
+        output = ("worktree /repo\nbare\n\n"
+                  "worktree /a\nHEAD 1234\nbranch refs/heads/a\nlocked\n\n"
+                  "worktree /b\nHEAD 5678\ndetached\nprunable gitdir file points to non-existent "
+                  "location")
+        entries = worktree.parse(output)
+        self.assertEqual(3, len(entries))
+        self.assertTrue(entries[0].bare)
+        self.assertIsNone(entries[0].head)
+        self.assertEqual('', entries[1].locked)
+        self.assertIsNone(entries[1].prunable)
+        self.assertTrue(entries[2].detached)
+        self.assertEqual('gitdir file points to non-existent location', entries[2].prunable)
+        self.assertEqual([], worktree.parse(''))
+
+
+
+class TestWorktreePool(TemporaryTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.local = self.init('local')
+        command('echo first > file.txt && git add . && git commit -m "first"', self.local)
+        command('git tag first', self.local)
+        command('echo second > file.txt && git commit -am "second"', self.local)
+        self.pool = WorktreePool(self.local, os.path.join(self.root, 'pool'), max_idle=2)
+    
+    
+    def tearDown(self):
+        self.pool.close()
+        super().tearDown()
+    
+    
+    def test0001_reuse(self):
+        with self.pool.checkout() as path:
+            self.assertEqual('second', command('cat file.txt', path)[1])
+            command('echo dirty > file.txt && touch untracked', path)
+        self.assertEqual([path], self.pool.idle())
+        
+        with self.pool.checkout('first') as reused:
+            self.assertEqual(path, reused)
+            self.assertEqual('first', command('cat file.txt', reused)[1])
+            self.assertFalse(os.path.exists(os.path.join(reused, 'untracked')))
+            self.assertEqual([], self.pool.idle())
+        self.assertEqual(2, len(gitcmd.worktree_entries(self.local)))
+    
+    
+    def test0002_concurrent(self):
+        with self.pool.checkout('master') as a, self.pool.checkout('master') as b:
+            self.assertNotEqual(a, b)
+            with self.pool.checkout('first') as c:
+                self.assertEqual('first', command('cat file.txt', c)[1])
+        # Only max_idle worktrees are kept
+        self.assertEqual(2, len(self.pool.idle()))
+        self.assertEqual(3, len(gitcmd.worktree_entries(self.local)))
+        
+        paths = []
+        
+        def use():
+            with self.pool.checkout() as path:
+                paths.append(path)
+                self.assertEqual('second', command('cat file.txt', path)[1])
+        
+        threads = [threading.Thread(target=use) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(4, len(paths))
+        
+        self.pool.close()
+        self.assertEqual(1, len(gitcmd.worktree_entries(self.local)))
+    
+    
+    def test0003_errors(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.pool.acquire('unknown')
+        
+        path = self.pool.acquire()
+        self.pool.release(path)
+        shutil.rmtree(path)
+        # The deleted worktree is replaced by a new one
+        with self.pool.checkout() as new:
+            self.assertTrue(os.path.isfile(os.path.join(new, 'file.txt')))
+        self.assertEqual(2, len(gitcmd.worktree_entries(self.local)))